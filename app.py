@@ -1,31 +1,100 @@
-from flask import Flask, render_template, request, redirect, url_for
-from database import db
-from database.init_db import init_db
+from flask import Flask
 
-app = Flask(__name__)
 
-# Load config_app function from config and initialize
-from config import config_app
-config_app(app)
+def create_app(config_overrides=None):
+    """
+    Build the Flask app. Does no database work: tables, migrations and the
+    default admin / departments are created once per deploy with
+    `flask --app app init-db`, not by every worker that boots.
+    """
+    app = Flask(__name__)
 
-# Initialize the database
-db.init_app(app)
+    # Load config_app function from config and initialize
+    from config import config_app
+    config_app(app)
+    if config_overrides:
+        app.config.update(config_overrides)
 
-# Create tables and default admin
-init_db(app)
+    # Initialize the database with the engine profile (pool options, SQLite
+    # pragmas, "read" bind); the engines connect lazily, on first query
+    from database.engine import init_engine
+    init_engine(app)
 
-from controllers.routes import setup_routes
-setup_routes(app)
+    # Reference-data cache (departments, doctor lists, blacklists)
+    from database.cache import init_cache
+    init_cache(app)
 
-from controllers.admin import setup_admin_routes
-setup_admin_routes(app)
+    # Password hashing pool (KDF runs off the request thread)
+    from database.credentials import init_credentials
+    init_credentials(app)
 
-from controllers.doctors import setup_doctor_routes
-setup_doctor_routes(app)
+    # Rate limits and the booking waiting room (memory or Redis buckets)
+    from database.ratelimit import init_rate_limits
+    init_rate_limits(app)
 
-from controllers.patient import setup_patient_routes
-setup_patient_routes(app)
+    # routes (controller modules are only imported here, when an app is built)
+    from controllers.routes import setup_routes
+    setup_routes(app)
+
+    from controllers.admin import setup_admin_routes
+    setup_admin_routes(app)
+
+    from controllers.doctors import setup_doctor_routes
+    setup_doctor_routes(app)
+
+    from controllers.patient import setup_patient_routes
+    setup_patient_routes(app)
+
+    from controllers.export import setup_export_routes
+    setup_export_routes(app)
+
+    from controllers.api import setup_api_routes
+    setup_api_routes(app)
+
+    from controllers.metrics import setup_metrics
+    setup_metrics(app)
+
+    from database.stats import setup_stats
+    setup_stats(app)
+
+    # doctors' patient rosters, kept up to date on every flush
+    from database.roster import setup_roster
+    setup_roster(app)
+
+    # data-version stamps + cached dashboard pages (ETag / 304)
+    from database.versions import setup_versions
+    setup_versions(app)
+
+    from controllers.pagecache import setup_page_cache
+    setup_page_cache(app)
+
+    # CLI commands (init-db, db-upgrade, import-data, jobs-worker, archive-appointments, ...)
+    from database.init_db import setup_init_db_commands
+    setup_init_db_commands(app)
+
+    from database.migrate import setup_migrate_commands
+    setup_migrate_commands(app)
+
+    from database.bulk_import import setup_import_commands
+    setup_import_commands(app)
+
+    from database.schedule import setup_schedule_commands
+    setup_schedule_commands(app)
+
+    from database.jobs import setup_job_commands
+    setup_job_commands(app)
+
+    from database.archive import setup_archive_commands
+    setup_archive_commands(app)
+
+    return app
+
+
+# gunicorn "app:app" and `flask --app app ...` use this instance
+app = create_app()
 
 if __name__ == '__main__':
+  # local development: make sure the schema and seed data exist first
+  from database.init_db import init_db
+  init_db(app)
   app.run(debug=True)
-
@@ -0,0 +1,252 @@
+"""
+Async serving mode for booking peaks.
+
+    pip install starlette uvicorn aiosqlite a2wsgi     # or asyncpg for PostgreSQL
+    uvicorn asgi:app --workers 4
+
+The hot patient API endpoints (free slots, booking, cancelling, upcoming
+appointments) are served by async handlers on an AsyncSession, so a worker
+that waits on the database keeps accepting other connections instead of
+being held for the whole request. Everything else - the web pages, login,
+the rest of /api/v1 - is the normal Flask app, mounted underneath. Users log
+in there; the async handlers read the same signed session cookie.
+
+The handlers use the models from database/model.py and the statement
+builders from database/slots.py. Write paths run the existing sync helpers
+through AsyncSession.run_sync(), so the stats counters, data versions and
+the slot compare-and-set behave exactly as under gunicorn.
+"""
+import hashlib
+from contextlib import asynccontextmanager
+from datetime import date
+
+from itsdangerous import BadSignature
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import contains_eager
+
+try:
+    from starlette.applications import Starlette
+    from starlette.concurrency import run_in_threadpool
+    from starlette.responses import JSONResponse, Response
+    from starlette.routing import Mount, Route
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+except ImportError:  # pragma: no cover
+    Starlette = None
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:  # pragma: no cover
+    try:
+        from starlette.middleware.wsgi import WSGIMiddleware
+    except ImportError:
+        WSGIMiddleware = None
+
+from app import create_app
+from controllers.api import PREFIX, appointment_payload, group_slots, parse_booking, parse_window
+from controllers.ratelimit import booking_rules, client_ip_from, seconds
+from database import engine as db_engine, ratelimit, slots
+from database.model import db, Appointment, Department, Doctor
+
+
+# sync dialect -> async driver (ASYNC_DATABASE_URI overrides the guess)
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def async_database_url(flask_app):
+    if flask_app.config.get("ASYNC_DATABASE_URI"):
+        return make_url(flask_app.config["ASYNC_DATABASE_URI"])
+    with flask_app.app_context():
+        url = db.engine.url   # relative SQLite paths already resolved by Flask-SQLAlchemy
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f"no async driver known for {backend!r}; set ASYNC_DATABASE_URI")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def create_async_db(flask_app):
+    """Async engine + session factory with the same engine profile as the sync app."""
+    url = async_database_url(flask_app)
+    config = flask_app.config
+    engine = create_async_engine(url, **db_engine.engine_options(config, url))
+    if url.get_backend_name() == "sqlite" and config.get("DB_ENGINE_PROFILE", "tuned") == "tuned":
+        db_engine.apply_sqlite_pragmas(engine.sync_engine, config)
+    return engine, async_sessionmaker(engine, expire_on_commit=False)
+
+
+# ------------------------------ helpers ----------------------------------
+
+def _json(request, payload, status=200):
+    response = JSONResponse(payload, status_code=status)
+    if request.method == "GET":
+        etag = '"' + hashlib.sha1(response.body).hexdigest() + '"'
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+    return response
+
+
+def _error(message, status):
+    return JSONResponse({"error": message}, status_code=status)
+
+
+def _too_many(message, retry_after, **extra):
+    return JSONResponse({"error": message, "retry_after": seconds(retry_after), **extra}, status_code=429,
+                        headers={"Retry-After": str(seconds(retry_after))})
+
+
+def session_reader(flask_app):
+    """Decode the Flask session cookie (same key, same signature)."""
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    cookie_name = flask_app.config.get("SESSION_COOKIE_NAME", "session")
+    max_age = int(flask_app.permanent_session_lifetime.total_seconds())
+
+    def read(request):
+        cookie = request.cookies.get(cookie_name)
+        if not cookie or serializer is None:
+            return {}
+        try:
+            return serializer.loads(cookie, max_age=max_age)
+        except BadSignature:
+            return {}
+    return read
+
+
+# ------------------------------ app --------------------------------------
+
+def create_asgi_app(flask_app=None):
+    if Starlette is None or WSGIMiddleware is None:
+        raise RuntimeError("the ASGI mode needs starlette, uvicorn and an async database driver "
+                           "(pip install starlette uvicorn aiosqlite a2wsgi)")
+    flask_app = flask_app or create_app()
+    engine, Session = create_async_db(flask_app)
+    read_session = session_reader(flask_app)
+
+    def patient_id(request):
+        data = read_session(request)
+        return data.get("user_id") if data.get("role") == "patient" else None
+
+    async def slots_view(request):
+        """GET /api/v1/slots?department=ID|doctor=ID&from=&days= (same payload as the Flask route)."""
+        if patient_id(request) is None:
+            return _error("login required", 401)
+        args = request.query_params
+        try:
+            department_id = int(args["department"]) if args.get("department") else None
+            doctor_id = int(args["doctor"]) if args.get("doctor") else None
+        except ValueError:
+            return _error("department and doctor must be ids", 400)
+        if department_id is None and doctor_id is None:
+            return _error("department or doctor is required", 400)
+        start, end = parse_window(args)
+        async with Session() as session:
+            rows = (await session.execute(slots.free_slot_window_query(start, end, department_id, doctor_id))).all()
+        return _json(request, group_slots(rows))
+
+    async def appointments_view(request):
+        """GET: upcoming booked appointments. POST: book {"doctor_id", "date", "time"}."""
+        pid = patient_id(request)
+        if pid is None:
+            return _error("login required", 401)
+
+        if request.method == "GET":
+            async with Session() as session:
+                rows = (await session.execute(
+                    select(Appointment).join(Appointment.doctor).options(contains_eager(Appointment.doctor))
+                    .where(Appointment.patient_id == pid, Appointment.status == "booked",
+                           Appointment.date >= date.today())
+                    .order_by(Appointment.date, Appointment.time))).scalars().all()
+            return _json(request, [appointment_payload(a) for a in rows])
+
+        # same waiting room and limits as the Flask route (shared when RATE_LIMIT_BACKEND=redis);
+        # the Redis backend blocks on the network, so both run off the event loop
+        admitted, position, wait = await run_in_threadpool(ratelimit.admit, f"patient:{pid}")
+        if not admitted:
+            return _too_many("waiting room", wait, position=position)
+        ip = client_ip_from(request.client.host if request.client else None,
+                            request.headers.get("x-forwarded-for"), flask_app.config.get("RATE_LIMIT_PROXY_HOPS", 0))
+        retry_after = await run_in_threadpool(ratelimit.check, booking_rules(flask_app.config, ip, pid))
+        if retry_after:
+            return _too_many("too many booking requests", retry_after)
+        try:
+            body = await request.json()
+        except ValueError:   # not JSON / not UTF-8: same answer as a body without the fields
+            body = None
+        try:
+            doctor_id, d, t = parse_booking(body)
+        except ValueError as e:
+            return _error(str(e), 400)
+
+        def claim_and_add(sync_session):
+            # the same compare-and-set as slots.book(), on this session's connection
+            department_name = sync_session.execute(
+                select(Department.department_name)
+                .join(Doctor, Doctor.department_id == Department.department_id)
+                .where(Doctor.doctor_id == doctor_id)).scalar()
+            if department_name is None:
+                return None
+            if not slots.claim(doctor_id, d, t, conn=sync_session):
+                raise slots.SlotTaken()
+            appt = Appointment(patient_id=pid, doctor_id=doctor_id, date=d, time=t,
+                               department=department_name, status="booked")
+            sync_session.add(appt)
+            sync_session.flush()
+            appt.doctor   # lazy loads can't run after run_sync returns: load it for the payload now
+            return appt
+
+        async with Session() as session:
+            try:
+                appt = await session.run_sync(claim_and_add)
+                if appt is None:
+                    return _error("unknown doctor", 404)
+                await session.commit()
+            except (slots.SlotTaken, IntegrityError):
+                await session.rollback()
+                return _error("slot is no longer free", 409)
+            return _json(request, appointment_payload(appt), 201)
+
+    async def cancel_view(request):
+        pid = patient_id(request)
+        if pid is None:
+            return _error("login required", 401)
+        appointment_id = request.path_params["appointment_id"]
+
+        def cancel(sync_session):
+            appt = sync_session.get(Appointment, appointment_id)
+            if not appt or appt.patient_id != pid:
+                return None, ("appointment not found", 404)
+            if appt.status != "booked":
+                return None, ("only booked appointments can be cancelled", 409)
+            appt.status = "cancelled"
+            slots.release(appt.doctor_id, appt.date, appt.time, conn=sync_session)
+            appt.doctor   # for the payload, see above
+            return appt, None
+
+        async with Session() as session:
+            appt, error = await session.run_sync(cancel)
+            if error:
+                return _error(*error)
+            await session.commit()
+            return _json(request, appointment_payload(appt))
+
+    @asynccontextmanager
+    async def lifespan(asgi_app):
+        yield
+        await engine.dispose()
+
+    return Starlette(routes=[
+        Route(PREFIX + "/slots", slots_view, methods=["GET"]),
+        Route(PREFIX + "/appointments", appointments_view, methods=["GET", "POST"]),
+        Route(PREFIX + "/appointments/{appointment_id:int}/cancel", cancel_view, methods=["POST"]),
+        # everything else: the regular Flask app
+        Mount("/", app=WSGIMiddleware(flask_app)),
+    ], lifespan=lifespan)
+
+
+app = create_asgi_app() if Starlette is not None else None
@@ -0,0 +1,12 @@
+"""
+Benchmarks and load tests. Run from the repository root, e.g.
+
+    python -m benchmarks.run --scale small          # scenario suite -> JSON results
+    python -m benchmarks.datagen --db /tmp/x.db     # just the synthetic data
+    python -m benchmarks.bench_login                # login throughput per KDF cost
+    python -m benchmarks.stress_booking             # concurrent booking of one slot
+    python -m benchmarks.bench_sqlite               # read/write throughput per engine profile
+    python -m benchmarks.bench_asgi                 # connections per process: gunicorn sync vs ASGI
+
+Everything runs against a throw-away SQLite file, never instance/db.sqlite3.
+"""
@@ -0,0 +1,179 @@
+"""
+Concurrent connections per process: gunicorn sync workers vs the async
+ASGI mode (asgi.py under uvicorn).
+
+    python -m benchmarks.bench_asgi --connections 10,100,500 --seconds 10
+
+Starts each server as ONE process on a copy of the same synthetic database,
+logs a patient in once, then keeps N connections busy for a fixed time.
+Every connection loops over the hot patient endpoints: free slots for a
+department (most requests), upcoming appointments, and now and then a
+booking followed by its cancellation. Prints requests/sec, p50 / p95
+latency and failures (errors or timeouts) for every N, per server.
+
+Needs gunicorn, uvicorn, starlette and aiosqlite. Uses a throw-away SQLite
+file, never the real instance database.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+
+SERVERS = {
+    "gunicorn-sync": ["gunicorn", "-w", "1", "-k", "sync", "--backlog", "2048", "-b", "127.0.0.1:{port}", "app:app"],
+    "uvicorn-asgi": ["uvicorn", "asgi:app", "--workers", "1", "--backlog", "2048", "--log-level", "warning",
+                     "--host", "127.0.0.1", "--port", "{port}"],
+}
+TIMEOUT = 30
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def http(port, method, path, cookie=None, body=None):
+    """Minimal HTTP/1.1 client (one connection per request). Returns (status, headers, body)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    payload = json.dumps(body).encode() if body is not None else b""
+    head = [f"{method} {path} HTTP/1.1", "Host: bench", "Connection: close",
+            f"Content-Length: {len(payload)}"]
+    if body is not None:
+        head.append("Content-Type: application/json")
+    if cookie:
+        head.append(f"Cookie: {cookie}")
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + payload)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    header_block, _, content = raw.partition(b"\r\n\r\n")
+    lines = header_block.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers.setdefault(name.strip().lower(), []).append(value.strip())
+    return int(lines[0].split()[1]), headers, content
+
+
+async def wait_until_up(port, proc, seconds=30):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}")
+        try:
+            await http(port, "GET", "/")
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+async def login(port, email, password):
+    status, headers, _ = await http(port, "POST", "/api/v1/login", body={"email": email, "password": password})
+    if status != 200:
+        raise RuntimeError(f"login failed with {status}")
+    return headers["set-cookie"][0].split(";")[0]
+
+
+async def user(port, cookie, manifest, rng, deadline, samples):
+    department = rng.choice(manifest["department_ids"])
+    while time.monotonic() < deadline:
+        roll = rng.random()
+        started = time.perf_counter()
+        try:
+            if roll < 0.8:
+                status, _, _ = await asyncio.wait_for(
+                    http(port, "GET", f"/api/v1/slots?department={department}&days=7", cookie), TIMEOUT)
+            elif roll < 0.95:
+                status, _, _ = await asyncio.wait_for(http(port, "GET", "/api/v1/appointments", cookie), TIMEOUT)
+            else:
+                status, _, body = await asyncio.wait_for(
+                    http(port, "GET", f"/api/v1/slots?department={department}&days=7", cookie), TIMEOUT)
+                free = [(doctor, day, t) for doctor, days in json.loads(body or b"{}").items()
+                        for day, times in days.items() for t in times]
+                if free:
+                    doctor, day, t = rng.choice(free)
+                    status, _, body = await asyncio.wait_for(http(
+                        port, "POST", "/api/v1/appointments", cookie,
+                        {"doctor_id": int(doctor), "date": day, "time": t}), TIMEOUT)
+                    if status == 201:
+                        appointment_id = json.loads(body)["id"]
+                        status, _, _ = await asyncio.wait_for(http(
+                            port, "POST", f"/api/v1/appointments/{appointment_id}/cancel", cookie), TIMEOUT)
+            ok = status < 500   # 409 = someone else got the slot first, that is fine
+        except (OSError, asyncio.TimeoutError):
+            ok = False
+        samples.append((time.perf_counter() - started, ok))
+
+
+async def load(port, cookie, manifest, connections, seconds, seed):
+    samples = []
+    deadline = time.monotonic() + seconds
+    await asyncio.gather(*[user(port, cookie, manifest, random.Random(seed + n), deadline, samples)
+                           for n in range(connections)])
+    latencies = sorted(s for s, _ in samples)
+    pick = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0  # noqa: E731
+    return {"requests": len(samples), "rps": len(samples) / seconds, "p50_ms": pick(0.5),
+            "p95_ms": pick(0.95), "failed": sum(1 for _, ok in samples if not ok)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", default="small")
+    parser.add_argument("--connections", default="10,100,500", help="comma separated concurrency levels")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--servers", default=",".join(SERVERS))
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    template = os.path.join(tmp, "template.db")
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{template}"
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ.setdefault("PASSWORD_HASH_ITERATIONS", "100000")
+    os.environ["METRICS_ENABLED"] = "False"
+    os.environ["RATE_LIMIT_ENABLED"] = "False"
+
+    from app import app
+    from benchmarks import datagen
+    from database.init_db import init_db
+    init_db(app)
+    with app.app_context():
+        manifest = datagen.generate(args.scale)
+    print(f"data ({args.scale}): {manifest['doctors']} doctors, {manifest['appointments']} appointments; "
+          f"one server process each, {args.seconds:g}s per level")
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    print(f"{'server':<14} {'conns':>6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>9} {'failed':>7}")
+    for name in args.servers.split(","):
+        db_path = os.path.join(tmp, f"{name}.db")
+        # backup API, not a file copy: the template may still have pages in its WAL
+        with sqlite3.connect(template) as src, sqlite3.connect(db_path) as dst:
+            src.backup(dst)
+        port = _free_port()
+        env = dict(os.environ, SQLALCHEMY_DATABASE_URI=f"sqlite:///{db_path}")
+        command = [part.format(port=port) for part in SERVERS[name]]
+        proc = subprocess.Popen([sys.executable, "-m", *command], cwd=root, env=env,
+                                stderr=subprocess.DEVNULL)
+        try:
+            asyncio.run(wait_until_up(port, proc))
+            cookie = asyncio.run(login(port, manifest["patient_emails"][0], manifest["password"]))
+            for connections in [int(c) for c in args.connections.split(",")]:
+                r = asyncio.run(load(port, cookie, manifest, connections, args.seconds, seed=connections))
+                print(f"{name:<14} {connections:>6} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>9.1f} "
+                      f"{r['failed']:>7}")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Login throughput at different password-hashing costs.
+
+    python -m benchmarks.bench_login --costs 100000,300000,600000 --logins 200 --clients 32
+
+For every PBKDF2 iteration count, N patient logins are fired through the real
+/login route from many client threads at once. Prints logins/sec overall and
+per core, plus the median / p95 latency a user would see.
+
+Uses a throw-away SQLite file, never the real instance database.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--costs", default="100000,300000,600000",
+                        help="comma separated PBKDF2 iteration counts")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=32, help="concurrent client threads")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(tmp, 'login.db')}"
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ["RATE_LIMIT_ENABLED"] = "False"   # measure the app, not the limiter
+
+    from app import app
+    from database.init_db import init_db
+    init_db(app)
+    from database import credentials
+    from database.model import db, Patient
+
+    cores = app.config.get("PASSWORD_HASH_WORKERS") or os.cpu_count() or 1
+
+    def login(i):
+        client = app.test_client()
+        started = time.perf_counter()
+        r = client.post("/login", data={"role": "patient", "email": f"bench{i}@login", "password": "secret"})
+        assert r.location.endswith("/patient/dashboard"), r.location
+        return time.perf_counter() - started
+
+    print(f"{'iterations':>10} {'logins/s':>9} {'per core':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for cost in [int(c) for c in args.costs.split(",")]:
+        app.config["PASSWORD_HASH_ITERATIONS"] = cost
+        credentials.init_credentials(app)
+        with app.app_context():
+            Patient.query.delete()
+            password = credentials.hash_password("secret")
+            db.session.add_all([Patient(full_name=f"Bench {i}", email=f"bench{i}@login", password=password,
+                                        phone_no="0", dob=date(2000, 1, 1), address="-")
+                                for i in range(args.logins)])
+            db.session.commit()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.clients) as pool:
+            latencies = sorted(pool.map(login, range(args.logins)))
+        elapsed = time.perf_counter() - started
+
+        rate = args.logins / elapsed
+        print(f"{cost:>10} {rate:>9.1f} {rate / cores:>9.1f} "
+              f"{statistics.median(latencies) * 1000:>8.0f} "
+              f"{latencies[int(len(latencies) * 0.95) - 1] * 1000:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
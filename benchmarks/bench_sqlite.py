@@ -0,0 +1,172 @@
+"""
+Concurrent read/write throughput of SQLite with the default and the tuned
+engine profile (DB_ENGINE_PROFILE, see database/engine.py).
+
+    python -m benchmarks.bench_sqlite --writers 4 --readers 8 --seconds 10
+
+Builds one synthetic database (benchmarks.datagen), copies it per profile,
+then runs writer and reader *processes* (like gunicorn workers) for a fixed
+time:
+    writer - book a free slot and cancel it again (two short transactions)
+    reader - dashboard queries: status counts, a doctor's upcoming list,
+             a patient's history (through the "read" bind when there is one)
+Prints operations/sec, p95 latency and how many operations failed with
+"database is locked".
+
+Uses a throw-away SQLite file, never the real instance database.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import date
+
+
+def _app(db_path, profile):
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
+    os.environ["DB_ENGINE_PROFILE"] = profile
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ["METRICS_ENABLED"] = "False"
+    from app import create_app
+    return create_app()
+
+
+def writer(db_path, profile, seconds, seed, out):
+    app = _app(db_path, profile)
+    from sqlalchemy import select
+    from sqlalchemy.exc import OperationalError
+    from database import slots
+    from database.model import db, Patient, SlotInventory, Department
+
+    rng = random.Random(seed)
+    done = locked = 0
+    latencies = []
+    with app.app_context():
+        patients = db.session.execute(select(Patient.patient_id)).scalars().all()
+        departments = dict(db.session.execute(select(Department.department_id, Department.department_name)).all())
+        db.session.commit()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                slot = db.session.execute(
+                    select(SlotInventory).where(SlotInventory.state == slots.FREE,
+                                                SlotInventory.date >= date.today())
+                    .offset(rng.randint(0, 200)).limit(1)).scalar()
+                db.session.commit()
+                if slot is None:
+                    continue
+                try:
+                    appt = slots.book(rng.choice(patients), slot.doctor_id,
+                                      departments.get(slot.department_id), slot.date, slot.time)
+                except slots.SlotTaken:
+                    continue
+                appt.status = "cancelled"
+                slots.release(appt.doctor_id, appt.date, appt.time)
+                db.session.commit()
+                done += 1
+                latencies.append(time.perf_counter() - started)
+            except OperationalError as e:
+                db.session.rollback()
+                if "locked" not in str(e):
+                    raise
+                locked += 1
+    out.put(("write", done, locked, latencies))
+
+
+def reader(db_path, profile, seconds, seed, out):
+    app = _app(db_path, profile)
+    from sqlalchemy import select, func
+    from sqlalchemy.exc import OperationalError
+    from database.engine import read_engine
+    from database.model import Appointment, Doctor, Patient
+
+    rng = random.Random(seed)
+    done = locked = 0
+    latencies = []
+    with app.app_context():
+        engine = read_engine()
+        with engine.connect() as conn:
+            doctors = conn.execute(select(Doctor.doctor_id)).scalars().all()
+            patients = conn.execute(select(Patient.patient_id)).scalars().all()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    conn.execute(select(Appointment.status, func.count()).group_by(Appointment.status)).all()
+                    conn.execute(select(Appointment)
+                                 .where(Appointment.doctor_id == rng.choice(doctors),
+                                        Appointment.status == "booked")
+                                 .order_by(Appointment.date, Appointment.time).limit(25)).all()
+                    conn.execute(select(Appointment)
+                                 .where(Appointment.patient_id == rng.choice(patients))
+                                 .order_by(Appointment.date.desc()).limit(25)).all()
+                done += 1
+                latencies.append(time.perf_counter() - started)
+            except OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                locked += 1
+    out.put(("read", done, locked, latencies))
+
+
+def run_profile(db_path, profile, writers, readers, seconds):
+    ctx = multiprocessing.get_context("spawn")   # fresh interpreters, like separate workers
+    out = ctx.Queue()
+    procs = [ctx.Process(target=writer, args=(db_path, profile, seconds, n, out)) for n in range(writers)]
+    procs += [ctx.Process(target=reader, args=(db_path, profile, seconds, 1000 + n, out)) for n in range(readers)]
+    for p in procs:
+        p.start()
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    summary = {}
+    for kind in ("write", "read"):
+        rows = [r for r in results if r[0] == kind]
+        latencies = sorted(x for r in rows for x in r[3])
+        summary[kind] = {
+            "ops": sum(r[1] for r in rows),
+            "locked": sum(r[2] for r in rows),
+            "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0,
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", default="small")
+    parser.add_argument("--writers", type=int, default=4, help="writer processes")
+    parser.add_argument("--readers", type=int, default=8, help="reader processes")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--profiles", default="default,tuned")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    template = os.path.join(tmp, "template.db")
+    # build with the default profile so the copy for "default" keeps the rollback journal
+    app = _app(template, "default")
+    from benchmarks import datagen
+    from database.init_db import init_db
+    init_db(app)
+    with app.app_context():
+        manifest = datagen.generate(args.scale)
+    print(f"data ({args.scale}): {manifest['doctors']} doctors, {manifest['appointments']} appointments; "
+          f"{args.writers} writers + {args.readers} readers for {args.seconds:g}s")
+
+    print(f"{'profile':<8} {'writes/s':>9} {'p95 ms':>8} {'locked':>7}   {'reads/s':>9} {'p95 ms':>8} {'locked':>7}")
+    for profile in args.profiles.split(","):
+        db_path = os.path.join(tmp, f"{profile}.db")
+        shutil.copyfile(template, db_path)
+        s = run_profile(db_path, profile, args.writers, args.readers, args.seconds)
+        w, r = s["write"], s["read"]
+        print(f"{profile:<8} {w['ops'] / args.seconds:>9.1f} {w['p95_ms']:>8.1f} {w['locked']:>7}   "
+              f"{r['ops'] / args.seconds:>9.1f} {r['p95_ms']:>8.1f} {r['locked']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+How fast does a new worker come up?
+
+    python -m benchmarks.bench_startup --runs 10
+
+cold : a fresh interpreter doing `from app import app` (gunicorn without --preload)
+warm : create_app() again in a process that already imported everything
+       (what a --preload fork / app-factory restart pays)
+
+Also counts the SQL statements run while booting; it must be 0, schema and
+seed work belong to `flask --app app init-db`.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+COLD = """
+import time, sys
+started = time.perf_counter()
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+statements = []
+event.listen(Engine, "before_cursor_execute", lambda *a: statements.append(a[2]))
+from app import app
+print(time.perf_counter() - started, len(statements))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    env = dict(os.environ, SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(tmp, 'startup.db')}",
+               SECRET_KEY=os.environ.get("SECRET_KEY", "bench"))
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    cold, statements = [], 0
+    for _ in range(args.runs):
+        out = subprocess.run([sys.executable, "-c", COLD], env=env, cwd=root,
+                             capture_output=True, text=True, check=True).stdout.split()
+        cold.append(float(out[0]))
+        statements = max(statements, int(out[1]))
+
+    os.environ.update(env)
+    from app import create_app
+    warm = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        create_app()
+        warm.append(time.perf_counter() - started)
+
+    print(f"cold import : median {statistics.median(cold) * 1000:7.1f} ms   max {max(cold) * 1000:7.1f} ms")
+    print(f"create_app(): median {statistics.median(warm) * 1000:7.1f} ms   max {max(warm) * 1000:7.1f} ms")
+    print(f"SQL statements during boot: {statements}")
+    if statements:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Deterministic synthetic hospital data for benchmarks.
+
+    python -m benchmarks.datagen --scale medium --db /tmp/bench.db
+
+Same --seed (and same day) -> same rows. Everything is written with bulk
+INSERTs, then the slot inventory and the overview counters are filled in
+the same way the migrations do it.
+
+Logins created (all with the password "bench"):
+    admin@gmail.com (admin123), doctor<N>@bench.test, patient<N>@bench.test
+"""
+import argparse
+import os
+import random
+from datetime import date, timedelta
+
+
+PASSWORD = "bench"
+
+# name -> (departments, doctors, patients, days back, days ahead)
+SCALES = {
+    "tiny": (5, 10, 200, 14, 7),
+    "small": (5, 40, 2_000, 30, 14),
+    "medium": (10, 150, 20_000, 90, 30),
+    "large": (20, 500, 100_000, 365, 60),
+}
+
+# appointments per available doctor-day, as a share of its slots
+PAST_FILL, FUTURE_FILL = 0.6, 0.35
+# status mix for past / future appointments
+PAST_STATUS = (("completed", 0.80), ("cancelled", 0.15), ("booked", 0.05))   # booked = no-show
+FUTURE_STATUS = (("booked", 0.85), ("cancelled", 0.15))
+AVAILABLE_DAY_SHARE = 0.7   # doctors work ~5 days out of 7
+
+FIRST_NAMES = ["Aarav", "Priya", "Rohan", "Ananya", "Vikram", "Sara", "Kabir", "Meera", "Arjun", "Isha",
+               "John", "Maria", "David", "Fatima", "Liam", "Chen", "Olivia", "Noah", "Aisha", "Lucas"]
+LAST_NAMES = ["Sharma", "Iyer", "Khan", "Patel", "Reddy", "Singh", "Das", "Gupta", "Smith", "Garcia",
+              "Brown", "Nair", "Wilson", "Mehta", "Chopra", "Lee", "Rao", "Kapoor", "Jones", "Bose"]
+DEPARTMENT_NAMES = ["Cardiology", "Neurology", "Orthopedics", "Pediatrics", "Dermatology", "Oncology",
+                    "Radiology", "Psychiatry", "Urology", "Gastroenterology", "Endocrinology", "Nephrology",
+                    "Pulmonology", "Rheumatology", "Ophthalmology", "ENT", "Gynecology", "Hematology",
+                    "Immunology", "Anesthesiology"]
+DIAGNOSES = ["Hypertension", "Migraine", "Fracture", "Viral fever", "Eczema", "Type 2 diabetes",
+             "Back pain", "Asthma", "Anxiety", "Gastritis"]
+
+
+def _pick(rng, weighted):
+    r, total = rng.random(), 0.0
+    for value, share in weighted:
+        total += share
+        if r < total:
+            return value
+    return weighted[-1][0]
+
+
+def _name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _chunks(rows, size=5000):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def generate(scale="small", seed=42, today=None):
+    """
+    Fill the (empty) database of the current app context. Returns a manifest
+    the scenarios use: counts plus the login emails.
+    """
+    from sqlalchemy import insert, select
+    from database.model import (db, Department, Doctor, Patient, DoctorAvailability,
+                                Appointment, Treatment)
+    from database import credentials, slots, stats, reference, roster
+
+    n_departments, n_doctors, n_patients, days_back, days_ahead = SCALES[scale]
+    rng = random.Random(seed)
+    today = today or date.today()
+    password = credentials.hash_password(PASSWORD)   # one hash, reused: the KDF would dominate otherwise
+    session = db.session
+
+    # departments: keep the five from init_db, add more up to n_departments
+    existing = set(session.execute(select(Department.department_name)).scalars())
+    new_departments = [{"department_name": name, "description": f"Description for {name} department."}
+                       for name in DEPARTMENT_NAMES[:n_departments] if name not in existing]
+    if new_departments:
+        session.execute(insert(Department), new_departments)
+    departments = dict(session.execute(
+        select(Department.department_id, Department.department_name)
+        .where(Department.department_name.in_(DEPARTMENT_NAMES[:n_departments]))).all())
+    department_ids = sorted(departments)
+
+    session.execute(insert(Doctor), [
+        {"full_name": f"Dr {_name(rng)}", "email": f"doctor{i}@bench.test", "password": password,
+         "department_id": department_ids[i % len(department_ids)], "experience": rng.randint(1, 35)}
+        for i in range(n_doctors)])
+    doctors = session.execute(select(Doctor.doctor_id, Doctor.department_id)
+                              .where(Doctor.email.like("%@bench.test"))
+                              .order_by(Doctor.doctor_id)).all()
+
+    for chunk in _chunks(range(n_patients)):
+        session.execute(insert(Patient), [
+            {"full_name": _name(rng), "email": f"patient{i}@bench.test", "password": password,
+             "phone_no": f"+91 9{rng.randint(100000000, 999999999)}",
+             "dob": date(1940, 1, 1) + timedelta(days=rng.randint(0, 30000)),
+             "address": f"{rng.randint(1, 999)} Bench Street"}
+            for i in chunk])
+    patient_ids = session.execute(select(Patient.patient_id)
+                                  .where(Patient.email.like("%@bench.test"))).scalars().all()
+
+    availability, appointments, future_days = [], [], []
+    for doctor_id, department_id in doctors:
+        for offset in range(-days_back, days_ahead + 1):
+            d = today + timedelta(days=offset)
+            if rng.random() > AVAILABLE_DAY_SHARE:
+                continue
+            shift1, shift2 = rng.random() < 0.85, rng.random() < 0.6
+            if not (shift1 or shift2):
+                shift1 = True
+            av = DoctorAvailability(
+                doctor_id=doctor_id, date=d,
+                shift1_enabled=shift1,
+                shift1_start=DoctorAvailability.SHIFT1_START if shift1 else None,
+                shift1_end=DoctorAvailability.SHIFT1_END if shift1 else None,
+                shift2_enabled=shift2,
+                shift2_start=DoctorAvailability.SHIFT2_START if shift2 else None,
+                shift2_end=DoctorAvailability.SHIFT2_END if shift2 else None)
+            availability.append({c: getattr(av, c) for c in (
+                "doctor_id", "date", "shift1_enabled", "shift1_start", "shift1_end",
+                "shift2_enabled", "shift2_start", "shift2_end")})
+            if d >= today:
+                future_days.append((doctor_id, department_id, d, av))
+
+            times = slots.shift_slots(av)
+            taken = rng.sample(times, int(len(times) * (PAST_FILL if d < today else FUTURE_FILL)))
+            for t in sorted(taken):
+                status = _pick(rng, PAST_STATUS if d < today else FUTURE_STATUS)
+                appointments.append({"patient_id": rng.choice(patient_ids), "doctor_id": doctor_id,
+                                     "date": d, "time": t, "department": departments[department_id],
+                                     "status": status})
+
+    for chunk in _chunks(availability):
+        session.execute(insert(DoctorAvailability), chunk)
+    for chunk in _chunks(appointments):
+        session.execute(insert(Appointment), chunk)
+
+    completed = session.execute(select(Appointment.appointment_id)
+                                .where(Appointment.status == "completed")).scalars().all()
+    for chunk in _chunks(completed):
+        session.execute(insert(Treatment), [
+            {"appointment_id": appointment_id, "diagnosis": rng.choice(DIAGNOSES),
+             "prescription": "Rest and fluids", "note": "Follow up in two weeks"}
+            for appointment_id in chunk])
+
+    # derived data: free/booked slots, overview counters and doctor rosters
+    # (the search index is kept up to date by its triggers)
+    for chunk in _chunks(future_days, 2000):
+        slots.fill_days(chunk)
+    stats.recompute()
+    roster.rebuild()
+    session.commit()
+    reference.invalidate_departments()
+    reference.invalidate_doctors()
+
+    return {
+        "scale": scale, "seed": seed, "today": today.isoformat(),
+        "departments": len(department_ids), "doctors": len(doctors), "patients": len(patient_ids),
+        "availability": len(availability), "appointments": len(appointments), "treatments": len(completed),
+        "department_ids": department_ids,
+        "doctor_emails": [f"doctor{i}@bench.test" for i in range(n_doctors)],
+        "patient_emails": [f"patient{i}@bench.test" for i in range(n_patients)],
+        "password": PASSWORD,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=list(SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db", required=True, help="SQLite file to create (must not exist)")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        parser.error(f"{args.db} already exists")
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.abspath(args.db)}"
+    os.environ.setdefault("SECRET_KEY", "bench")
+
+    from app import app
+    from database.init_db import init_db
+    init_db(app)
+    with app.app_context():
+        manifest = generate(args.scale, seed=args.seed)
+    print(", ".join(f"{k}={manifest[k]}" for k in
+                    ("departments", "doctors", "patients", "availability", "appointments", "treatments")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Run the benchmark scenarios and write the results to a JSON file.
+
+    python -m benchmarks.run --scale small --transport both --users 8 --iterations 20
+    python -m benchmarks.run --compare results/old.json results/new.json
+
+Builds a throw-away SQLite database with benchmarks.datagen, then runs every
+scenario (or --scenario NAME ...) with N concurrent users, each doing
+--iterations journeys. "flask" uses the test client, "http" a real threaded
+WSGI server on localhost. For every step we record throughput and latency
+percentiles; the JSON also holds the git commit so runs can be compared.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from benchmarks import datagen
+from benchmarks.scenarios import SCENARIOS, Recorder, FlaskClient, HttpClient
+
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+def summarize(samples, elapsed):
+    steps = {}
+    for step, seconds, ok in samples:
+        steps.setdefault(step, []).append((seconds, ok))
+    result = {}
+    for step, values in sorted(steps.items()):
+        latencies = sorted(s for s, _ in values)
+        result[step] = {
+            "count": len(values),
+            "errors": sum(1 for _, ok in values if not ok),
+            "throughput_rps": round(len(values) / elapsed, 2),
+            **{f"p{p}_ms": round(_percentile(latencies, p) * 1000, 2) for p in PERCENTILES},
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        }
+    return result
+
+
+def run_scenario(make_client, scenario, manifest, users, iterations, seed):
+    recorder = Recorder()
+
+    def user(n):
+        rng = random.Random(seed * 1000 + n)
+        for _ in range(iterations):
+            scenario(make_client(recorder), manifest, rng)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        list(pool.map(user, range(users)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "seconds": round(elapsed, 3),
+        "requests": len(recorder.samples),
+        "throughput_rps": round(len(recorder.samples) / elapsed, 2),
+        "steps": summarize(recorder.samples, elapsed),
+    }
+
+
+def start_server(app):
+    from werkzeug.serving import make_server
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)   # no access log per request
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    print(f"{'transport/scenario/step':<48} {'p50 ms':>16} {'p95 ms':>16} {'change':>8}")
+    for transport, scenarios in new["results"].items():
+        for name, result in scenarios.items():
+            for step, s in result["steps"].items():
+                before = old["results"].get(transport, {}).get(name, {}).get("steps", {}).get(step)
+                if not before:
+                    continue
+                change = (s["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100 if before["p50_ms"] else 0
+                flag = "  <-- slower" if change > 20 else ""
+                print(f"{transport + '/' + name + '/' + step:<48} "
+                      f"{before['p50_ms']:>7} -> {s['p50_ms']:<6} {before['p95_ms']:>7} -> {s['p95_ms']:<6} "
+                      f"{change:>+7.0f}%{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=list(datagen.SCALES), default="small")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scenario", action="append", choices=list(SCENARIOS),
+                        help="run only these (repeatable); default all")
+    parser.add_argument("--transport", choices=["flask", "http", "both"], default="both")
+    parser.add_argument("--users", type=int, default=8, help="concurrent users")
+    parser.add_argument("--iterations", type=int, default=10, help="journeys per user")
+    parser.add_argument("--out", help="results file (default benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    tmp = tempfile.mkdtemp()
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ["RATE_LIMIT_ENABLED"] = "False"   # measure the app, not the limiter
+
+    from app import app
+    from database.init_db import init_db
+    init_db(app)
+
+    started = time.perf_counter()
+    with app.app_context():
+        manifest = datagen.generate(args.scale, seed=args.seed)
+    print(f"data ({args.scale}): {manifest['patients']} patients, {manifest['doctors']} doctors, "
+          f"{manifest['appointments']} appointments in {time.perf_counter() - started:.1f}s")
+
+    transports = ["flask", "http"] if args.transport == "both" else [args.transport]
+    results = {}
+    for transport in transports:
+        server = None
+        if transport == "http":
+            server, base_url = start_server(app)
+            make_client = lambda recorder: HttpClient(base_url, recorder)  # noqa: E731
+        else:
+            make_client = lambda recorder: FlaskClient(app, recorder)  # noqa: E731
+
+        results[transport] = {}
+        for name in args.scenario or list(SCENARIOS):
+            result = run_scenario(make_client, SCENARIOS[name], manifest, args.users, args.iterations, args.seed)
+            results[transport][name] = result
+            print(f"{transport:>5} {name:<16} {result['requests']:>6} req  {result['throughput_rps']:>8.1f} req/s")
+            for step, s in result["steps"].items():
+                print(f"        {step:<28} p50 {s['p50_ms']:>8.1f} ms  p95 {s['p95_ms']:>8.1f} ms"
+                      f"{'  errors ' + str(s['errors']) if s['errors'] else ''}")
+        if server:
+            server.shutdown()
+
+    commit = git_commit()
+    out = args.out or os.path.join(os.path.dirname(__file__), "results",
+                                   f"{datetime.now():%Y%m%d-%H%M%S}-{commit or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({
+            "commit": commit,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": {"scale": args.scale, "seed": args.seed, "users": args.users,
+                       "iterations": args.iterations,
+                       "password_hash_iterations": app.config.get("PASSWORD_HASH_ITERATIONS")},
+            "data": {k: manifest[k] for k in ("departments", "doctors", "patients", "availability",
+                                              "appointments", "treatments")},
+            "results": results,
+        }, f, indent=2)
+    print(f"results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Scripted user journeys for the benchmark runner.
+
+Each scenario is a function (client, manifest, rng) that drives one user
+through the app. Every request goes through client.get / client.post, which
+time it under a step name ("login", "admin:overview", "book:step3", ...).
+
+Two clients with the same interface:
+    FlaskClient  - app.test_client(), no network (measures the app itself)
+    HttpClient   - real HTTP against a WSGI server (adds werkzeug + sockets)
+"""
+import http.cookiejar
+import re
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date, timedelta
+
+
+class Recorder:
+    """Collects (step, seconds, ok) samples from many threads."""
+
+    def __init__(self):
+        self.samples = []   # list.append is atomic, no lock needed
+
+    def add(self, step, seconds, ok):
+        self.samples.append((step, seconds, ok))
+
+
+class Response:
+    def __init__(self, status, location, text):
+        self.status = status
+        self.location = location or ""
+        self.text = text
+
+
+class FlaskClient:
+    def __init__(self, app, recorder):
+        self.client = app.test_client()
+        self.recorder = recorder
+
+    def _call(self, step, method, path, data=None):
+        started = time.perf_counter()
+        r = self.client.open(path, method=method, data=data)
+        elapsed = time.perf_counter() - started
+        self.recorder.add(step, elapsed, r.status_code < 500)
+        return Response(r.status_code, r.location, r.get_data(as_text=True))
+
+    def get(self, step, path):
+        return self._call(step, "GET", path)
+
+    def post(self, step, path, data):
+        return self._call(step, "POST", path, data)
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    def __init__(self, base_url, recorder):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def _call(self, step, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        started = time.perf_counter()
+        try:
+            with self.opener.open(self.base_url + path, data=body, timeout=60) as r:
+                status, location, text = r.status, r.headers.get("Location"), r.read().decode()
+        except urllib.error.HTTPError as e:   # 3xx (redirects not followed) and errors
+            status, location, text = e.code, e.headers.get("Location"), e.read().decode()
+        elapsed = time.perf_counter() - started
+        self.recorder.add(step, elapsed, status < 500)
+        return Response(status, location, text)
+
+    def get(self, step, path):
+        return self._call(step, path)
+
+    def post(self, step, path, data):
+        return self._call(step, path, data)
+
+
+# ------------------------------ scenarios --------------------------------
+
+def _login(client, role, email, password):
+    r = client.post("login", "/login", {"role": role, "email": email, "password": password})
+    return "dashboard" in r.location
+
+
+def admin_tabs(client, manifest, rng):
+    """Admin logs in and walks every dashboard tab, a search and a second page."""
+    if not _login(client, "admin", "admin@gmail.com", "admin123"):
+        return
+    for tab in ("overview", "doctors", "patients", "appointments"):
+        r = client.get(f"admin:{tab}", f"/admin/dashboard/{tab}")
+        cursor = re.search(r"after=([\w%=-]+)", r.text)
+        if cursor and tab != "overview":
+            client.get(f"admin:{tab}:page2", f"/admin/dashboard/{tab}?after={cursor.group(1)}")
+    client.get("admin:search", "/admin/dashboard/patients?q=" + rng.choice(["sha", "pat", "Kh", "98"]))
+
+
+def doctor_tabs(client, manifest, rng):
+    """A doctor logs in and looks at the appointment lists, the patient roster and availability."""
+    if not _login(client, "doctor", rng.choice(manifest["doctor_emails"]), manifest["password"]):
+        return
+    for status in ("upcoming", "completed", "cancelled"):
+        client.get(f"doctor:{status}", f"/doctor/dashboard/appointments/{status}")
+    sort = rng.choice(["last_visit", "visits", "next", "name"])
+    r = client.get("doctor:patients", f"/doctor/dashboard/patients/upcoming?sort={sort}")
+    if "page=2" in r.text:
+        client.get("doctor:patients:page2", f"/doctor/dashboard/patients/upcoming?sort={sort}&page=2")
+    client.get("doctor:availability", "/doctor/availability")
+
+
+def patient_tabs(client, manifest, rng):
+    """A patient logs in and opens overview, treatment history and booking."""
+    if not _login(client, "patient", rng.choice(manifest["patient_emails"]), manifest["password"]):
+        return
+    for tab in ("overview", "treatment_history", "book_appointment"):
+        client.get(f"patient:{tab}", f"/patient/dashboard/{tab}")
+
+
+def book_and_cancel(client, manifest, rng):
+    """The three-step patient_book flow, then cancelling what was booked."""
+    if not _login(client, "patient", rng.choice(manifest["patient_emails"]), manifest["password"]):
+        return
+    department = rng.choice(manifest["department_ids"])
+    client.get("book:start", "/patient/book")
+    r = client.post("book:step1", "/patient/book", {"step": "1", "department": department})
+    doctors = re.findall(r'<option value="(\d+)"', r.text)
+    if not doctors:
+        return
+
+    # try a few doctor/day combinations until one has free slots
+    times = []
+    for _ in range(5):
+        doctor = rng.choice(doctors)
+        day = (date.today() + timedelta(days=rng.randint(1, 7))).isoformat()
+        r = client.post("book:step2", "/patient/book",
+                        {"step": "2", "department": department, "doctor": doctor, "date": day})
+        times = re.findall(r'name="time"\s+value="(\d\d:\d\d)"', r.text)
+        if times:
+            break
+    if not times:
+        return
+
+    client.post("book:step3", "/patient/book", {"step": "3", "department": department, "doctor": doctor,
+                                                 "date": day, "time": rng.choice(times)})
+    r = client.get("patient:overview", "/patient/dashboard/overview")
+    booked = re.findall(r"/patient/appointment/cancel/(\d+)", r.text)
+    if booked:
+        client.post("cancel", f"/patient/appointment/cancel/{rng.choice(booked)}", {})
+
+
+SCENARIOS = {
+    "admin_tabs": admin_tabs,
+    "doctor_tabs": doctor_tabs,
+    "patient_tabs": patient_tabs,
+    "book_and_cancel": book_and_cancel,
+}
@@ -0,0 +1,102 @@
+"""
+Fire N concurrent bookings at ONE slot and check that exactly one wins.
+
+    python -m benchmarks.stress_booking --threads 50
+
+Uses a throw-away SQLite file, never the real instance database. The verdict
+comes from the database (booked appointments, slot state), not from the HTTP
+status codes: a successful booking and a refused one both redirect.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from collections import Counter
+from datetime import date, time, timedelta
+
+
+def prepare(app, n_patients):
+    """n patients and one doctor who works tomorrow morning. Returns the booking date."""
+    from database.model import db, Patient, Doctor
+
+    day = date.today() + timedelta(days=1)
+    with app.app_context():
+        for i in range(n_patients):
+            db.session.add(Patient(full_name=f"Patient {i}", email=f"p{i}@stress", password="pw",
+                                   phone_no="0", dob=date(2000, 1, 1), address="-"))
+        db.session.add(Doctor(full_name="Dr Stress", email="doc@stress", password="pw",
+                              department_id=1, experience=1))
+        db.session.commit()
+        doctor_id = Doctor.query.filter_by(email="doc@stress").one().doctor_id
+
+    doctor = app.test_client()
+    doctor.post("/login", data={"role": "doctor", "email": "doc@stress", "password": "pw"})
+    doctor.post("/doctor/availability", data={f"shift1_{day.isoformat()}": "on"})
+    return doctor_id, day
+
+
+def race(app, n_patients, doctor_id, day, slot="09:00"):
+    """Every patient logs in, then all book the same slot at the same moment. Returns the status codes."""
+    barrier = threading.Barrier(n_patients)
+    results, not_logged_in = [], []
+
+    def book(i):
+        client = app.test_client()
+        login = client.post("/login", data={"role": "patient", "email": f"p{i}@stress", "password": "pw"})
+        if not login.headers.get("Location", "").endswith("/patient/dashboard"):
+            not_logged_in.append(i)
+        barrier.wait()  # everyone fires at the same moment
+        r = client.post("/patient/book", data={"step": "3", "department": "1", "doctor": str(doctor_id),
+                                               "date": day.isoformat(), "time": slot})
+        results.append(r.status_code)
+
+    threads = [threading.Thread(target=book, args=(i,)) for i in range(n_patients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if not_logged_in:
+        raise RuntimeError(f"{len(not_logged_in)} patient(s) could not log in, the race would not be real")
+    return results
+
+
+def outcome(app, doctor_id, day, slot="09:00"):
+    """(booked appointments for the slot, slot inventory state) as the database sees them."""
+    from database.model import Appointment, SlotInventory
+
+    t = time.fromisoformat(slot)
+    with app.app_context():
+        booked = Appointment.query.filter_by(doctor_id=doctor_id, date=day, time=t, status="booked").all()
+        state = SlotInventory.query.filter_by(doctor_id=doctor_id, date=day, time=t).one().state
+        return booked, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.join(tmp, 'stress.db')}"
+    os.environ.setdefault("SECRET_KEY", "stress")
+    # measure the booking race, not the limiter or the password hash
+    os.environ["RATE_LIMIT_ENABLED"] = "False"
+    os.environ.setdefault("PASSWORD_HASH_ITERATIONS", "1000")
+
+    from app import app
+    from database.init_db import init_db
+    init_db(app)
+
+    doctor_id, day = prepare(app, args.threads)
+    results = race(app, args.threads, doctor_id, day)
+    booked, slot_state = outcome(app, doctor_id, day)
+
+    codes = ", ".join(f"{n}x {code}" for code, n in sorted(Counter(results).items()))
+    print(f"{args.threads} concurrent bookings ({codes}) -> {len(booked)} appointment(s), slot is {slot_state}")
+    if len(booked) != 1 or slot_state != "booked":
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,4 +7,93 @@ load_dotenv()
 def config_app(app):
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('SQLALCHEMY_DATABASE_URI')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = os.getenv('SQLALCHEMY_TRACK_MODIFICATIONS') == 'True'
-    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
\ No newline at end of file
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
+
+    # rows per page on the admin dashboard lists (doctors / patients / appointments)
+    app.config['ADMIN_PAGE_SIZE'] = int(os.getenv('ADMIN_PAGE_SIZE', '25'))
+    # rows per page on the doctor's patient roster
+    app.config['ROSTER_PAGE_SIZE'] = int(os.getenv('ROSTER_PAGE_SIZE', '25'))
+
+    # reference-data cache: 'memory' (per worker LRU) or 'redis' (shared by all workers)
+    app.config['CACHE_BACKEND'] = os.getenv('CACHE_BACKEND', 'memory')
+    app.config['CACHE_REDIS_URL'] = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    app.config['CACHE_DEFAULT_TTL'] = int(os.getenv('CACHE_DEFAULT_TTL', '300'))
+    app.config['CACHE_MAX_ENTRIES'] = int(os.getenv('CACHE_MAX_ENTRIES', '1024'))
+    # rendered dashboard pages, stored in the same backend (keyed on data versions)
+    app.config['PAGE_CACHE_ENABLED'] = os.getenv('PAGE_CACHE_ENABLED', 'True') == 'True'
+    app.config['PAGE_CACHE_TTL'] = int(os.getenv('PAGE_CACHE_TTL', '300'))
+
+    # password hashing: PBKDF2-SHA256 cost, and the worker pool that runs it
+    # (workers default to the CPU count, queue to 4x workers)
+    app.config['PASSWORD_HASH_ITERATIONS'] = int(os.getenv('PASSWORD_HASH_ITERATIONS', '600000'))
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', '0')) or None
+    app.config['PASSWORD_HASH_QUEUE'] = int(os.getenv('PASSWORD_HASH_QUEUE', '0')) or None
+    app.config['PASSWORD_HASH_TIMEOUT'] = float(os.getenv('PASSWORD_HASH_TIMEOUT', '10'))
+    # plain passwords one admin upload (/admin/import) may hash; bigger files -> `flask import-data`
+    app.config['IMPORT_WEB_MAX_PLAINTEXT'] = int(os.getenv('IMPORT_WEB_MAX_PLAINTEXT', '100'))
+
+    # rate limits ("N/second|minute|hour", N is also the burst; empty = off) per client
+    # IP, per account and per endpoint. Backend 'memory' (per worker) or 'redis' (shared).
+    # RATE_LIMIT_PROXY_HOPS: reverse proxies that append to X-Forwarded-For (0 = none)
+    app.config['RATE_LIMIT_ENABLED'] = os.getenv('RATE_LIMIT_ENABLED', 'True') == 'True'
+    app.config['RATE_LIMIT_BACKEND'] = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+    app.config['RATE_LIMIT_REDIS_URL'] = os.getenv('RATE_LIMIT_REDIS_URL')       # default CACHE_REDIS_URL
+    app.config['RATE_LIMIT_PROXY_HOPS'] = int(os.getenv('RATE_LIMIT_PROXY_HOPS', '0'))
+    app.config['LOGIN_LIMIT_IP'] = os.getenv('LOGIN_LIMIT_IP', '30/minute')
+    app.config['LOGIN_LIMIT_ACCOUNT'] = os.getenv('LOGIN_LIMIT_ACCOUNT', '10/minute')
+    app.config['LOGIN_LIMIT_ENDPOINT'] = os.getenv('LOGIN_LIMIT_ENDPOINT', '20/second')
+    app.config['BOOKING_LIMIT_IP'] = os.getenv('BOOKING_LIMIT_IP', '120/minute')
+    app.config['BOOKING_LIMIT_ACCOUNT'] = os.getenv('BOOKING_LIMIT_ACCOUNT', '30/minute')
+    app.config['BOOKING_LIMIT_ENDPOINT'] = os.getenv('BOOKING_LIMIT_ENDPOINT', '50/second')
+    # booking waiting room for peaks: patients are let into the booking flow in
+    # arrival order at BOOKING_ADMIT_RATE and then have BOOKING_PASS_SECONDS to book
+    app.config['BOOKING_WAITING_ROOM'] = os.getenv('BOOKING_WAITING_ROOM', 'False') == 'True'
+    app.config['BOOKING_ADMIT_RATE'] = os.getenv('BOOKING_ADMIT_RATE', '5/second')
+    app.config['BOOKING_PASS_SECONDS'] = int(os.getenv('BOOKING_PASS_SECONDS', '300'))
+
+    # request / SQL instrumentation, served at /admin/metrics (Prometheus text)
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', 'True') == 'True'
+    app.config['METRICS_SAMPLES'] = int(os.getenv('METRICS_SAMPLES', '1024'))   # per endpoint, for percentiles
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')                    # bearer token for scrapers
+    app.config['SLOW_QUERY_MS'] = float(os.getenv('SLOW_QUERY_MS', '100'))
+    app.config['SLOW_QUERY_LOG'] = os.getenv('SLOW_QUERY_LOG')                  # file; default is stderr
+
+    # weekly schedule templates are expanded this many days ahead;
+    # `flask availability-purge` drops availability older than the retention
+    app.config['SCHEDULE_HORIZON_DAYS'] = int(os.getenv('SCHEDULE_HORIZON_DAYS', '28'))
+    app.config['AVAILABILITY_RETENTION_DAYS'] = int(os.getenv('AVAILABILITY_RETENTION_DAYS', '30'))
+
+    # background jobs (`flask jobs-worker`): threads per worker process, idle poll,
+    # how long a claimed job is leased, and when past 'booked' appointments expire
+    app.config['JOB_WORKER_THREADS'] = int(os.getenv('JOB_WORKER_THREADS', '2'))
+    app.config['JOB_POLL_SECONDS'] = float(os.getenv('JOB_POLL_SECONDS', '5'))
+    app.config['JOB_LEASE_SECONDS'] = int(os.getenv('JOB_LEASE_SECONDS', '300'))
+    app.config['APPOINTMENT_EXPIRY_DAYS'] = int(os.getenv('APPOINTMENT_EXPIRY_DAYS', '1'))
+
+    # archive (`flask archive-appointments`, nightly job): finished appointments older
+    # than ARCHIVE_AFTER_DAYS move, ARCHIVE_CHUNK per transaction, into the archive
+    # tables - in ARCHIVE_DATABASE_URI (e.g. sqlite:///archive.sqlite3) or the primary db
+    app.config['ARCHIVE_AFTER_DAYS'] = int(os.getenv('ARCHIVE_AFTER_DAYS', '365'))
+    app.config['ARCHIVE_CHUNK'] = int(os.getenv('ARCHIVE_CHUNK', '500'))
+    app.config['ARCHIVE_DATABASE_URI'] = os.getenv('ARCHIVE_DATABASE_URI')
+
+    # database engine profile: 'tuned' (pragmas + pool options below) or 'default'
+    app.config['DB_ENGINE_PROFILE'] = os.getenv('DB_ENGINE_PROFILE', 'tuned')
+    app.config['SQLITE_JOURNAL_MODE'] = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    app.config['SQLITE_SYNCHRONOUS'] = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    app.config['SQLITE_MMAP_SIZE'] = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+    app.config['SQLITE_CACHE_SIZE_KB'] = int(os.getenv('SQLITE_CACHE_SIZE_KB', str(64 * 1024)))
+    # connection pool (per worker process)
+    app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', '10'))
+    app.config['DB_MAX_OVERFLOW'] = int(os.getenv('DB_MAX_OVERFLOW', '20'))
+    app.config['DB_POOL_TIMEOUT'] = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+    app.config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+    app.config['DB_POOL_PRE_PING'] = os.getenv('DB_POOL_PRE_PING', 'True') == 'True'
+    # dashboard reads go to this database (e.g. a replica); unset + SQLite means
+    # the same file through a separate read-only pool
+    app.config['READ_DATABASE_URI'] = os.getenv('READ_DATABASE_URI')
+    # after a user commits a change, their reads stay on the primary this long
+    app.config['READ_YOUR_WRITES_SECONDS'] = float(os.getenv('READ_YOUR_WRITES_SECONDS', '5'))
+    # async serving mode (asgi.py): defaults to the primary URL with its async driver
+    app.config['ASYNC_DATABASE_URI'] = os.getenv('ASYNC_DATABASE_URI')
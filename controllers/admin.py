@@ -1,7 +1,20 @@
 from flask import render_template, request, redirect, url_for, flash, session
 from functools import wraps
 from database.model import db, Admin, Patient, Doctor, Appointment, Blacklist, Department, Doctor_blacklist  # adjust import
-from sqlalchemy import or_
+from database.pagination import keyset_paginate
+from database import queries, slots, stats, reference, search, credentials, routing
+from database.credentials import CredentialBusy
+from database.bulk_import import KINDS as IMPORT_KINDS, import_stream, open_text
+from controllers.pagecache import cached_page
+
+
+# tables each dashboard tab shows (the page cache key includes their versions)
+ADMIN_TAB_TABLES = {
+    'overview': ('patient', 'doctor', 'appointment', 'blacklist', 'department'),
+    'doctors': ('doctor', 'department', 'doctor_blacklist'),
+    'patients': ('patient', 'blacklist'),
+    'appointments': ('appointment', 'patient', 'doctor'),
+}
 
 
 def admin_required(view_func):
@@ -27,6 +40,7 @@ def setup_admin_routes(app):
     # Note: function name 'admin_role_tab' matches url_for(...) usage in the template
     @app.route("/admin/dashboard/<role>")
     @admin_required
+    @cached_page(lambda role: ADMIN_TAB_TABLES.get(role))
     def admin_role_tab(role):
         # allowed tabs
         valid_roles = ('overview', 'doctors', 'patients', 'appointments')
@@ -36,50 +50,57 @@ def setup_admin_routes(app):
 
         # search term (only used for doctors/patients)
         q = request.args.get('q', '').strip()
-        like = f"%{q}%"
 
         context = {'role': role, 'q': q}
 
+        # keyset pagination: ?after=<cursor> / ?before=<cursor>, page size from config
+        after = request.args.get('after')
+        before = request.args.get('before')
+        per_page = request.args.get('per_page', type=int) or app.config.get('ADMIN_PAGE_SIZE', 25)
+        per_page = max(1, min(per_page, 100))
+        # search results are ranked, so they use numbered pages (?page=N) instead
+        page_no = request.args.get('page', 1, type=int)
+
         if role == 'doctors':
             # search doctors by name or email (only if q present)
-            query = Doctor.query
+            query = queries.admin_doctors_query()
             if q:
-                query = query.filter(
-                    or_(
-                        Doctor.full_name.ilike(like),
-                        Doctor.email.ilike(like)
-                    )
-                )
-            context['doctors'] = query.order_by(Doctor.full_name).all()
-            context['departments'] = Department.query.all()
-            context['doctor_blacklisted_ids'] = Doctor_blacklist.query.all()
+                context['page'] = search.search_doctors(q, page=page_no, per_page=per_page, query=query)
+            else:
+                context['page'] = keyset_paginate(query, [Doctor.full_name, Doctor.doctor_id],
+                                                  after=after, before=before, per_page=per_page)
+            context['doctors'] = context['page'].items
+            context['departments'] = reference.departments()
+            context['doctor_blacklisted_ids'] = reference.blacklisted_doctor_ids()
 
         elif role == 'patients':
             # search patients by name, email, or phone (only if q present)
-            query = Patient.query
+            query = queries.admin_patients_query()
             if q:
-                query = query.filter(
-                    or_(
-                        Patient.full_name.ilike(like),
-                        Patient.email.ilike(like),
-                        Patient.phone_no.ilike(like)
-                    )
-                )
-            context['patients'] = query.order_by(Patient.full_name).all()
-            context['blacklisted_ids'] = Blacklist.query.all()
+                context['page'] = search.search_patients(q, page=page_no, per_page=per_page, query=query)
+            else:
+                context['page'] = keyset_paginate(query, [Patient.full_name, Patient.patient_id],
+                                                  after=after, before=before, per_page=per_page)
+            context['patients'] = context['page'].items
+            context['blacklisted_ids'] = reference.blacklisted_patient_ids()
 
         elif role == 'appointments':
-            # keep previous appointments behavior (no search)
-            context['appointments'] = Appointment.query.order_by(Appointment.date.desc()).all()
+            # read-only list, served from the read bind
+            routing.use_read_bind()
+            # newest first (no search)
+            context['page'] = keyset_paginate(queries.admin_appointments_query(),
+                                              [Appointment.date, Appointment.time, Appointment.appointment_id],
+                                              after=after, before=before, per_page=per_page, descending=True)
+            context['appointments'] = context['page'].items
 
         else:  # overview
-            context['counts'] = {
-                'doctors': Doctor.query.count(),
-                'patients': Patient.query.count(),
-                'appointments': Appointment.query.count(),
-                'blacklisted': Blacklist.query.count()
-            }
-            context['departments'] = Department.query.all()
+            # pre-computed counters instead of COUNT(*) scans (see database/stats.py)
+            counts = stats.overview()
+            context['counts'] = counts
+            context['departments'] = [
+                (dept, counts['departments'].get(dept.department_id, 0))
+                for dept in reference.departments()
+            ]
 
         return render_template("admin/dashboard.html", **context)
 
@@ -138,6 +159,7 @@ def setup_admin_routes(app):
             # 3️⃣ Delete the record from the table
             db.session.delete(entry)
             db.session.commit()
+            reference.invalidate_blacklists()
             flash("Patient has been removed from the blacklist.", "success")
 
         # 4️⃣ Redirect back to the Patients tab in the admin dashboard
@@ -168,6 +190,7 @@ def setup_admin_routes(app):
         new_entry = Blacklist(patient_id=patient_id)
         db.session.add(new_entry)
         db.session.commit()
+        reference.invalidate_blacklists()
 
         # 4️⃣ Confirmation message for admin
         flash(f"Patient '{patient.full_name}' has been blacklisted.", "warning")
@@ -193,19 +216,26 @@ def setup_admin_routes(app):
             experience = request.form["experience"]
             department_id = request.form.get("department_id")
 
+            try:
+                password_hash = credentials.hash_password(password)
+            except CredentialBusy:
+                flash("Too many password checks right now, please try again in a moment.", "warning")
+                return redirect(url_for("add_doctor"))
+
             new_doctor = Doctor(
                 full_name=full_name,
                 email=email,
-                password=password,
-                experience=experience,  # default password
+                password=password_hash,
+                experience=experience,
                 department_id=department_id
             )
             db.session.add(new_doctor)
             db.session.commit()
+            reference.invalidate_doctors()
             flash("Doctor added successfully!", "success")
             return redirect(url_for("admin_role_tab", role="doctors"))
 
-        departments = Department.query.all()
+        departments = reference.departments()
         return render_template("admin/parts/add_doctor.html", departments=departments, mode='add')
     
     # ✅ Edit doctor
@@ -216,18 +246,26 @@ def setup_admin_routes(app):
         doctor = Doctor.query.get(doctor_id)
         if not doctor:
             flash("Doctor not found.", "warning")
-            return redirect(url_for("admin_doctors"))
+            return redirect(url_for("admin_role_tab", role="doctors"))
 
         if request.method == "POST":
+            if request.form.get("password"):   # blank = keep the old password
+                try:
+                    doctor.password = credentials.hash_password(request.form["password"])
+                except CredentialBusy:
+                    flash("Too many password checks right now, please try again in a moment.", "warning")
+                    return redirect(url_for("edit_doctor", doctor_id=doctor_id))
             doctor.full_name = request.form["full_name"]
             doctor.email = request.form["email"]
             doctor.phone_no = request.form["phone_no"]
             doctor.department_id = request.form.get("department_id")
+            slots.move_doctor(doctor.doctor_id, doctor.department_id)
             db.session.commit()
+            reference.invalidate_doctors()
             flash("Doctor updated successfully.", "success")
-            return redirect(url_for("admin_doctors"))
+            return redirect(url_for("admin_role_tab", role="doctors"))
 
-        departments = Department.query.all()
+        departments = reference.departments()
         return render_template("admin/parts/add_doctor.html", doctor=doctor, departments=departments, mode='edit')
     
     # ✅ Delete doctor
@@ -239,8 +277,10 @@ def setup_admin_routes(app):
         if not doctor:
             flash("Doctor not found.", "warning")
         else:
+            slots.delete_for_doctor(doctor.doctor_id)
             db.session.delete(doctor)
             db.session.commit()
+            reference.invalidate_doctors()
             flash(f"Doctor '{doctor.full_name}' deleted.", "success")
         return redirect(url_for("admin_role_tab", role="doctors"))
     
@@ -256,6 +296,7 @@ def setup_admin_routes(app):
             entry = Doctor_blacklist(doctor_id=doctor_id)
             db.session.add(entry)
             db.session.commit()
+            reference.invalidate_blacklists()
             flash("Doctor blacklisted.", "warning")
         return redirect(url_for("admin_role_tab", role="doctors"))
     
@@ -270,6 +311,35 @@ def setup_admin_routes(app):
         else:
             db.session.delete(entry)
             db.session.commit()
+            reference.invalidate_blacklists()
             flash("Doctor unblacklisted.", "success")
         return redirect(url_for("admin_role_tab", role="doctors"))
 
+
+# -----------------------------------------------------------------------
+# ------------------- Bulk Import ---------------------------------------
+# -----------------------------------------------------------------------
+
+    # ✅ Bulk import patients / doctors / availability from a CSV or NDJSON upload
+    @app.route("/admin/import", methods=["GET", "POST"])
+    @admin_required
+    def admin_import():
+        """Upload form (GET) and import with a per-row error report (POST)."""
+        report = None
+        if request.method == "POST":
+            kind = request.form.get("kind")
+            upload = request.files.get("file")
+            if kind not in IMPORT_KINDS or not upload or not upload.filename:
+                flash("Choose what to import and a file.", "warning")
+                return redirect(url_for("admin_import"))
+
+            fmt = "ndjson" if upload.filename.endswith((".ndjson", ".jsonl")) else "csv"
+            # plain passwords are hashed on the credential pool, up to a cap that fits in a request
+            report = import_stream(kind, open_text(upload.stream), fmt,
+                                   max_plaintext=app.config.get('IMPORT_WEB_MAX_PLAINTEXT', 100))
+            flash(f"Imported {report.inserted} {kind} "
+                  f"({report.duplicates} duplicates skipped, {report.error_count} errors).", "info")
+
+        return render_template("admin/parts/import.html", kinds=list(IMPORT_KINDS), report=report,
+                               max_plaintext=app.config.get('IMPORT_WEB_MAX_PLAINTEXT', 100))
+
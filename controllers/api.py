@@ -0,0 +1,264 @@
+from datetime import date, datetime, timedelta
+from functools import wraps
+
+from flask import jsonify, request, session
+
+from database.model import db, Patient, Doctor, Appointment
+from database import queries, slots, reference, routing, ratelimit
+from database.credentials import CredentialBusy
+from controllers.routes import check_password
+from controllers.ratelimit import login_retry_after, booking_retry_after, seconds
+
+
+# JSON API for the kiosk / mobile front ends (patients only), under /api/v1.
+#
+# Same session cookie as the web app: POST /api/v1/login, then call the rest.
+# One booking is two calls instead of a page per step:
+#
+#   GET  /api/v1/batch?department=3&days=7     departments + doctors + free slots
+#   POST /api/v1/appointments                  {"doctor_id": 7, "date": "2025-01-31", "time": "09:20"}
+#
+# Payloads are compact: dates are "YYYY-MM-DD", times "HH:MM", free slots are
+# grouped {doctor_id: {date: [time, ...]}}. Every GET carries an ETag, so a
+# client that polls sends If-None-Match and gets an empty 304 when nothing
+# changed. Errors are {"error": "..."} with a 4xx status; 429 (rate limit or
+# booking waiting room) also carries "retry_after" seconds and a Retry-After header.
+
+PREFIX = "/api/v1"
+MAX_DAYS = 30
+BATCH_PARTS = ("departments", "doctors", "slots")
+
+
+def _error(message, status):
+    response = jsonify(error=message)
+    response.status_code = status
+    return response
+
+
+def _too_many(message, retry_after, **extra):
+    response = jsonify(error=message, retry_after=seconds(retry_after), **extra)
+    response.status_code = 429
+    response.headers["Retry-After"] = str(seconds(retry_after))
+    return response
+
+
+def _json(payload, status=200):
+    response = jsonify(payload)
+    response.status_code = status
+    if request.method == "GET":
+        response.headers["Cache-Control"] = "private, no-cache"
+        response.add_etag()
+        response.make_conditional(request)
+    return response
+
+
+def api_patient_required(view_func):
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        if 'user_id' not in session or session.get('role') != 'patient':
+            return _error("login required", 401)
+        return view_func(*args, **kwargs)
+    return wrapper
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_window(args):
+    """start, end from ?from=YYYY-MM-DD&days=N (default today, 7 days)."""
+    start = max(_parse_date(args.get("from")) or date.today(), date.today())
+    try:
+        days = int(args.get("days", 7))
+    except (TypeError, ValueError):
+        days = 7
+    days = max(1, min(days, MAX_DAYS))
+    return start, start + timedelta(days=days - 1)
+
+
+def parse_booking(data):
+    """(doctor_id, date, time) from a booking body, or raises ValueError with the message."""
+    if not isinstance(data, dict):
+        data = {}
+    d = _parse_date(data.get("date"))
+    try:
+        doctor_id = int(data.get("doctor_id"))
+        t = datetime.strptime(data.get("time") or "", "%H:%M").time()
+    except (TypeError, ValueError):
+        raise ValueError("doctor_id, date (YYYY-MM-DD) and time (HH:MM) are required")
+    if d is None or d < date.today():
+        raise ValueError("date must be today or later")
+    return doctor_id, d, t
+
+
+# ------------------------------ payloads ---------------------------------
+
+def department_payload():
+    return [{"id": d.department_id, "name": d.department_name} for d in reference.departments()]
+
+
+def doctor_payload(department_id):
+    blacklisted = reference.blacklisted_doctor_ids()
+    return [{"id": d.doctor_id, "name": d.full_name, "experience": d.experience}
+            for d in reference.doctors_in_department(department_id) if d.doctor_id not in blacklisted]
+
+
+def group_slots(rows):
+    """(doctor_id, date, time) rows -> {doctor_id: {date: [time, ...]}}."""
+    grouped = {}
+    for doctor_id, d, t in rows:
+        grouped.setdefault(str(doctor_id), {}).setdefault(d.isoformat(), []).append(t.strftime("%H:%M"))
+    return grouped
+
+
+def slot_payload(start, end, department_id=None, doctor_id=None):
+    return group_slots(slots.free_slot_window(start, end, department_id=department_id, doctor_id=doctor_id))
+
+
+def appointment_payload(appt):
+    return {"id": appt.appointment_id, "date": appt.date.isoformat(), "time": appt.time.strftime("%H:%M"),
+            "doctor_id": appt.doctor_id, "doctor": appt.doctor.full_name,
+            "department": appt.department, "status": appt.status}
+
+
+def setup_api_routes(app):
+
+    # ✅ ---- Session ----
+    @app.route(PREFIX + "/login", methods=["POST"])
+    def api_login():
+        data = request.get_json(silent=True) or {}
+        email, password = data.get("email"), data.get("password")
+        if not email or not password:
+            return _error("email and password are required", 400)
+        retry_after = login_retry_after("patient", email)
+        if retry_after:
+            return _too_many("too many sign-in attempts", retry_after)
+        try:
+            patient = Patient.query.filter_by(email=email).first()
+            if not check_password(patient, password):
+                return _error("incorrect email or password", 401)
+        except CredentialBusy:
+            response = _error("too many sign-ins right now, try again in a moment", 503)
+            response.headers["Retry-After"] = "1"
+            return response
+        session['user_id'] = patient.patient_id
+        session['role'] = 'patient'
+        return _json({"id": patient.patient_id, "name": patient.full_name})
+
+    @app.route(PREFIX + "/logout", methods=["POST"])
+    def api_logout():
+        session.clear()
+        return _json({"ok": True})
+
+    # ✅ ---- Reference data and free slots ----
+    @app.route(PREFIX + "/departments")
+    @api_patient_required
+    def api_departments():
+        return _json(department_payload())
+
+    @app.route(PREFIX + "/departments/<int:department_id>/doctors")
+    @api_patient_required
+    def api_doctors(department_id):
+        if not reference.department(department_id):
+            return _error("unknown department", 404)
+        return _json(doctor_payload(department_id))
+
+    @app.route(PREFIX + "/slots")
+    @api_patient_required
+    @routing.read_only
+    def api_slots():
+        """?department=ID or ?doctor=ID, plus from / days."""
+        department_id = request.args.get("department", type=int)
+        doctor_id = request.args.get("doctor", type=int)
+        if department_id is None and doctor_id is None:
+            return _error("department or doctor is required", 400)
+        start, end = parse_window(request.args)
+        return _json(slot_payload(start, end, department_id=department_id, doctor_id=doctor_id))
+
+    @app.route(PREFIX + "/batch")
+    @api_patient_required
+    @routing.read_only
+    def api_batch():
+        """
+        Several reads in one round trip.
+        ?include=departments,doctors,slots (default all); doctors and slots
+        need ?department=ID; slots take from / days like /slots.
+        """
+        include = [p for p in request.args.get("include", ",".join(BATCH_PARTS)).split(",") if p]
+        unknown = [p for p in include if p not in BATCH_PARTS]
+        if unknown:
+            return _error(f"unknown include: {', '.join(unknown)}", 400)
+
+        department_id = request.args.get("department", type=int)
+        if ("doctors" in include or "slots" in include) and not reference.department(department_id):
+            return _error("doctors and slots need a valid department", 400)
+
+        result = {}
+        if "departments" in include:
+            result["departments"] = department_payload()
+        if "doctors" in include:
+            result["doctors"] = doctor_payload(department_id)
+        if "slots" in include:
+            start, end = parse_window(request.args)
+            result["slots"] = slot_payload(start, end, department_id=department_id)
+        return _json(result)
+
+    # ✅ ---- Appointments ----
+    @app.route(PREFIX + "/appointments")
+    @api_patient_required
+    def api_appointments():
+        """Upcoming booked appointments (earliest first)."""
+        rows = (queries.patient_upcoming_query(session['user_id'], date.today())
+                .order_by(Appointment.date.asc(), Appointment.time.asc()).all())
+        return _json([appointment_payload(a) for a in rows])
+
+    @app.route(PREFIX + "/appointments", methods=["POST"])
+    @api_patient_required
+    def api_book():
+        admitted, position, wait = ratelimit.admit(f"patient:{session['user_id']}")
+        if not admitted:
+            return _too_many("waiting room", wait, position=position)
+        retry_after = booking_retry_after(session['user_id'])
+        if retry_after:
+            return _too_many("too many booking requests", retry_after)
+        try:
+            doctor_id, d, t = parse_booking(request.get_json(silent=True) or {})
+        except ValueError as e:
+            return _error(str(e), 400)
+
+        doctor = db.session.get(Doctor, doctor_id)
+        if doctor is None or doctor.department_id is None:
+            return _error("unknown doctor", 404)
+
+        try:
+            appt = slots.book(session['user_id'], doctor_id,
+                              reference.department(doctor.department_id).department_name, d, t)
+        except slots.SlotTaken:
+            return _error("slot is no longer free", 409)
+        return _json(appointment_payload(appt), 201)
+
+    @app.route(PREFIX + "/appointments/<int:appointment_id>/cancel", methods=["POST"])
+    @api_patient_required
+    def api_cancel(appointment_id):
+        appt = db.session.get(Appointment, appointment_id)
+        if not appt or appt.patient_id != session['user_id']:
+            return _error("appointment not found", 404)
+        if appt.status != 'booked':
+            return _error("only booked appointments can be cancelled", 409)
+        appt.status = 'cancelled'
+        slots.release(appt.doctor_id, appt.date, appt.time)
+        db.session.commit()
+        return _json(appointment_payload(appt))
+
+    @app.route(PREFIX + "/history")
+    @api_patient_required
+    @routing.read_only
+    def api_history():
+        """Treatments, most recent first."""
+        rows = (queries.patient_treatments_query(session['user_id'])
+                .order_by(Appointment.date.desc(), Appointment.time.desc()).all())
+        return _json([{**appointment_payload(t.appointment), "diagnosis": t.diagnosis,
+                       "prescription": t.prescription, "note": t.note} for t in rows])
@@ -3,6 +3,8 @@ from functools import wraps
 from database.model import db, Admin, Patient, Doctor, Appointment, Blacklist, Department, Doctor_blacklist,Treatment,DoctorAvailability  # adjust import
 from sqlalchemy import or_
 from datetime import date, timedelta, datetime as dt
+from database import queries, slots, schedule, routing, archive, roster
+from controllers.pagecache import cached_page
 
 
 
@@ -21,6 +23,12 @@ def doctor_required(view_func):
 VALID_ROLES = ("appointments", "patients", "availability")  # use consistent spelling
 VALID_STATUSES = ("upcoming", "completed", "cancelled")
 
+# tables each tab shows, for the page cache (availability writes on GET: not cached)
+DOCTOR_TAB_TABLES = {
+    "appointments": ("appointment", "patient", "doctor", "treatment"),
+    "patients": ("appointment", "doctor_patient", "patient", "doctor"),
+}
+
 
 def setup_doctor_routes(app):
     """
@@ -37,6 +45,7 @@ def setup_doctor_routes(app):
     # canonical route: /doctor/dashboard/<role>/<status>
     @app.route("/doctor/dashboard/<role>/<status>")
     @doctor_required
+    @cached_page(lambda role, status: DOCTOR_TAB_TABLES.get(role))
     def doctor_role_tab(role, status):
         # normalize and validate
         role = (role or "").lower()
@@ -50,6 +59,10 @@ def setup_doctor_routes(app):
             flash("Unknown status — showing upcoming.")
             status = "upcoming"
 
+        # completed / cancelled history only reads: serve it from the read bind
+        if role == "appointments" and status in ("completed", "cancelled"):
+            routing.use_read_bind()
+
         # fetch current doctor from session
         doctor_id = session.get("user_id")
         this_doctor = Doctor.query.filter_by(doctor_id=doctor_id).first()
@@ -64,34 +77,46 @@ def setup_doctor_routes(app):
         }
 
         if role == "appointments":
+            # patient names are loaded in the same query (no per-row lazy load)
             if status == "upcoming":
                 # earliest upcoming first
-                appointments = Appointment.query.filter_by(
-                    doctor_id=doctor_id, status="booked"
-                ).order_by(Appointment.date.asc(), Appointment.time.asc()).all()
+                appointments = queries.doctor_appointments_query(doctor_id, "booked") \
+                    .order_by(Appointment.date.asc(), Appointment.time.asc()).all()
             elif status == "completed":
                 # most recent completed first
-                appointments = Appointment.query.filter_by(
-                    doctor_id=doctor_id, status="completed"
-                ).order_by(Appointment.date.desc(), Appointment.time.desc()).all()
+                appointments = queries.doctor_appointments_query(doctor_id, "completed") \
+                    .order_by(Appointment.date.desc(), Appointment.time.desc()).all()
             else:  # cancelled
-                appointments = Appointment.query.filter_by(
-                    doctor_id=doctor_id, status="cancelled"
-                ).order_by(Appointment.date.desc(), Appointment.time.desc()).all()
+                appointments = queries.doctor_appointments_query(doctor_id, "cancelled") \
+                    .order_by(Appointment.date.desc(), Appointment.time.desc()).all()
 
             context["appointments"] = appointments
 
         elif role == "patients":
-            patients = [appt.patient_id for appt in Appointment.query.filter_by(doctor_id=doctor_id).all()]
-            context["patients"] = patients
+            # distinct patients with visit count, last visit and next appointment,
+            # from the maintained roster (database/roster.py): one page per query
+            sort = request.args.get("sort", "last_visit")
+            sort = sort if sort in roster.SORTS else "last_visit"
+            per_page = max(1, min(request.args.get("per_page", type=int) or app.config.get("ROSTER_PAGE_SIZE", 25), 100))
+            context["page"] = roster.page(doctor_id, sort=sort, page=request.args.get("page", 1, type=int),
+                                          per_page=per_page)
+            context["roster"] = context["page"].items
+            # read now, not from the roster row: that one goes stale once its day is over
+            context["upcoming"] = roster.upcoming(doctor_id, [r.patient_id for r in context["roster"]])
+            context["total_patients"] = roster.count(doctor_id)
+            context["sort"] = sort
+            context["today"] = date.today()
 
         else:  # availability
             # Build next 7 days
             days = [date.today() + timedelta(days=i) for i in range(7)]
 
-            # Load existing availability rows for this doctor (only one query)
-            existing = DoctorAvailability.query.filter_by(doctor_id=doctor_id).all()
-            existing_map = {a.date: a for a in existing}
+            # fill the horizon from the weekly template (no-op when up to date)
+            if schedule.ensure_expanded(doctor_id):
+                db.session.commit()
+
+            # Load this doctor's rows for these 7 days only (one range read)
+            existing_map = schedule.availability_window(doctor_id, days[0], days[-1])
 
             # Prepare a simple list the template can iterate.
             # NOTE: replaced old start_time/end_time keys with shift1_* and shift2_*
@@ -118,6 +143,7 @@ def setup_doctor_routes(app):
 
             # add to context so the included partial can render
             context["availability"] = availability
+            context["week"] = schedule.week_form(doctor_id)
 
         # render a single dashboard shell that includes partials
         return render_template("doctor/doctor_dashboard.html", **context)
@@ -125,12 +151,14 @@ def setup_doctor_routes(app):
     
     @app.route("/doctor/patient/<int:patient_id>/history")
     @doctor_required
+    @routing.read_only
     def doctor_patient_history(patient_id):
         """
         Show a patient's visit history and treatment details for the logged-in doctor.
         - loads visits (appointments) for this doctor+patient
         - loads associated Treatment rows in one additional query
         - builds a mapping appointment_id -> treatment for template use
+        - ?include_archive=1 adds the archived visits (database/archive.py)
         """
 
         doctor_id = session.get("user_id")
@@ -160,12 +188,20 @@ def setup_doctor_routes(app):
                 # map them by appointment_id for fast lookup in template
                 treatment_map = {t.appointment_id: t for t in treatments}
 
+        include_archive = request.args.get("include_archive") == "1"
+        if include_archive:
+            archived_visits, archived_treatments = archive.doctor_visits(patient_id, doctor_id)
+            visits += archived_visits
+            treatment_map.update(archived_treatments)
+            visits.sort(key=lambda v: (v.date, v.time), reverse=True)
+
         # prepare context and render
         context = {
             "patient": patient,
             "visits": visits,
             "treatment_map": treatment_map,
             "doctor_id": doctor_id,
+            "include_archive": include_archive,
             "name": getattr(Doctor.query.filter_by(doctor_id=doctor_id).first(), "full_name", "Doctor")
         }
         return render_template("doctor/patient_history.html", **context)
@@ -186,9 +222,12 @@ def setup_doctor_routes(app):
         # next 7 calendar days (today + 6)
         days = [date.today() + timedelta(days=i) for i in range(7)]
 
-        # load existing availability rows for this doctor in a single query
-        existing_rows = DoctorAvailability.query.filter_by(doctor_id=doctor_id).all()
-        existing_map = {r.date: r for r in existing_rows}  # map date -> DB row
+        # generate template days first, so edits below are one-off overrides
+        if schedule.ensure_expanded(doctor_id):
+            db.session.commit()
+
+        # load this doctor's rows for these 7 days only (one range read)
+        existing_map = schedule.availability_window(doctor_id, days[0], days[-1])  # map date -> DB row
 
         if request.method == "POST":
             # loop all days and sync checkboxes -> DB
@@ -229,6 +268,11 @@ def setup_doctor_routes(app):
 
             # commit once after processing all days
             try:
+                # keep the slot inventory in step with the saved shifts
+                department_id = getattr(Doctor.query.get(doctor_id), "department_id", None)
+                for d in days:
+                    slots.sync_day(doctor_id, department_id, d, existing_map.get(d))
+
                 db.session.commit()
                 flash("Availability saved.", "success")
             except Exception:
@@ -253,5 +297,27 @@ def setup_doctor_routes(app):
                 "shift2_end":   (row.shift2_end.strftime("%H:%M")   if row and row.shift2_end   else ""),
             })
 
-        return render_template("doctor/parts/availability.html", availability=availability)
+        return render_template("doctor/parts/availability.html", availability=availability,
+                               week=schedule.week_form(doctor_id))
+
+    # ✅ ---- Weekly schedule template ----
+    @app.route("/doctor/availability/template", methods=["POST"])
+    @doctor_required
+    def doctor_schedule_template():
+        """
+        Save the recurring week: checkbox names t1_<weekday> / t2_<weekday>
+        (0 = Monday). Days are generated from it up to the rolling horizon;
+        "reapply" also rewrites days already generated.
+        """
+        doctor_id = session.get("user_id")
+        shift1 = [i for i in range(7) if f"t1_{i}" in request.form]
+        shift2 = [i for i in range(7) if f"t2_{i}" in request.form]
+        try:
+            schedule.save_template(doctor_id, shift1, shift2, reapply="reapply" in request.form)
+            db.session.commit()
+            flash("Weekly schedule saved.", "success")
+        except Exception:
+            db.session.rollback()
+            flash("Save failed.", "danger")
+        return redirect(url_for("doctor_role_tab", role="availability", status="upcoming"))
 
@@ -0,0 +1,178 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from flask import Response, request, stream_with_context, flash, redirect, url_for
+from sqlalchemy import select
+
+from database.model import db, Appointment, Patient, Doctor, Treatment, ArchivedAppointment, ArchivedTreatment
+from database import reference
+from controllers.admin import admin_required
+
+
+# Streaming report export (admin only).
+# Rows are read in batches (yield_per) and written out as they arrive, so
+# memory stays flat and the download starts with the first batch, whatever
+# the size. Live rows come in (date, time, id) order, which
+# ix_appointment_date_time serves without sorting.
+#
+# ?include_archive=1 also exports appointment_archive / treatment_archive,
+# before the live rows and in id order (the archive may be another database,
+# so it can't be one UNION; names are looked up per batch).
+
+BATCH_SIZE = 1000
+
+EXPORT_COLUMNS = [
+    ("appointment_id", Appointment.appointment_id),
+    ("date", Appointment.date),
+    ("time", Appointment.time),
+    ("status", Appointment.status),
+    ("department", Appointment.department),
+    ("patient_id", Patient.patient_id),
+    ("patient_name", Patient.full_name),
+    ("patient_email", Patient.email),
+    ("doctor_id", Doctor.doctor_id),
+    ("doctor_name", Doctor.full_name),
+    ("diagnosis", Treatment.diagnosis),
+    ("prescription", Treatment.prescription),
+    ("note", Treatment.note),
+]
+FIELD_NAMES = [name for name, _ in EXPORT_COLUMNS]
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+    except ValueError:
+        return None
+
+
+def export_statement(args):
+    """
+    Build the export query from request args:
+    from / to (YYYY-MM-DD), department (id), doctor (id), status.
+    """
+    stmt = (select(*[col for _, col in EXPORT_COLUMNS])
+            .join(Patient, Patient.patient_id == Appointment.patient_id)
+            .join(Doctor, Doctor.doctor_id == Appointment.doctor_id)
+            .outerjoin(Treatment, Treatment.appointment_id == Appointment.appointment_id))
+    stmt = _filtered(stmt, Appointment, args)
+    return stmt.order_by(Appointment.date, Appointment.time, Appointment.appointment_id)
+
+
+def archive_statement(args):
+    """The same filters over the archive tables (names are filled in by iter_archived_rows)."""
+    a, t = ArchivedAppointment, ArchivedTreatment
+    stmt = (select(a.appointment_id, a.date, a.time, a.status, a.department, a.patient_id, a.doctor_id,
+                   t.diagnosis, t.prescription, t.note)
+            .outerjoin(t, t.appointment_id == a.appointment_id))
+    return _filtered(stmt, a, args).order_by(a.appointment_id)
+
+
+def _filtered(stmt, model, args):
+    start, end = _parse_date(args.get("from")), _parse_date(args.get("to"))
+    if start:
+        stmt = stmt.where(model.date >= start)
+    if end:
+        stmt = stmt.where(model.date <= end)
+
+    department = reference.department(args.get("department"))
+    if department:
+        stmt = stmt.where(model.department == department.department_name)
+    if args.get("doctor", type=int):
+        stmt = stmt.where(model.doctor_id == args.get("doctor", type=int))
+    if args.get("status"):
+        stmt = stmt.where(model.status == args.get("status"))
+    return stmt
+
+
+def _plain(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def iter_rows(stmt):
+    # yield_per -> the driver hands back BATCH_SIZE rows at a time (streaming cursor)
+    result = db.session.execute(stmt.execution_options(yield_per=BATCH_SIZE))
+    for batch in result.partitions():
+        yield batch
+
+
+def iter_archived_rows(stmt):
+    """Archive batches as EXPORT_COLUMNS rows: one patient and one doctor lookup per batch."""
+    for batch in iter_rows(stmt):
+        patients = {p.patient_id: p for p in db.session.execute(
+            select(Patient.patient_id, Patient.full_name, Patient.email)
+            .where(Patient.patient_id.in_({r.patient_id for r in batch})))}
+        doctors = dict(db.session.execute(
+            select(Doctor.doctor_id, Doctor.full_name)
+            .where(Doctor.doctor_id.in_({r.doctor_id for r in batch}))).all())
+        rows = []
+        for r in batch:
+            patient = patients.get(r.patient_id)
+            rows.append((r.appointment_id, r.date, r.time, r.status, r.department,
+                         r.patient_id, patient and patient.full_name, patient and patient.email,
+                         r.doctor_id, doctors.get(r.doctor_id), r.diagnosis, r.prescription, r.note))
+        yield rows
+
+
+def export_batches(stmt, archived=None):
+    """Archived rows first (when `archived` is given), then the live ones."""
+    if archived is not None:
+        yield from iter_archived_rows(archived)
+    yield from iter_rows(stmt)
+
+
+def generate_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # the header goes out with the first batch, so the first bytes mean the query is returning rows
+    writer.writerow(FIELD_NAMES)
+
+    for batch in batches:
+        writer.writerows([[_plain(v) for v in row] for row in batch])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()          # no rows: just the header
+
+
+def generate_ndjson(batches):
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(FIELD_NAMES, (_plain(v) for v in row))), separators=(",", ":")) + "\n"
+            for row in batch)
+
+
+EXPORT_FORMATS = {
+    "csv": (generate_csv, "text/csv"),
+    "ndjson": (generate_ndjson, "application/x-ndjson"),
+}
+
+
+def setup_export_routes(app):
+
+    # ✅ ---- Export appointments + treatments (admin only) ----
+    @app.route("/admin/export/appointments.<fmt>")
+    @admin_required
+    def export_appointments(fmt):
+        """
+        Streams appointments joined with patient, doctor and treatment as CSV or NDJSON.
+        ?include_archive=1 adds the archived appointments (database/archive.py).
+        """
+        if fmt not in EXPORT_FORMATS:
+            flash("Unknown export format.", "warning")
+            return redirect(url_for("admin_role_tab", role="appointments"))
+
+        generate, mimetype = EXPORT_FORMATS[fmt]
+        archived = archive_statement(request.args) if request.args.get("include_archive") == "1" else None
+        batches = export_batches(export_statement(request.args), archived)
+        filename = f"appointments-{datetime.now():%Y%m%d-%H%M%S}.{fmt}"
+
+        return Response(stream_with_context(generate(batches)),
+                        mimetype=mimetype,
+                        headers={"Content-Disposition": f"attachment; filename={filename}",
+                                 "X-Accel-Buffering": "no"})  # don't let nginx buffer the stream
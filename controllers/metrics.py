@@ -0,0 +1,237 @@
+import hmac
+import logging
+import os
+import threading
+import time
+import traceback
+from collections import deque, defaultdict
+
+from flask import Response, g, has_request_context, request, session, flash, redirect, url_for
+from flask import before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from database import cache
+
+
+# Per-request instrumentation.
+#
+# For every request we record, per endpoint:
+#   - wall time            (before_request -> teardown_request)
+#   - template render time (before_render_template -> template_rendered signals)
+#   - SQL statement count and SQL time (engine cursor events)
+# Statements slower than SLOW_QUERY_MS are logged to the "hms.sql.slow" logger
+# with their parameters and the line of our code that issued them.
+#
+# /admin/metrics serves the aggregates in Prometheus text format. Percentiles
+# come from the last METRICS_SAMPLES requests of each endpoint; _sum/_count are
+# cumulative. Numbers are per process (each gunicorn worker has its own).
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+slow_log = logging.getLogger("hms.sql.slow")
+
+
+class EndpointStats:
+    def __init__(self, samples):
+        self.count = 0
+        self.sums = defaultdict(float)
+        self.samples = defaultdict(lambda: deque(maxlen=samples))
+        self.statuses = defaultdict(int)
+        self.slow_queries = 0
+
+    def add(self, status, **values):
+        self.count += 1
+        self.statuses[status] += 1
+        for name, value in values.items():
+            self.sums[name] += value
+            self.samples[name].append(value)
+
+
+_stats = {}
+_lock = threading.Lock()
+_samples = 1024
+_slow_seconds = 0.1
+_project_root = os.getcwd()
+
+
+def _quantile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def _endpoint():
+    return request.endpoint or "unmatched"
+
+
+def _call_site():
+    """First frame in our own code (skipping this module and site-packages)."""
+    for frame in reversed(traceback.extract_stack()[:-2]):
+        path = frame.filename
+        if (path.startswith(_project_root) and "site-packages" not in path
+                and not path.endswith(os.sep + "metrics.py")):
+            return f"{os.path.relpath(path, _project_root)}:{frame.lineno} in {frame.name}"
+    return "?"
+
+
+def _short(params, limit=500):
+    text = repr(params)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+# ------------------------------ SQL events -------------------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    elapsed = time.perf_counter() - started
+
+    in_request = has_request_context() and "metrics_started" in g
+    if in_request:
+        g.sql_count += 1
+        g.sql_seconds += elapsed
+
+    if elapsed >= _slow_seconds:
+        endpoint = _endpoint() if has_request_context() else "cli"
+        if in_request:
+            g.slow_queries += 1
+        slow_log.warning("slow query %.1f ms [%s] at %s\n%s\nparams: %s",
+                         elapsed * 1000, endpoint, _call_site(), statement, _short(parameters))
+
+
+# ------------------------------ request hooks -----------------------------
+
+def _on_render_start(sender, template, context, **extra):
+    if "metrics_started" in g:
+        g.render_started = time.perf_counter()
+
+
+def _on_render_done(sender, template, context, **extra):
+    if "metrics_started" in g and g.get("render_started"):
+        g.template_seconds += time.perf_counter() - g.render_started
+        g.render_started = None
+
+
+def _record(endpoint, status, wall, template, sql_count, sql_seconds, slow):
+    with _lock:
+        stats = _stats.get(endpoint)
+        if stats is None:
+            stats = _stats[endpoint] = EndpointStats(_samples)
+        stats.add(status, request_seconds=wall, template_seconds=template,
+                  sql_seconds=sql_seconds, sql_statements=sql_count)
+        stats.slow_queries += slow
+
+
+# ------------------------------ exposition -------------------------------
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+SUMMARIES = [
+    ("request_seconds", "Wall time per request"),
+    ("template_seconds", "Template render time per request"),
+    ("sql_seconds", "Time spent in SQL per request"),
+    ("sql_statements", "SQL statements executed per request"),
+]
+
+
+def render_prometheus():
+    lines = []
+    with _lock:
+        snapshot = {ep: (s.count, dict(s.sums), {k: sorted(v) for k, v in s.samples.items()},
+                         dict(s.statuses), s.slow_queries)
+                    for ep, s in _stats.items()}
+
+    for name, help_text in SUMMARIES:
+        metric = f"hms_{name}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} summary")
+        for ep, (count, sums, samples, _, _) in sorted(snapshot.items()):
+            values = samples.get(name, [])
+            for q in QUANTILES:
+                lines.append(f'{metric}{{endpoint="{_label(ep)}",quantile="{q}"}} {_quantile(values, q):.6g}')
+            lines.append(f'{metric}_sum{{endpoint="{_label(ep)}"}} {sums.get(name, 0):.6g}')
+            lines.append(f'{metric}_count{{endpoint="{_label(ep)}"}} {count}')
+
+    lines.append("# HELP hms_responses_total Responses by endpoint and status code")
+    lines.append("# TYPE hms_responses_total counter")
+    for ep, (_, _, _, statuses, _) in sorted(snapshot.items()):
+        for status, n in sorted(statuses.items()):
+            lines.append(f'hms_responses_total{{endpoint="{_label(ep)}",status="{status}"}} {n}')
+
+    lines.append(f"# HELP hms_slow_queries_total Statements slower than {_slow_seconds * 1000:g} ms")
+    lines.append("# TYPE hms_slow_queries_total counter")
+    for ep, (_, _, _, _, slow) in sorted(snapshot.items()):
+        lines.append(f'hms_slow_queries_total{{endpoint="{_label(ep)}"}} {slow}')
+
+    lines.append("# HELP hms_cache_requests_total Reference-data cache lookups")
+    lines.append("# TYPE hms_cache_requests_total counter")
+    for key, counts in sorted(cache.stats().items()):
+        for outcome in ("hit", "miss"):
+            lines.append(f'hms_cache_requests_total{{key="{_label(key)}",outcome="{outcome}"}} {counts[outcome]}')
+
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def setup_metrics(app):
+    global _samples, _slow_seconds, _project_root
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+    _samples = app.config.get("METRICS_SAMPLES", 1024)
+    _slow_seconds = app.config.get("SLOW_QUERY_MS", 100) / 1000
+    _project_root = app.root_path
+
+    if app.config.get("SLOW_QUERY_LOG"):
+        handler = logging.FileHandler(app.config["SLOW_QUERY_LOG"])
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        slow_log.addHandler(handler)
+
+    # on the Engine class, so every engine / bind is covered
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    before_render_template.connect(_on_render_start, app)
+    template_rendered.connect(_on_render_done, app)
+
+    @app.before_request
+    def _metrics_start():
+        g.metrics_started = time.perf_counter()
+        g.template_seconds = 0.0
+        g.sql_count = 0
+        g.sql_seconds = 0.0
+        g.slow_queries = 0
+
+    @app.after_request
+    def _metrics_status(response):
+        g.status_code = response.status_code
+        return response
+
+    @app.teardown_request
+    def _metrics_finish(exc):
+        if "metrics_started" not in g:
+            return
+        _record(_endpoint(), g.get("status_code", 500),
+                time.perf_counter() - g.metrics_started, g.template_seconds,
+                g.sql_count, g.sql_seconds, g.slow_queries)
+
+    # ✅ ---- Metrics (admin session, or METRICS_TOKEN bearer for scrapers) ----
+    @app.route("/admin/metrics")
+    def admin_metrics():
+        token = app.config.get("METRICS_TOKEN")
+        sent = request.headers.get("Authorization", "")
+        # constant-time compare: response timing must not leak the token prefix
+        if not (token and hmac.compare_digest(sent.encode(), f"Bearer {token}".encode())):
+            if session.get("role") != "admin":
+                flash("Access denied: Admins only.")
+                return redirect(url_for("login"))
+        return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
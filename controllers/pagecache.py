@@ -0,0 +1,112 @@
+import hashlib
+from datetime import date, datetime, time, timezone
+from functools import wraps
+
+from flask import Response, current_app, g, get_flashed_messages, request, session
+
+from database import cache, versions
+
+
+# Cache for rendered dashboard pages, with HTTP revalidation.
+#
+#   @app.route("/admin/dashboard/<role>")
+#   @admin_required
+#   @cached_page(lambda role: ADMIN_TAB_TABLES.get(role))
+#   def admin_role_tab(role): ...
+#
+# The dependency function gets the view's URL arguments and returns the
+# tables the page shows (None = don't cache this one). The cache key is
+# built from the endpoint, URL arguments, query string, the user's role and
+# id, today's date and the data versions of those tables (database/versions.py),
+# so any write to a table the page shows produces a new key - no explicit
+# invalidation. The same key is the ETag: a browser revalidating with
+# If-None-Match gets a 304 before the view (or any query besides the
+# version read) runs.
+#
+# Only GET responses with status 200 are stored. A page that displays flash
+# messages is rendered (and not stored) while a message is waiting; pages
+# that never display them are served from cache regardless.
+
+CACHE_NAME = "page"   # hit / miss counters in /admin/metrics
+
+
+def _key(tables, kwargs):
+    stamps = versions.current(tables)
+    parts = [
+        request.endpoint,
+        repr(sorted(kwargs.items())),
+        repr(sorted(request.args.items(multi=True))),
+        str(session.get("role")),
+        str(session.get("user_id")),
+        date.today().isoformat(),
+        repr(sorted((t, stamps.get(t, (0, None))[0]) for t in tables)),
+    ]
+    digest = hashlib.sha1("\x1f".join(parts).encode()).hexdigest()
+    # pages depend on today's date too, so they are never older than local midnight
+    midnight = datetime.combine(date.today(), time()).astimezone(timezone.utc).replace(tzinfo=None)
+    last_modified = max([at for _, at in stamps.values() if at is not None] + [midnight])
+    return digest, last_modified
+
+
+def _not_modified(etag, last_modified):
+    # If-None-Match wins when both are sent (RFC 9110)
+    if request.if_none_match:
+        return etag in request.if_none_match
+    since = request.if_modified_since
+    return since is not None and last_modified <= since.replace(tzinfo=None)
+
+
+def _headers(response, etag, last_modified):
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # always revalidate; the page is per user
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.vary.add("Cookie")
+    return response
+
+
+def cached_page(dependencies):
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get("PAGE_CACHE_ENABLED", True) or request.method != "GET":
+                return view_func(*args, **kwargs)
+            tables = dependencies(**kwargs)
+            if not tables:
+                return view_func(*args, **kwargs)
+
+            etag, last_modified = _key(tables, kwargs)
+            found, entry = cache.get(f"{CACHE_NAME}:{etag}", name=CACHE_NAME)
+            # a page that shows flash messages must be rendered while one is waiting
+            shows_flashes = entry[1] if found else True
+            if not (session.get("_flashes") and shows_flashes):
+                if _not_modified(etag, last_modified):
+                    return _headers(Response(status=304), etag, last_modified)
+                if found:
+                    return _headers(Response(entry[0], mimetype="text/html"), etag, last_modified)
+
+            g.page_reads_flashes = g.page_showed_flashes = False
+            response = current_app.make_response(view_func(*args, **kwargs))
+            if response.status_code != 200 or response.direct_passthrough or g.page_showed_flashes:
+                return response
+            cache.put(f"{CACHE_NAME}:{etag}", (response.get_data(as_text=True), g.page_reads_flashes),
+                      current_app.config.get("PAGE_CACHE_TTL", 300))
+            return _headers(response, etag, last_modified)
+        return wrapper
+    return decorator
+
+
+def _tracking_get_flashed_messages(*args, **kwargs):
+    messages = get_flashed_messages(*args, **kwargs)
+    g.page_reads_flashes = True
+    if messages:
+        g.page_showed_flashes = True
+    return messages
+
+
+def setup_page_cache(app):
+
+    @app.context_processor
+    def track_flashes():
+        # templates call this instead of Flask's own, so we know which pages show flashes
+        return {"get_flashed_messages": _tracking_get_flashed_messages}
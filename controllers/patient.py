@@ -4,15 +4,17 @@ from database.model import db, Admin, Patient, Doctor, Appointment, Blacklist, D
 from sqlalchemy import or_
 from datetime import date, timedelta, datetime as dt
 from datetime import datetime, date, timedelta
-
-def generate_slots(start, end):
-    slots = []
-    cur = datetime.combine(date.today(), start)
-    end_dt = datetime.combine(date.today(), end)
-    while cur + timedelta(minutes=20) <= end_dt:
-        slots.append(cur.time())
-        cur += timedelta(minutes=20)
-    return slots
+from database import queries, slots, reference, routing, archive
+from controllers.pagecache import cached_page
+from controllers.ratelimit import booking_gate
+
+# tables each dashboard tab shows, for the page cache
+PATIENT_TAB_TABLES = {
+    'overview': ('appointment', 'patient', 'doctor'),
+    'treatment_history': ('appointment', 'treatment', 'patient', 'doctor',
+                          'appointment_archive', 'treatment_archive'),
+    'book_appointment': ('department', 'patient'),
+}
 
 def patient_required(view_func):
     @wraps(view_func)
@@ -40,6 +42,7 @@ def setup_patient_routes(app):
 
     @app.route("/patient/dashboard/<role>")
     @patient_required
+    @cached_page(lambda role: PATIENT_TAB_TABLES.get(role))
     def patient_role_tab(role):
         # make sure logged in
         patient_id = session.get('user_id')
@@ -47,6 +50,10 @@ def setup_patient_routes(app):
             flash("Patient not logged in.", "danger")
             return redirect(url_for('login'))
 
+        # treatment history only reads: serve it from the read bind
+        if role == 'treatment_history':
+            routing.use_read_bind()
+
         # load patient for header
         patient = Patient.query.get(patient_id)
         name = patient.full_name if patient else "Patient"
@@ -55,34 +62,29 @@ def setup_patient_routes(app):
         appointments = []
         treatments = []
         departments = []
+        include_archive = request.args.get('include_archive') == '1'
 
         # overview (upcoming appointments)
         if role == 'overview':
             today = date.today()
-            appointments = (Appointment.query
-                            .filter(Appointment.patient_id == patient_id,
-                                    Appointment.status == 'booked',
-                                    Appointment.date >= today)
-                            .join(Doctor)
+            appointments = (queries.patient_upcoming_query(patient_id, today)
                             .order_by(Appointment.date.asc(), Appointment.time.asc())
                             .all())
 
         # treatment history
         elif role == 'treatment_history':
-            treatments = (Treatment.query
-                          .join(Appointment, Treatment.appointment_id == Appointment.appointment_id)
-                          .join(Doctor, Appointment.doctor_id == Doctor.doctor_id)
-                          .filter(Appointment.patient_id == patient_id)
+            treatments = (queries.patient_treatments_query(patient_id)
                           .order_by(Appointment.date.desc(), Appointment.time.desc())
                           .all())
+            # older visits are in the archive (database/archive.py): only read it when asked
+            if include_archive:
+                treatments += archive.patient_treatments(patient_id)
+                treatments.sort(key=lambda t: (t.appointment.date, t.appointment.time), reverse=True)
 
         # book appointment -> load departments so template can render dropdown
         elif role == 'book_appointment':
-            # load all departments (ordered by name)
-            departments = Department.query.order_by(Department.department_name).all()
-
-            # DEBUG: print to terminal so you can see what was loaded
-            print("DEBUG: departments loaded:", [(d.department_id, d.department_name) for d in departments])
+            # all departments ordered by name (cached, see database/reference.py)
+            departments = reference.departments()
 
         # always pass these into template (keeps template simple)
         return render_template('patient/patient_dashboard.html',
@@ -91,6 +93,7 @@ def setup_patient_routes(app):
                               appointments=appointments,
                               patient=patient,
                               treatments=treatments,
+                              include_archive=include_archive,
                               departments=departments)
 
     @app.route("/patient/appointment/cancel/<int:appointment_id>", methods=['POST'])
@@ -123,6 +126,8 @@ def setup_patient_routes(app):
 
         try:
             appt.status = 'cancelled'
+            # give the slot back to the inventory in the same transaction
+            slots.release(appt.doctor_id, appt.date, appt.time)
             db.session.commit()
             flash("Appointment cancelled successfully.", "success")
         except Exception:
@@ -172,13 +177,14 @@ def setup_patient_routes(app):
     # ------------------------- Book Appointment -----------------------------
     @app.route("/patient/book", methods=["GET", "POST"])
     @patient_required
+    @booking_gate
     def patient_book():
         patient_id = session.get("user_id")
 
         # Step 1 — show department list
         if request.method == "GET":
-            depts = Department.query.all()
-            return render_template("patient/parts/book_step1.html", depts=depts)
+            departments = reference.departments()
+            return render_template("patient/parts/book_step1.html", departments=departments)
 
         # POST – step handling
         step = request.form.get("step")
@@ -186,7 +192,7 @@ def setup_patient_routes(app):
         # Step 2 — chosen department → show doctors + date field
         if step == "1":
           dept_id = int(request.form["department"])
-          doctors = Doctor.query.filter_by(department_id=dept_id).all()
+          doctors = reference.doctors_in_department(dept_id)
 
           # If no doctors, show a message and return same page
           if not doctors:
@@ -206,32 +212,12 @@ def setup_patient_routes(app):
             date_str = request.form["date"]
             d = datetime.strptime(date_str, "%Y-%m-%d").date()
 
-            # load availability row
-            av = DoctorAvailability.query.filter_by(doctor_id=doctor_id, date=d).first()
-            if not av:
+            # free slots come straight from the slot inventory (one indexed read)
+            available = slots.free_slots(doctor_id, d)
+            if not available and not DoctorAvailability.query.filter_by(doctor_id=doctor_id, date=d).first():
                 flash("Doctor not available on this date.", "warning")
                 return redirect(url_for("patient_role_tab", role="book_appointment"))
 
-            # morning shift slots
-            slots = []
-            if av.shift1_enabled:
-                start = av.shift1_start or DoctorAvailability.SHIFT1_START
-                end = av.shift1_end or DoctorAvailability.SHIFT1_END
-                slots += generate_slots(start, end)
-
-            # afternoon shift slots
-            if av.shift2_enabled:
-                start = av.shift2_start or DoctorAvailability.SHIFT2_START
-                end = av.shift2_end or DoctorAvailability.SHIFT2_END
-                slots += generate_slots(start, end)
-
-            # Remove booked slots
-            booked = Appointment.query.filter_by(
-                doctor_id=doctor_id, date=d, status="booked"
-            ).all()
-            booked_times = {b.time for b in booked}
-            available = [t for t in slots if t not in booked_times]
-
             return render_template("patient/parts/book_step3.html",
                                   dept_id=dept_id,
                                   doctor_id=doctor_id,
@@ -248,18 +234,58 @@ def setup_patient_routes(app):
             d = datetime.strptime(date_str, "%Y-%m-%d").date()
             t = datetime.strptime(time_str, "%H:%M").time()
 
-            new_appt = Appointment(
-                patient_id=patient_id,
-                doctor_id=doctor_id,
-                date=d,
-                time=t,
-                department=Department.query.get(dept_id).department_name,
-                status="booked"
-            )
-            db.session.add(new_appt)
-            db.session.commit()
+            # atomic claim: only one of several concurrent requests gets the slot
+            try:
+                slots.book(patient_id, doctor_id, reference.department(dept_id).department_name, d, t)
+            except slots.SlotTaken:
+                # lost the race -> show the slots that are still free
+                flash("Sorry, that slot was just taken. Please pick another one.", "warning")
+                return render_template("patient/parts/book_step3.html",
+                                      dept_id=dept_id,
+                                      doctor_id=doctor_id,
+                                      date_str=date_str,
+                                      slots=slots.free_slots(doctor_id, d))
 
             flash("Appointment booked!", "success")
             return redirect(url_for("patient_role_tab", role="overview"))
+
+    # ------------------------- Next available slot -----------------------------
+    @app.route("/patient/book/next-available")
+    @patient_required
+    def patient_next_available():
+        """
+        Earliest free slots across every doctor of a department.
+        Query string: department (required), from=YYYY-MM-DD, days (1-30),
+        shift=morning|afternoon, min_experience, limit (max 50).
+        """
+        dept_id = request.args.get("department", type=int)
+        department = reference.department(dept_id)
+        if not department:
+            flash("Please choose a department.", "warning")
+            return redirect(url_for("patient_role_tab", role="book_appointment"))
+
+        try:
+            start = datetime.strptime(request.args.get("from", ""), "%Y-%m-%d").date()
+        except ValueError:
+            start = date.today()
+        start = max(start, date.today())
+
+        days = max(1, min(request.args.get("days", 30, type=int), 30))
+        limit = max(1, min(request.args.get("limit", 10, type=int), 50))
+        shift = request.args.get("shift") or None
+        min_experience = request.args.get("min_experience", type=int)
+
+        found = slots.earliest_free_slots(department.department_id,
+                                          start=start,
+                                          end=start + timedelta(days=days - 1),
+                                          shift=shift,
+                                          min_experience=min_experience,
+                                          limit=limit)
+
+        return render_template("patient/parts/next_available.html",
+                              department=department,
+                              found=found,
+                              shift=shift,
+                              days=days)
         
 
@@ -0,0 +1,92 @@
+import math
+from functools import wraps
+
+from flask import current_app, flash, make_response, redirect, render_template, request, session, url_for
+
+from database import ratelimit
+
+
+# Where the limits from database/ratelimit.py apply.
+#
+#   login   : per client IP, per account (role + email) and for the whole
+#             endpoint - checked before the user is looked up, so a
+#             credential-stuffing burst never reaches the database.
+#   booking : per IP, per patient and for the endpoint on every booking
+#             POST, plus the waiting room (BOOKING_WAITING_ROOM) in front of
+#             the whole booking flow.
+#
+# Rules come from config (LOGIN_LIMIT_*, BOOKING_LIMIT_*); an empty rule
+# turns that bucket off. The rule builders take plain values so asgi.py can
+# use them too.
+
+
+def client_ip_from(remote_addr, forwarded_for, hops):
+    """
+    The client's address. hops = how many reverse proxies in front of us
+    append to X-Forwarded-For (RATE_LIMIT_PROXY_HOPS); 0 trusts nothing.
+    """
+    route = [part.strip() for part in (forwarded_for or "").split(",") if part.strip()]
+    if hops and len(route) >= hops:
+        return route[-hops]
+    return remote_addr or "unknown"
+
+
+def login_rules(config, ip, role, email):
+    return [
+        (f"login:ip:{ip}", config.get("LOGIN_LIMIT_IP")),
+        (f"login:account:{role}:{(email or '').strip().lower()}", config.get("LOGIN_LIMIT_ACCOUNT")),
+        ("login:endpoint", config.get("LOGIN_LIMIT_ENDPOINT")),
+    ]
+
+
+def booking_rules(config, ip, patient_id):
+    return [
+        (f"booking:ip:{ip}", config.get("BOOKING_LIMIT_IP")),
+        (f"booking:account:{patient_id}", config.get("BOOKING_LIMIT_ACCOUNT")),
+        ("booking:endpoint", config.get("BOOKING_LIMIT_ENDPOINT")),
+    ]
+
+
+def client_ip():
+    return client_ip_from(request.remote_addr, request.headers.get("X-Forwarded-For"),
+                          current_app.config.get("RATE_LIMIT_PROXY_HOPS", 0))
+
+
+def login_retry_after(role, email):
+    """Seconds to wait before this login attempt is allowed, or None."""
+    return ratelimit.check(login_rules(current_app.config, client_ip(), role, email))
+
+
+def booking_retry_after(patient_id):
+    return ratelimit.check(booking_rules(current_app.config, client_ip(), patient_id))
+
+
+def seconds(wait):
+    """Whole seconds for messages and Retry-After (at least 1)."""
+    return max(1, math.ceil(wait))
+
+
+def booking_gate(view_func):
+    """
+    For the web booking flow (after @patient_required): the waiting room on
+    every request, the booking limits on POSTs.
+    """
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        patient_id = session.get("user_id")
+        admitted, position, wait = ratelimit.admit(f"patient:{patient_id}")
+        if not admitted:
+            response = make_response(render_template("patient/parts/waiting_room.html",
+                                                     position=position, wait=seconds(wait),
+                                                     refresh=min(seconds(wait), 10)), 503)
+            response.headers["Retry-After"] = str(seconds(wait))
+            return response
+
+        if request.method == "POST":
+            retry_after = booking_retry_after(patient_id)
+            if retry_after:
+                flash(f"Too many booking requests right now, please try again in {seconds(retry_after)} seconds.",
+                      "warning")
+                return redirect(url_for("patient_role_tab", role="book_appointment"))
+        return view_func(*args, **kwargs)
+    return wrapper
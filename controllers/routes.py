@@ -1,6 +1,24 @@
 from flask import render_template, request, redirect, url_for,flash, session
 from database.model import db,Admin, Patient, Doctor, Blacklist
 from datetime import datetime
+from database import reference, credentials
+from database.credentials import CredentialBusy
+from controllers.ratelimit import login_retry_after, seconds
+
+
+def check_password(user, password):
+    """
+    Verify on the credential pool. Legacy plaintext (or old-cost) passwords
+    are re-hashed and saved on the first successful login. An unknown user
+    costs the same KDF run, so timing doesn't tell which accounts exist.
+    """
+    ok, new_hash = credentials.verify_password(user.password if user else None, password)
+    if not user:
+        return False
+    if new_hash:
+        user.password = new_hash
+        db.session.commit()
+    return ok
 
 
 # Home: show patient login by default
@@ -25,31 +43,40 @@ def setup_routes(app):
             password = request.form.get("password")
 
             if email and password:
-                if role == "admin":
-                    this_user = Admin.query.filter_by(username=email).first()
-                    if this_user and this_user.password == password:
-                        session['user_id'] = this_user.username
-                        session['role'] = 'admin'
-                        return redirect(url_for("admin_dashboard", role=role))
-                    flash("Incorrect admin or password")
+                # throttled per IP / account / endpoint before any lookup
+                retry_after = login_retry_after(role, email)
+                if retry_after:
+                    flash(f"Too many sign-in attempts, please try again in {seconds(retry_after)} seconds.")
                     return redirect(url_for("role_tab", role=role, tab="login"))
-
-                elif role == "doctor":
-                    this_user = Doctor.query.filter_by(email=email).first()
-                    if this_user and this_user.password == password:
-                        session['user_id'] = this_user.doctor_id
-                        session['role'] = 'doctor'
-                        return redirect(url_for("doctor_dashboard"))
-                    flash("Incorrect doctor or password")
-                    return redirect(url_for("role_tab", role=role, tab="login"))
-
-                else:  # patient
-                    this_user = Patient.query.filter_by(email=email).first()
-                    if this_user and this_user.password == password:
-                        session['user_id'] = this_user.patient_id
-                        session['role'] = 'patient'
-                        return redirect(url_for("patient_dashboard"))
-                    flash("Incorrect email or password")
+                try:
+                    if role == "admin":
+                        this_user = Admin.query.filter_by(username=email).first()
+                        if check_password(this_user, password):
+                            session['user_id'] = this_user.username
+                            session['role'] = 'admin'
+                            return redirect(url_for("admin_dashboard", role=role))
+                        flash("Incorrect admin or password")
+                        return redirect(url_for("role_tab", role=role, tab="login"))
+
+                    elif role == "doctor":
+                        this_user = Doctor.query.filter_by(email=email).first()
+                        if check_password(this_user, password):
+                            session['user_id'] = this_user.doctor_id
+                            session['role'] = 'doctor'
+                            return redirect(url_for("doctor_dashboard"))
+                        flash("Incorrect doctor or password")
+                        return redirect(url_for("role_tab", role=role, tab="login"))
+
+                    else:  # patient
+                        this_user = Patient.query.filter_by(email=email).first()
+                        if check_password(this_user, password):
+                            session['user_id'] = this_user.patient_id
+                            session['role'] = 'patient'
+                            return redirect(url_for("patient_dashboard"))
+                        flash("Incorrect email or password")
+                        return redirect(url_for("role_tab", role=role, tab="login"))
+                except CredentialBusy:
+                    flash("Too many sign-ins right now, please try again in a moment.")
                     return redirect(url_for("role_tab", role=role, tab="login"))
 
             flash("Please enter email and password")
@@ -82,7 +109,7 @@ def setup_routes(app):
 
             if role == "patient":
                 existing_user = Patient.query.filter_by(email=email).first()
-                balcklist_entry = Blacklist.query.filter_by(patient_id=existing_user.patient_id).first() if existing_user else None
+                balcklist_entry = existing_user and existing_user.patient_id in reference.blacklisted_patient_ids()
                 if existing_user:
                     flash("Email already registered")
                     return redirect(url_for("role_tab", role=role, tab="register"))
@@ -90,10 +117,16 @@ def setup_routes(app):
                     flash("You are blacklisted and cannot register.")
                     return redirect(url_for("role_tab", role=role, tab="register"))
 
+                try:
+                    password_hash = credentials.hash_password(password)
+                except CredentialBusy:
+                    flash("Too many sign-ups right now, please try again in a moment.")
+                    return redirect(url_for("role_tab", role=role, tab="register"))
+
                 new_patient = Patient(
                     full_name=full_name,
                     email=email,
-                    password=password,  # consider hashing passwords (see note below)
+                    password=password_hash,
                     phone_no=phone_no,
                     dob=dob,             # pass a Python date object (or None)
                     address=address
@@ -1,4 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 
+from database.routing import RoutingSession
 
-db = SQLAlchemy()
\ No newline at end of file
+
+# RoutingSession sends the SELECTs of read-only views to the "read" bind
+db = SQLAlchemy(session_options={"class_": RoutingSession})
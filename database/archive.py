@@ -0,0 +1,252 @@
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import click
+from flask import current_app
+from sqlalchemy import func, inspect, insert, select, delete
+from sqlalchemy.orm import contains_eager
+
+from database.model import db, Appointment, Treatment, ArchivedAppointment, ArchivedTreatment, DoctorPatient
+from database import versions, roster
+
+
+# Archive for old appointments.
+#
+# `appointment` and `treatment` only grow, and every dashboard query walks
+# their indexes. `flask archive-appointments` (and the nightly
+# archive_appointments job) moves finished appointments - completed or
+# cancelled, older than ARCHIVE_AFTER_DAYS - together with their treatments
+# into `appointment_archive` / `treatment_archive`. Those tables live on the
+# "archive" bind (database/engine.py): ARCHIVE_DATABASE_URI, e.g. a separate
+# SQLite file, or the primary database when it is unset.
+#
+# The mover works in chunks of ARCHIVE_CHUNK appointments, each in two short
+# transactions: copy the rows into the archive (rows already there, unchanged,
+# are skipped), then delete them from the live tables. If it stops between
+# the two, the next run copies nothing new and finishes the delete, so no row
+# is lost or archived twice. The archive is keyed on the live ids, so
+# `appointment` / `treatment` never reuse one (AUTOINCREMENT); an archived row
+# with the same id but other data stops the mover with ArchiveConflict
+# instead of deleting the live row. No transaction holds the write lock for more than
+# one chunk. Only the rows that were copied are deleted: an appointment that
+# got a treatment after its chunk was copied stays live (its archive copy is
+# dropped again) and goes with the next run.
+#
+# Reads: the history views only look at the archive when asked
+# (?include_archive=1), through patient_treatments() / doctor_visits() below.
+# The admin overview counters keep counting archived appointments - the
+# mover's DELETEs don't go through the flush hook, and stats.recompute()
+# adds counts() back in.
+
+ARCHIVE_BIND = "archive"
+ARCHIVE_CHUNK = 500
+ARCHIVED_STATUSES = ("completed", "cancelled")
+
+
+class ArchiveConflict(RuntimeError):
+    """A live row has the id of a different archived row; nothing of its chunk was moved."""
+
+
+def engine():
+    return db.engines.get(ARCHIVE_BIND, db.engine)
+
+
+def create_tables():
+    for model in (ArchivedAppointment, ArchivedTreatment):
+        model.__table__.create(engine(), checkfirst=True)
+
+
+def default_cutoff():
+    return date.today() - timedelta(days=current_app.config.get("ARCHIVE_AFTER_DAYS", 365))
+
+
+# ------------------------------ mover ------------------------------------
+
+def _next_chunk(before, after_id, chunk):
+    """Live appointments to archive (with their treatments), in id order after `after_id`."""
+    with db.engine.connect() as conn:
+        appointments = conn.execute(
+            select(Appointment.__table__)
+            .where(Appointment.appointment_id > after_id, Appointment.date < before,
+                   Appointment.status.in_(ARCHIVED_STATUSES))
+            .order_by(Appointment.appointment_id).limit(chunk)).mappings().all()
+        ids = [a["appointment_id"] for a in appointments]
+        treatments = conn.execute(select(Treatment.__table__)
+                                  .where(Treatment.appointment_id.in_(ids))).mappings().all() if ids else []
+    return appointments, treatments
+
+
+def differs(live, archived):
+    """True when an archived row (same id) holds other data than the live one."""
+    return any(archived[column] != value for column, value in live.items())
+
+
+def archived_rows(model, ids, conn=None):
+    """{id: archived row} of `model` (ArchivedAppointment / ArchivedTreatment) for these ids."""
+    key = model.__table__.primary_key.columns[0]
+    if conn is None:
+        with engine().connect() as conn:
+            return archived_rows(model, ids, conn)
+    return {r[key.name]: r for r in conn.execute(select(model.__table__).where(key.in_(ids))).mappings()}
+
+
+def _new_rows(model, rows, key, conn):
+    """The rows not archived yet; ArchiveConflict if an id is archived with other data."""
+    have = archived_rows(model, [r[key] for r in rows], conn)
+    clashes = [r[key] for r in rows if r[key] in have and differs(r, have[r[key]])]
+    if clashes:
+        raise ArchiveConflict(f"{model.__tablename__} already holds other rows with {key} "
+                              f"{', '.join(map(str, clashes))}; nothing of this chunk was moved")
+    return [r for r in rows if r[key] not in have]
+
+
+def _copy(appointments, treatments):
+    """Insert the rows into the archive (one transaction), skipping rows already there."""
+    now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+    with engine().begin() as conn:
+        rows = _new_rows(ArchivedAppointment, appointments, "appointment_id", conn)
+        if rows:
+            conn.execute(insert(ArchivedAppointment), [{**a, "archived_at": now} for a in rows])
+        rows = _new_rows(ArchivedTreatment, treatments, "treatment_id", conn)
+        if rows:
+            conn.execute(insert(ArchivedTreatment), [dict(t) for t in rows])
+
+
+def _delete_live(appointments, treatments):
+    """
+    Drop the copied rows from the live tables (one short transaction).
+    Returns the (appointments, treatments) that were deleted.
+    """
+    ids = [a["appointment_id"] for a in appointments]
+    copied = {t["treatment_id"] for t in treatments}
+    # treatments written since the copy: keep those appointments live for the next run
+    late = {appointment_id for treatment_id, appointment_id in db.session.execute(
+        select(Treatment.treatment_id, Treatment.appointment_id).where(Treatment.appointment_id.in_(ids)))
+        if treatment_id not in copied}
+    appointments = [a for a in appointments if a["appointment_id"] not in late]
+    treatments = [t for t in treatments if t["appointment_id"] not in late]
+
+    db.session.execute(delete(Treatment).where(Treatment.treatment_id.in_([t["treatment_id"] for t in treatments]))
+                       .execution_options(synchronize_session=False))
+    db.session.execute(delete(Appointment).where(Appointment.appointment_id.in_([a["appointment_id"]
+                                                                                 for a in appointments]))
+                       .execution_options(synchronize_session=False))
+    # the doctors' rosters keep counting these visits
+    conn = db.session.connection()
+    roster.add_archived(appointments, conn=conn)
+    roster.refresh({(a["doctor_id"], a["patient_id"]) for a in appointments}, conn=conn)
+    versions.touch(ArchivedAppointment.__tablename__, ArchivedTreatment.__tablename__, DoctorPatient.__tablename__)
+    db.session.commit()
+
+    if late:
+        # still live: the archive must not count them twice meanwhile
+        with engine().begin() as conn:
+            conn.execute(delete(ArchivedTreatment).where(ArchivedTreatment.appointment_id.in_(late)))
+            conn.execute(delete(ArchivedAppointment).where(ArchivedAppointment.appointment_id.in_(late)))
+    return appointments, treatments
+
+
+def move(before=None, chunk=None, pause=0.0, limit=None):
+    """
+    Archive finished appointments dated before `before` (default: today minus
+    ARCHIVE_AFTER_DAYS). pause: seconds to sleep between chunks so other
+    writers get the lock; limit: stop after this many appointments.
+    Returns (appointments, treatments) moved.
+    """
+    before = before or default_cutoff()
+    chunk = chunk or current_app.config.get("ARCHIVE_CHUNK", ARCHIVE_CHUNK)
+    moved_appointments = moved_treatments = 0
+    after_id = 0
+
+    while limit is None or moved_appointments < limit:
+        size = chunk if limit is None else min(chunk, limit - moved_appointments)
+        appointments, treatments = _next_chunk(before, after_id, size)
+        if not appointments:
+            break
+        after_id = appointments[-1]["appointment_id"]
+        _copy(appointments, treatments)
+        appointments, treatments = _delete_live(appointments, treatments)
+        moved_appointments += len(appointments)
+        moved_treatments += len(treatments)
+        if pause:
+            time.sleep(pause)
+    return moved_appointments, moved_treatments
+
+
+# ------------------------------ reads ------------------------------------
+
+def patient_treatments(patient_id):
+    """Archived treatments of one patient, most recent first (appointment loaded)."""
+    return (db.session.execute(
+        select(ArchivedTreatment).join(ArchivedTreatment.appointment)
+        .options(contains_eager(ArchivedTreatment.appointment))
+        .where(ArchivedAppointment.patient_id == patient_id)
+        .order_by(ArchivedAppointment.date.desc(), ArchivedAppointment.time.desc()))
+        .scalars().all())
+
+
+def doctor_visits(patient_id, doctor_id):
+    """Archived visits of a patient with one doctor (most recent first) and {appointment_id: treatment}."""
+    visits = (db.session.execute(
+        select(ArchivedAppointment)
+        .where(ArchivedAppointment.doctor_id == doctor_id, ArchivedAppointment.patient_id == patient_id)
+        .order_by(ArchivedAppointment.date.desc(), ArchivedAppointment.time.desc()))
+        .scalars().all())
+    treatments = {}
+    if visits:
+        rows = db.session.execute(select(ArchivedTreatment).where(
+            ArchivedTreatment.appointment_id.in_([v.appointment_id for v in visits]))).scalars()
+        treatments = {t.appointment_id: t for t in rows}
+    return visits, treatments
+
+
+def completed_by_pair():
+    """(doctor_id, patient_id, completed visits, last visit date) over the archive."""
+    with engine().connect() as conn:
+        if not inspect(conn).has_table(ArchivedAppointment.__tablename__):
+            return []
+        return conn.execute(select(ArchivedAppointment.doctor_id, ArchivedAppointment.patient_id,
+                                   func.count(), func.max(ArchivedAppointment.date))
+                            .where(ArchivedAppointment.status == "completed")
+                            .group_by(ArchivedAppointment.doctor_id, ArchivedAppointment.patient_id)).all()
+
+
+def max_ids():
+    """(highest appointment_id, highest treatment_id) in the archive; 0 when it is empty."""
+    with engine().connect() as conn:
+        if not inspect(conn).has_table(ArchivedAppointment.__tablename__):
+            return 0, 0
+        return (conn.execute(select(func.max(ArchivedAppointment.appointment_id))).scalar() or 0,
+                conn.execute(select(func.max(ArchivedTreatment.treatment_id))).scalar() or 0)
+
+
+def counts():
+    """{'appointments': n, 'appointments:<status>': n} over the archive (empty if it doesn't exist yet)."""
+    with engine().connect() as conn:
+        if not inspect(conn).has_table(ArchivedAppointment.__tablename__):
+            return {}
+        rows = conn.execute(select(ArchivedAppointment.status, func.count())
+                            .group_by(ArchivedAppointment.status)).all()
+    result = {f"appointments:{status}": n for status, n in rows}
+    result["appointments"] = sum(n for _, n in rows)
+    return result
+
+
+# ------------------------------ CLI --------------------------------------
+
+def setup_archive_commands(app):
+
+    @app.cli.command("archive-appointments")
+    @click.option("--before", type=click.DateTime(["%Y-%m-%d"]), default=None,
+                  help="archive appointments dated before this day (default: today - ARCHIVE_AFTER_DAYS)")
+    @click.option("--chunk", type=int, default=None, help="appointments per transaction (default ARCHIVE_CHUNK)")
+    @click.option("--pause", type=float, default=0.0, help="seconds to sleep between chunks")
+    @click.option("--limit", type=int, default=None, help="stop after this many appointments")
+    def archive_appointments(before, chunk, pause, limit):
+        """Move finished appointments (and their treatments) into the archive tables."""
+        create_tables()
+        try:
+            moved, treatments = move(before.date() if before else None, chunk=chunk, pause=pause, limit=limit)
+        except ArchiveConflict as e:
+            raise click.ClickException(str(e))
+        click.echo(f"archived {moved} appointments and {treatments} treatments")
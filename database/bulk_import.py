@@ -0,0 +1,360 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+
+import click
+from sqlalchemy import select, insert, tuple_
+
+from database.model import db, Patient, Doctor, DoctorAvailability
+from database import reference, slots, stats, credentials
+
+
+# Bulk import of patients, doctors and doctor availability from CSV / NDJSON.
+#
+# - rows are read and validated one at a time (the file is never loaded whole)
+# - valid rows are collected into batches; each batch does ONE lookup for
+#   existing emails (or doctor/date pairs), one executemany INSERT and one commit
+# - bad rows are reported with their line number and skipped; a file that is
+#   not UTF-8 (or not CSV) stops the import with a file error, rows before it stay
+# - passwords are hashed per batch on the credential pool; values that are
+#   already hashes (pbkdf2:... / scrypt:...) are stored as they are. At the
+#   production cost that is a few rows per second per core, so the upload page
+#   hashes at most IMPORT_WEB_MAX_PLAINTEXT plain passwords per file
+#   (max_plaintext) and rejects the rows after that; bigger files go through
+#   `flask import-data`, which has no request timeout
+#
+# Used by `flask import-data` and the admin upload page (/admin/import).
+
+DEFAULT_BATCH_SIZE = 2000
+MAX_REPORTED_ERRORS = 1000
+
+TRUE_VALUES = ("1", "true", "yes", "y", "on")
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportReport:
+    def __init__(self, kind):
+        self.kind = kind
+        self.inserted = 0
+        self.duplicates = 0
+        self.errors = []       # [(line_no, message)], capped; line_no None = the whole file
+        self.error_count = 0
+
+    def add_error(self, line_no, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_no, message))
+
+    def as_dict(self):
+        return {"kind": self.kind, "inserted": self.inserted, "duplicates": self.duplicates,
+                "errors": self.error_count}
+
+
+# ------------------------------ readers ----------------------------------
+
+def read_rows(stream, fmt):
+    """Yield (line_no, dict or None, error or None) from a text stream."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row, None
+    elif fmt == "ndjson":
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_no, None, f"invalid JSON: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield line_no, None, "expected a JSON object"
+                continue
+            yield line_no, row, None
+    else:
+        raise ValueError(f"unknown format {fmt!r} (use csv or ndjson)")
+
+
+# ------------------------------ validators -------------------------------
+
+def _text(row, field, max_len=None, required=True):
+    value = row.get(field)
+    value = str(value).strip() if value is not None else ""
+    if required and not value:
+        raise RowError(f"{field} is required")
+    if max_len and len(value) > max_len:
+        raise RowError(f"{field} is longer than {max_len} characters")
+    return value
+
+
+def _email(row):
+    value = _text(row, "email", 254)
+    if "@" not in value:
+        raise RowError("email is not valid")
+    return value
+
+
+def _date(row, field):
+    value = _text(row, field)
+    try:
+        # fromisoformat is much faster than strptime; the length check keeps it to YYYY-MM-DD
+        if len(value) != 10:
+            raise ValueError
+        return date.fromisoformat(value)
+    except ValueError:
+        raise RowError(f"{field} must be YYYY-MM-DD")
+
+
+def _flag(row, field):
+    value = row.get(field)
+    if isinstance(value, bool):
+        return value
+    return str(value or "").strip().lower() in TRUE_VALUES
+
+
+def validate_patient(row):
+    return {
+        "full_name": _text(row, "full_name", 64),
+        "email": _email(row),
+        "password": _text(row, "password", 256),
+        "phone_no": _text(row, "phone_no", 15),
+        "dob": _date(row, "dob"),
+        "address": _text(row, "address"),
+    }
+
+
+def validate_doctor(row):
+    dept_value = _text(row, "department", required=False) or _text(row, "department_id", required=False)
+    department = reference.department(dept_value) if dept_value.isdigit() else next(
+        (d for d in reference.departments() if d.department_name.lower() == dept_value.lower()), None)
+    if dept_value and not department:
+        raise RowError(f"unknown department {dept_value!r}")
+
+    experience = _text(row, "experience", required=False)
+    if experience and not experience.isdigit():
+        raise RowError("experience must be a whole number of years")
+
+    return {
+        "full_name": _text(row, "full_name", 64),
+        "email": _email(row),
+        "password": _text(row, "password", 256),
+        "department_id": department.department_id if department else None,
+        "experience": int(experience) if experience else None,
+    }
+
+
+def validate_availability(row):
+    doctor_id = _text(row, "doctor_id", required=False)
+    doctor_email = _text(row, "doctor_email", required=False)
+    if not doctor_id and not doctor_email:
+        raise RowError("doctor_id or doctor_email is required")
+    if doctor_id and not doctor_id.isdigit():
+        raise RowError("doctor_id must be a number")
+
+    shift1, shift2 = _flag(row, "shift1"), _flag(row, "shift2")
+    if not shift1 and not shift2:
+        raise RowError("at least one of shift1 / shift2 must be enabled")
+
+    return {
+        "doctor_id": int(doctor_id) if doctor_id else None,
+        "doctor_email": doctor_email,
+        "date": _date(row, "date"),
+        "shift1_enabled": shift1,
+        "shift1_start": DoctorAvailability.SHIFT1_START if shift1 else None,
+        "shift1_end": DoctorAvailability.SHIFT1_END if shift1 else None,
+        "shift2_enabled": shift2,
+        "shift2_start": DoctorAvailability.SHIFT2_START if shift2 else None,
+        "shift2_end": DoctorAvailability.SHIFT2_END if shift2 else None,
+    }
+
+
+# ------------------------------ batch writers ----------------------------
+
+def _dedupe_by_email(model, batch, seen, report):
+    """Drop rows whose email exists in the DB (one IN lookup) or earlier in the file."""
+    emails = [values["email"] for _, values in batch]
+    existing = set(db.session.execute(select(model.email).where(model.email.in_(emails))).scalars())
+    fresh = []
+    for line_no, values in batch:
+        if values["email"] in existing or values["email"] in seen:
+            report.duplicates += 1
+            continue
+        seen.add(values["email"])
+        fresh.append(values)
+    return fresh
+
+
+def _hash_passwords(rows):
+    plain = [r for r in rows if not credentials.is_hashed(r["password"])]
+    for r, hashed in zip(plain, credentials.hash_many([r["password"] for r in plain])):
+        r["password"] = hashed
+
+
+def write_patients(batch, seen, report):
+    rows = _dedupe_by_email(Patient, batch, seen, report)
+    if rows:
+        _hash_passwords(rows)
+        db.session.execute(insert(Patient), rows)
+        stats.bump({"patients": len(rows)})
+    return len(rows)
+
+
+def write_doctors(batch, seen, report):
+    rows = _dedupe_by_email(Doctor, batch, seen, report)
+    if rows:
+        _hash_passwords(rows)
+        db.session.execute(insert(Doctor), rows)
+        deltas = {"doctors": len(rows)}
+        for r in rows:
+            if r["department_id"]:
+                key = stats.department_key(r["department_id"])
+                deltas[key] = deltas.get(key, 0) + 1
+        stats.bump(deltas)
+    return len(rows)
+
+
+def write_availability(batch, seen, report):
+    # check doctor ids / resolve doctor emails -> ids with one lookup each
+    ids = {v["doctor_id"] for _, v in batch if v["doctor_id"]}
+    known_ids = set(db.session.execute(
+        select(Doctor.doctor_id).where(Doctor.doctor_id.in_(ids))).scalars()) if ids else set()
+    emails = {v["doctor_email"] for _, v in batch if not v["doctor_id"]}
+    by_email = dict(db.session.execute(
+        select(Doctor.email, Doctor.doctor_id).where(Doctor.email.in_(emails))).all()) if emails else {}
+
+    resolved = []
+    for line_no, values in batch:
+        if values["doctor_id"]:
+            doctor_id = values["doctor_id"] if values["doctor_id"] in known_ids else None
+        else:
+            doctor_id = by_email.get(values["doctor_email"])
+        if not doctor_id:
+            report.add_error(line_no, f"unknown doctor {values['doctor_email'] or values['doctor_id']}")
+            continue
+        values = dict(values, doctor_id=doctor_id)
+        values.pop("doctor_email")
+        resolved.append((line_no, values))
+
+    # one lookup for (doctor_id, date) pairs that already have a row
+    keys = [(v["doctor_id"], v["date"]) for _, v in resolved]
+    existing = set(db.session.execute(
+        select(DoctorAvailability.doctor_id, DoctorAvailability.date)
+        .where(tuple_(DoctorAvailability.doctor_id, DoctorAvailability.date).in_(keys))).all()) if keys else set()
+
+    rows = []
+    for line_no, values in resolved:
+        key = (values["doctor_id"], values["date"])
+        if key in existing or key in seen:
+            report.duplicates += 1
+            continue
+        seen.add(key)
+        rows.append(values)
+
+    if rows:
+        db.session.execute(insert(DoctorAvailability), rows)
+        departments = dict(db.session.execute(
+            select(Doctor.doctor_id, Doctor.department_id)
+            .where(Doctor.doctor_id.in_({r["doctor_id"] for r in rows}))).all())
+        # DoctorAvailability(**r) is transient, only read by shift_slots()
+        slots.fill_days([(r["doctor_id"], departments.get(r["doctor_id"]), r["date"], DoctorAvailability(**r))
+                         for r in rows])
+    return len(rows)
+
+
+KINDS = {
+    "patients": (validate_patient, write_patients),
+    "doctors": (validate_doctor, write_doctors),
+    "availability": (validate_availability, write_availability),
+}
+
+
+def import_stream(kind, stream, fmt, batch_size=DEFAULT_BATCH_SIZE, max_plaintext=None):
+    """
+    Import everything from a text stream; returns an ImportReport.
+    max_plaintext: how many not-yet-hashed passwords to hash (None = all);
+    rows after that are rejected.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"unknown kind {kind!r} (use {', '.join(KINDS)})")
+    validate, write = KINDS[kind]
+    report = ImportReport(kind)
+    seen = set()   # emails / (doctor, date) already imported from this file
+    batch = []
+    plaintext = 0
+
+    def flush():
+        seen_before = set(seen)
+        try:
+            report.inserted += write(batch, seen, report)
+            db.session.commit()   # one transaction per chunk
+        except Exception as e:
+            db.session.rollback()
+            seen.clear()
+            seen.update(seen_before)
+            for line_no, _ in batch:
+                report.add_error(line_no, f"batch failed: {e}")
+        batch.clear()
+
+    line_no = 0
+    try:
+        for line_no, row, error in read_rows(stream, fmt):
+            if error:
+                report.add_error(line_no, error)
+                continue
+            try:
+                values = validate(row)
+                if "password" in values and not credentials.is_hashed(values["password"]):
+                    plaintext += 1
+                    if max_plaintext is not None and plaintext > max_plaintext:
+                        raise RowError(f"only {max_plaintext} plain passwords are hashed per upload; hash "
+                                       f"this one first (pbkdf2:... / scrypt:...) or import the file "
+                                       f"with `flask import-data`")
+                batch.append((line_no, values))
+            except RowError as e:
+                report.add_error(line_no, str(e))
+                continue
+            if len(batch) >= batch_size:
+                flush()
+    except UnicodeDecodeError:
+        # decoding fails a whole chunk at a time: the bad byte is somewhere after line_no
+        report.add_error(None, f"the file is not UTF-8 text (after line {line_no}); save it as UTF-8 "
+                               f"- nothing after that line was imported")
+    except csv.Error as e:
+        report.add_error(None, f"unreadable CSV after line {line_no}: {e} - nothing after that line was imported")
+    if batch:
+        flush()
+
+    if kind == "doctors" and report.inserted:
+        reference.invalidate_doctors()
+    return report
+
+
+def open_text(binary_stream):
+    """Wrap an uploaded (binary) file so the readers get text lines."""
+    return io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+
+
+def setup_import_commands(app):
+
+    @app.cli.command("import-data")
+    @click.argument("kind", type=click.Choice(list(KINDS)))
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]), default=None,
+                  help="defaults to the file extension")
+    @click.option("--batch-size", default=DEFAULT_BATCH_SIZE, show_default=True)
+    def import_data(kind, path, fmt, batch_size):
+        """Bulk import patients, doctors or availability from a CSV / NDJSON file."""
+        fmt = fmt or ("ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv")
+        started = datetime.now()
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            report = import_stream(kind, f, fmt, batch_size=batch_size)
+        seconds = (datetime.now() - started).total_seconds() or 1e-9
+
+        for line_no, message in report.errors:
+            click.echo(f"line {line_no}: {message}" if line_no else f"file: {message}", err=True)
+        click.echo(f"{kind}: {report.inserted} inserted, {report.duplicates} duplicates skipped, "
+                   f"{report.error_count} errors ({report.inserted / seconds:.0f} rows/s)")
@@ -0,0 +1,145 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict, Counter
+
+try:
+    import redis  # optional: only needed for CACHE_BACKEND=redis
+except ImportError:  # pragma: no cover
+    redis = None
+
+
+# Small read-through cache for data that almost never changes
+# (departments, doctor lists, blacklists...).
+#
+#   value = cache.get_or_load("departments", load_departments, ttl=300)
+#   cache.invalidate("departments")          # after an admin edit
+#
+# Backends:
+#   memory : per-process LRU (default). Each gunicorn worker has its own copy,
+#            so an invalidation only reaches the worker that made the change;
+#            other workers catch up when the TTL runs out.
+#   redis  : shared by every worker -> invalidations are seen everywhere at once.
+
+
+class LRUBackend:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns (found, value)."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return False, None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisBackend:
+    def __init__(self, url, prefix="hms:"):
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND=redis needs the 'redis' package (pip install redis)")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return False, None
+        return True, pickle.loads(raw)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=max(1, int(ttl)))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + k for k in keys])
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+
+_backend = LRUBackend()
+_default_ttl = 300
+_counts = Counter()  # hits / misses, per key
+_counts_lock = threading.Lock()
+
+
+def init_cache(app):
+    """Pick the backend from config (CACHE_BACKEND, CACHE_DEFAULT_TTL, ...)."""
+    global _backend, _default_ttl
+    kind = app.config.get("CACHE_BACKEND", "memory")
+    if kind == "redis":
+        _backend = RedisBackend(app.config["CACHE_REDIS_URL"])
+    else:
+        _backend = LRUBackend(max_entries=app.config.get("CACHE_MAX_ENTRIES", 1024))
+    _default_ttl = app.config.get("CACHE_DEFAULT_TTL", 300)
+
+
+def _count(key, outcome):
+    with _counts_lock:
+        _counts[(key, outcome)] += 1
+
+
+def get_or_load(key, loader, ttl=None):
+    """Return the cached value for key, calling loader() on a miss."""
+    found, value = _backend.get(key)
+    if found:
+        _count(key, "hit")
+        return value
+    _count(key, "miss")
+    value = loader()
+    _backend.set(key, value, ttl or _default_ttl)
+    return value
+
+
+def get(key, name=None):
+    """Returns (found, value); hits / misses are counted under name (default: key)."""
+    found, value = _backend.get(key)
+    _count(name or key, "hit" if found else "miss")
+    return found, value
+
+
+def put(key, value, ttl=None):
+    _backend.set(key, value, ttl or _default_ttl)
+
+
+def invalidate(*keys):
+    _backend.delete(*keys)
+
+
+def clear():
+    _backend.clear()
+
+
+def stats():
+    """{key: {'hit': n, 'miss': n}} for this process."""
+    result = {}
+    with _counts_lock:
+        for (key, outcome), n in _counts.items():
+            result.setdefault(key, {"hit": 0, "miss": 0})[outcome] = n
+    return result
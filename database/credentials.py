@@ -0,0 +1,145 @@
+import hmac
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+# Password hashing for Admin / Doctor / Patient.
+#
+# - Hashes are PBKDF2-SHA256 with a configurable iteration count
+#   (PASSWORD_HASH_ITERATIONS). Stored as "pbkdf2:sha256:<iterations>$salt$hash".
+# - The KDF is deliberately slow, so it runs on a small bounded thread pool
+#   (hashlib releases the GIL while it works) instead of the request thread.
+#   When the pool's queue is full we fail fast with CredentialBusy instead of
+#   letting requests pile up behind each other. A queue slot is held until the
+#   hash has actually run, even if the caller gave up waiting for it.
+# - Unknown accounts are checked against a dummy hash of the same cost, so a
+#   failed login takes as long whether or not the account exists.
+# - Rows created before hashing existed hold the plaintext password. They are
+#   still accepted once and re-hashed on that successful login.
+
+HASH_PREFIXES = ("pbkdf2:", "scrypt:")
+
+_iterations = 600_000
+_pool = None
+_workers = 1
+_queue_slots = None
+_timeout = 10
+_dummy_hash = None
+
+
+class CredentialBusy(Exception):
+    """Too many password checks already queued; ask the user to retry."""
+
+
+def init_credentials(app):
+    global _iterations, _pool, _workers, _queue_slots, _timeout, _dummy_hash
+    _iterations = app.config.get("PASSWORD_HASH_ITERATIONS", 600_000)
+    _workers = app.config.get("PASSWORD_HASH_WORKERS") or os.cpu_count() or 2
+    queue = app.config.get("PASSWORD_HASH_QUEUE") or _workers * 4
+    _timeout = app.config.get("PASSWORD_HASH_TIMEOUT", 10)
+    _dummy_hash = None
+    if _pool is not None:
+        _pool.shutdown(wait=False)
+    _pool = ThreadPoolExecutor(max_workers=_workers, thread_name_prefix="kdf")
+    _queue_slots = threading.BoundedSemaphore(queue)
+
+
+def _method():
+    return f"pbkdf2:sha256:{_iterations}"
+
+
+def is_hashed(stored):
+    return bool(stored) and stored.startswith(HASH_PREFIXES)
+
+
+def needs_rehash(stored):
+    """Plaintext legacy value, or hashed with a different cost than configured."""
+    if not is_hashed(stored):
+        return True
+    return not stored.startswith(_method() + "$")
+
+
+def _submit(fn, *args, wait=None):
+    """
+    Queue fn on the KDF pool, waiting up to `wait` seconds for a queue slot
+    (None = as long as it takes). The slot is given back when fn has run.
+    """
+    slots = _queue_slots   # the one this call took from, even if init_credentials() runs again
+    if not slots.acquire(timeout=wait):
+        raise CredentialBusy()
+    try:
+        future = _pool.submit(fn, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def _run(fn, *args):
+    """Run fn on the KDF pool and wait for it (bounded queue, bounded wait)."""
+    if _pool is None:  # not initialised (scripts, shell) -> just run inline
+        return fn(*args)
+    try:
+        return _submit(fn, *args, wait=_timeout).result(timeout=_timeout)
+    except FutureTimeout:
+        raise CredentialBusy()
+
+
+def _hash(password):
+    return generate_password_hash(password, method=_method())
+
+
+def _dummy():
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = _hash(os.urandom(16).hex())
+    return _dummy_hash
+
+
+def _verify(stored, candidate):
+    if not stored:
+        # no such account: spend the same KDF time as a real check
+        check_password_hash(_dummy(), candidate or "")
+        return False, None
+    if candidate is None:
+        return False, None
+    if is_hashed(stored):
+        ok = check_password_hash(stored, candidate)
+    else:
+        # legacy plaintext row; constant-time compare
+        ok = hmac.compare_digest(stored.encode(), candidate.encode())
+    new_hash = _hash(candidate) if ok and needs_rehash(stored) else None
+    return ok, new_hash
+
+
+def hash_password(password):
+    return _run(_hash, password)
+
+
+def verify_password(stored, candidate):
+    """
+    Returns (ok, new_hash). new_hash is set when the stored value should be
+    replaced (legacy plaintext or old cost) - save it on the user and commit.
+    Pass stored=None for an unknown account (always fails, same cost).
+    """
+    return _run(_verify, stored, candidate)
+
+
+def hash_many(passwords):
+    """
+    Hash a list of passwords on the pool (bulk import). Goes through the same
+    bounded queue as logins and keeps at most one hash per worker in flight,
+    so an import never fills the queue; logins keep getting slots.
+    """
+    if _pool is None:
+        return [_hash(p) for p in passwords]
+    hashes, in_flight = [], []
+    for password in passwords:
+        if len(in_flight) >= _workers:
+            hashes.append(in_flight.pop(0).result())
+        in_flight.append(_submit(_hash, password))
+    return hashes + [f.result() for f in in_flight]
@@ -0,0 +1,119 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from database import db
+from database.routing import READ_BIND
+from database.archive import ARCHIVE_BIND
+
+
+# Engine profile: connection pool options and, for SQLite, the pragmas every
+# new connection gets. Chosen with DB_ENGINE_PROFILE:
+#
+#   tuned   (default) SQLite: WAL journal (readers never wait for the writer),
+#           synchronous=NORMAL (safe with WAL, far fewer fsyncs), a busy
+#           timeout so writers queue instead of failing with
+#           "database is locked", mmap + a larger page cache.
+#           Server databases: pool size / overflow / recycle / pre-ping.
+#   default SQLAlchemy + driver defaults (for comparison, see
+#           benchmarks/bench_sqlite.py).
+#
+# A second bind, "read", is configured for dashboard reads:
+#   READ_DATABASE_URI set  -> that database (e.g. a replica)
+#   unset + SQLite file    -> the same file through a separate pool of
+#                             query_only connections
+#   unset otherwise        -> no read bind, everything uses the primary
+# Which queries use it is decided by database/routing.py.
+#
+# A third bind, "archive", holds the archived appointments (database/archive.py):
+# ARCHIVE_DATABASE_URI (e.g. its own SQLite file) or the primary database.
+
+
+def _is_sqlite(url):
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def _is_memory_sqlite(url):
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def engine_options(config, url):
+    """SQLAlchemy create_engine() options for one database URL."""
+    if config.get("DB_ENGINE_PROFILE", "tuned") != "tuned" or _is_memory_sqlite(url):
+        return {}
+    if _is_sqlite(url):
+        return {
+            "pool_size": config.get("DB_POOL_SIZE", 10),
+            "max_overflow": config.get("DB_MAX_OVERFLOW", 20),
+            # seconds pysqlite waits on a locked database (PRAGMA busy_timeout below as well)
+            "connect_args": {"timeout": config.get("SQLITE_BUSY_TIMEOUT_MS", 5000) / 1000},
+        }
+    return {
+        "pool_size": config.get("DB_POOL_SIZE", 10),
+        "max_overflow": config.get("DB_MAX_OVERFLOW", 20),
+        "pool_timeout": config.get("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": config.get("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": config.get("DB_POOL_PRE_PING", True),
+    }
+
+
+def sqlite_pragmas(config, read_only=False):
+    pragmas = [
+        ("busy_timeout", config.get("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+        ("synchronous", config.get("SQLITE_SYNCHRONOUS", "NORMAL")),
+        ("mmap_size", config.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+        # negative = size in KiB instead of pages
+        ("cache_size", -config.get("SQLITE_CACHE_SIZE_KB", 64 * 1024)),
+        ("temp_store", "MEMORY"),
+    ]
+    if read_only:
+        pragmas.append(("query_only", "ON"))
+    else:
+        # journal mode is stored in the database file; only the writer sets it
+        pragmas.insert(0, ("journal_mode", config.get("SQLITE_JOURNAL_MODE", "WAL")))
+    return pragmas
+
+
+def apply_sqlite_pragmas(engine, config, read_only=False):
+    """Run the profile's PRAGMAs on every new connection of a (sync) engine."""
+    pragmas = sqlite_pragmas(config, read_only)
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+    event.listen(engine, "connect", set_pragmas)
+
+
+def init_engine(app):
+    """
+    db.init_app() with the engine profile applied: pool options for the
+    primary, the read and the archive bind, and SQLite pragmas on every new connection.
+    """
+    config = app.config
+    url = config["SQLALCHEMY_DATABASE_URI"]
+    config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", {}).update(engine_options(config, url))
+
+    read_url = config.get("READ_DATABASE_URI")
+    if not read_url and _is_sqlite(url) and not _is_memory_sqlite(url):
+        read_url = url
+    binds = config.setdefault("SQLALCHEMY_BINDS", {})
+    if read_url:
+        binds[READ_BIND] = {"url": read_url, **engine_options(config, read_url)}
+    archive_url = config.get("ARCHIVE_DATABASE_URI") or url
+    binds[ARCHIVE_BIND] = {"url": archive_url, **engine_options(config, archive_url)}
+
+    db.init_app(app)
+
+    if config.get("DB_ENGINE_PROFILE", "tuned") != "tuned":
+        return
+    with app.app_context():
+        for key, engine in db.engines.items():
+            if engine.dialect.name == "sqlite" and not _is_memory_sqlite(engine.url):
+                apply_sqlite_pragmas(engine, config, read_only=key == READ_BIND and read_url == url)
+
+
+def read_engine():
+    """Engine for dashboard reads (the primary when no read bind is configured)."""
+    return db.engines.get(READ_BIND, db.engine)
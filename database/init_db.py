@@ -1,5 +1,10 @@
+import click
+
 from database.model import db, Admin, Department
 from sqlalchemy import text
+from database.migrate import upgrade
+from database.reference import invalidate_departments
+from database.credentials import hash_password
 
 def init_db(app):
 
@@ -7,11 +12,14 @@ def init_db(app):
   with app.app_context():
     db.create_all()
 
+    # bring existing tables up to date (indexes etc. that create_all skips)
+    upgrade()
+
 
     # Create an admin user if it doesn't exist
     admin = Admin.query.filter_by(username='admin@gmail.com').first()
     if not admin:
-        admin = Admin(username='admin@gmail.com', password='admin123')
+        admin = Admin(username='admin@gmail.com', password=hash_password('admin123'))
         db.session.add(admin)
         db.session.commit()
 
@@ -30,5 +38,15 @@ def init_db(app):
     
 
     db.session.commit()
+    invalidate_departments()
+
+
+def setup_init_db_commands(app):
+
+  @app.cli.command("init-db")
+  def init_db_command():
+    """Create tables, apply migrations and seed the admin + departments (run once per deploy)."""
+    init_db(app)
+    click.echo("database initialised")
 
 
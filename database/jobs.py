@@ -0,0 +1,391 @@
+import json
+import os
+import random
+import socket
+import threading
+import traceback
+from datetime import datetime, date, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import select, update, or_, and_, func
+
+from database.model import db, Job, ScheduledJob, Appointment, Treatment
+
+
+# Background jobs, stored in the app database.
+#
+#   jobs.enqueue("stats_recompute")                 # run as soon as a worker is free
+#   jobs.enqueue("purge_availability", run_at=...)  # run later
+#
+# `flask jobs-worker` runs a pool of threads that claim and run jobs; start
+# as many worker processes as you like. Claiming is one conditional UPDATE
+# (state='queued' -> 'running'), so two workers never run the same job.
+# A claimed job is leased for JOB_LEASE_SECONDS and the lease is renewed
+# while the task runs; a worker that dies simply lets the lease expire and
+# the job is picked up again (until max_attempts claims, then it fails).
+# Finishing a job is conditional on still holding the lease, so a worker
+# that lost it never overwrites the outcome of the one that took over.
+#
+# Failed jobs are retried with exponential backoff (plus jitter) until
+# max_attempts, then left in state 'failed' with the traceback.
+#
+# ScheduledJob rows are the cron table: each worker checks them every poll
+# and advances next_run_at with a conditional UPDATE before enqueueing, so a
+# schedule fires once even with several workers.
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+
+TASKS = {}   # name -> function(**payload)
+
+
+def task(name):
+    def register(fn):
+        TASKS[name] = fn
+        return fn
+    return register
+
+
+def _now():
+    return datetime.now().replace(microsecond=0)
+
+
+def enqueue(task_name, payload=None, run_at=None, max_attempts=5):
+    """Add a job (the caller commits, so it is enqueued with its own transaction)."""
+    if task_name not in TASKS:
+        raise ValueError(f"unknown task {task_name!r}")
+    job = Job(task=task_name, payload=json.dumps(payload or {}), state=QUEUED,
+              max_attempts=max_attempts, run_at=run_at or _now(), created_at=_now())
+    db.session.add(job)
+    return job
+
+
+def backoff(attempts):
+    """Seconds to wait before retry number `attempts` (1, 2, ...)."""
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay + random.uniform(0, delay / 4)
+
+
+# ------------------------------ cron -------------------------------------
+
+# minute, hour, day of month, month, day of week (0 = Sunday, like cron)
+CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+
+def _cron_field(text, low, high):
+    values = set()
+    for part in text.split(","):
+        step = 1
+        if "/" in part:
+            part, step = part.split("/")
+            step = int(step)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(x) for x in part.split("-"))
+        else:
+            start = end = int(part)
+        if start < low or end > high or step < 1:
+            raise ValueError(f"cron value {part!r} out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def parse_cron(expr):
+    """'*/15 2-4 * * 1-5' -> (minutes, hours, days, months, weekdays, dom_any, dow_any)."""
+    fields = expr.split()
+    if len(fields) != 5:
+        raise ValueError(f"cron needs 5 fields (m h dom mon dow): {expr!r}")
+    sets = [_cron_field(f, lo, hi) for f, (lo, hi) in zip(fields, CRON_FIELDS)]
+    return (*sets, fields[2] == "*", fields[4] == "*")
+
+
+def next_fire(expr, after):
+    """First time strictly after `after` that matches the cron expression."""
+    minutes, hours, days, months, weekdays, dom_any, dow_any = parse_cron(expr)
+    start = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    day = start.date()
+    for _ in range(366 * 5):
+        cron_weekday = (day.weekday() + 1) % 7
+        if dom_any and dow_any:
+            day_ok = True
+        elif dom_any:
+            day_ok = cron_weekday in weekdays
+        elif dow_any:
+            day_ok = day.day in days
+        else:   # both restricted: cron fires when either matches
+            day_ok = day.day in days or cron_weekday in weekdays
+        if day.month in months and day_ok:
+            for hour in sorted(hours):
+                for minute in sorted(minutes):
+                    candidate = datetime(day.year, day.month, day.day, hour, minute)
+                    if candidate >= start:
+                        return candidate
+        day += timedelta(days=1)
+    raise ValueError(f"cron expression never fires: {expr!r}")
+
+
+# name -> (task, cron); created by ensure_schedules(), edit the rows to change them
+DEFAULT_SCHEDULES = {
+    "expire-appointments": ("expire_appointments", "*/15 * * * *"),
+    "expand-schedules": ("schedule_expand", "10 0 * * *"),
+    "purge-availability": ("purge_availability", "30 3 * * *"),
+    "recompute-stats": ("stats_recompute", "0 4 * * *"),
+    "archive-appointments": ("archive_appointments", "45 2 * * *"),
+    "roster-refresh-next": ("roster_refresh_next", "5 0 * * *"),
+}
+
+
+def ensure_schedules():
+    """Create the default ScheduledJob rows that don't exist yet."""
+    existing = set(db.session.execute(select(ScheduledJob.name)).scalars())
+    for name, (task_name, cron) in DEFAULT_SCHEDULES.items():
+        if name not in existing:
+            db.session.add(ScheduledJob(name=name, task=task_name, cron=cron,
+                                        next_run_at=next_fire(cron, _now())))
+    db.session.commit()
+
+
+def fire_due_schedules(now=None):
+    """Enqueue every schedule whose time has come. Returns the names fired."""
+    now = now or _now()
+    fired = []
+    due = db.session.execute(select(ScheduledJob).where(ScheduledJob.enabled.is_(True),
+                                                        ScheduledJob.next_run_at <= now)).scalars().all()
+    for schedule in due:
+        # only the worker whose UPDATE matches the old next_run_at enqueues it
+        won = db.session.execute(
+            update(ScheduledJob)
+            .where(ScheduledJob.name == schedule.name, ScheduledJob.next_run_at == schedule.next_run_at)
+            .values(next_run_at=next_fire(schedule.cron, now), last_run_at=now)
+            .execution_options(synchronize_session=False)).rowcount == 1
+        if won:
+            enqueue(schedule.task, json.loads(schedule.payload or "{}"))
+            fired.append(schedule.name)
+        db.session.commit()
+    return fired
+
+
+# ------------------------------ running ----------------------------------
+
+def claim(worker_id, lease_seconds):
+    """Take the next runnable job (or an expired lease). Returns a Job or None."""
+    now = _now()
+    # leases that ran out on the last attempt: the job keeps killing its worker, give up
+    db.session.execute(
+        update(Job).where(Job.state == RUNNING, Job.locked_until < now, Job.attempts >= Job.max_attempts)
+        .values(state=FAILED, finished_at=now, locked_by=None, locked_until=None,
+                last_error=func.coalesce(Job.last_error, "lease expired on the last attempt (worker died?)"))
+        .execution_options(synchronize_session=False))
+    runnable = or_(and_(Job.state == QUEUED, Job.run_at <= now),
+                   and_(Job.state == RUNNING, Job.locked_until < now, Job.attempts < Job.max_attempts))
+    for _ in range(5):   # lost the race -> try the next candidate
+        job_id = db.session.execute(select(Job.job_id).where(runnable)
+                                    .order_by(Job.run_at).limit(1)).scalar()
+        if job_id is None:
+            db.session.commit()   # end the read transaction
+            return None
+        won = db.session.execute(
+            update(Job).where(Job.job_id == job_id, runnable)
+            .values(state=RUNNING, locked_by=worker_id, attempts=Job.attempts + 1,
+                    locked_until=now + timedelta(seconds=lease_seconds))
+            .execution_options(synchronize_session=False)).rowcount == 1
+        db.session.commit()
+        if won:
+            return db.session.get(Job, job_id)
+    return None
+
+
+def _renew_lease(app, job_id, worker_id, lease_seconds, stop):
+    """Heartbeat: push the lease forward every third of its length until `stop` is set."""
+    while not stop.wait(lease_seconds / 3):
+        try:
+            with app.app_context(), db.engine.begin() as conn:
+                renewed = conn.execute(
+                    update(Job).where(Job.job_id == job_id, Job.locked_by == worker_id, Job.state == RUNNING)
+                    .values(locked_until=_now() + timedelta(seconds=lease_seconds))).rowcount
+        except Exception:
+            continue   # e.g. database locked: two thirds of the lease are left, try at the next beat
+        if not renewed:
+            return     # someone else holds the job now
+
+
+def run(job, lease_seconds=300):
+    """
+    Run one claimed job (renewing its lease meanwhile) and record the outcome.
+    Returns True when the task succeeded.
+    """
+    job_id, name, worker_id = job.job_id, job.task, job.locked_by
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_renew_lease, daemon=True,
+                                 args=(current_app._get_current_object(), job_id, worker_id, lease_seconds, stop))
+    heartbeat.start()
+    error = None
+    try:
+        TASKS[name](**json.loads(job.payload or "{}"))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        error = traceback.format_exc()[-4000:]
+    finally:
+        stop.set()
+        heartbeat.join()
+
+    if error is None:
+        outcome = {"state": DONE, "finished_at": _now()}
+    else:
+        attempts, max_attempts = db.session.execute(
+            select(Job.attempts, Job.max_attempts).where(Job.job_id == job_id)).one()
+        if attempts >= max_attempts:
+            outcome = {"state": FAILED, "finished_at": _now()}
+        else:
+            outcome = {"state": QUEUED, "run_at": _now() + timedelta(seconds=backoff(attempts))}
+        outcome["last_error"] = error
+    # only while we still hold the lease: otherwise another worker owns the job now
+    db.session.execute(update(Job).where(Job.job_id == job_id, Job.locked_by == worker_id)
+                       .values(locked_by=None, locked_until=None, **outcome)
+                       .execution_options(synchronize_session=False))
+    db.session.commit()
+    return error is None
+
+
+def work(app, threads=2, poll_seconds=5, once=False, stop=None):
+    """
+    Worker pool: `threads` threads claim and run jobs; thread 0 also fires
+    due schedules. once=True drains what is runnable now and returns.
+    """
+    stop = stop or threading.Event()
+    lease = app.config.get("JOB_LEASE_SECONDS", 300)
+    base_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    def loop(n):
+        worker_id = f"{base_id}:{n}"
+        while not stop.is_set():
+            with app.app_context():
+                try:
+                    if n == 0:
+                        fire_due_schedules()
+                    job = claim(worker_id, lease)
+                    if job is not None:
+                        ok = run(job, lease)
+                        click.echo(f"[{worker_id}] {job.task} #{job.job_id} {'done' if ok else 'failed'}")
+                        continue
+                except Exception:
+                    # database locked / gone away: keep the thread (thread 0 fires the schedules)
+                    db.session.rollback()
+                    click.echo(f"[{worker_id}] error, retrying in {poll_seconds}s\n{traceback.format_exc()}",
+                               err=True)
+            if once:
+                return
+            stop.wait(poll_seconds)
+
+    pool = [threading.Thread(target=loop, args=(n,), daemon=True) for n in range(threads)]
+    for t in pool:
+        t.start()
+    try:
+        for t in pool:
+            while t.is_alive():
+                t.join(0.5)
+    except KeyboardInterrupt:
+        stop.set()
+        for t in pool:
+            t.join()
+
+
+# ------------------------------ tasks ------------------------------------
+
+@task("expire_appointments")
+def expire_appointments(chunk=500):
+    """
+    'booked' appointments whose day is over become 'completed' (a treatment
+    was recorded) or 'cancelled' (no-show). ORM updates, so the overview
+    counters follow.
+    """
+    grace = current_app.config.get("APPOINTMENT_EXPIRY_DAYS", 1)
+    cutoff = date.today() - timedelta(days=grace - 1)
+    while True:
+        rows = db.session.execute(
+            select(Appointment, Treatment.treatment_id)
+            .outerjoin(Treatment, Treatment.appointment_id == Appointment.appointment_id)
+            .where(Appointment.status == "booked", Appointment.date < cutoff)
+            .limit(chunk)).all()
+        if not rows:
+            return
+        for appt, treatment_id in rows:
+            appt.status = "completed" if treatment_id else "cancelled"
+        db.session.commit()
+
+
+@task("schedule_expand")
+def schedule_expand():
+    from database import schedule
+    schedule.expand()
+
+
+@task("purge_availability")
+def purge_availability(before=None):
+    from database import schedule
+    schedule.purge(date.fromisoformat(before) if before else None)
+
+
+@task("archive_appointments")
+def archive_appointments(before=None, chunk=None):
+    from database import archive
+    archive.create_tables()
+    archive.move(date.fromisoformat(before) if before else None, chunk=chunk)
+
+
+@task("roster_refresh_next")
+def roster_refresh_next():
+    from database import roster
+    roster.refresh_next()
+
+
+@task("stats_recompute")
+def stats_recompute():
+    from database import stats
+    stats.recompute()
+
+
+# ------------------------------ CLI --------------------------------------
+
+def setup_job_commands(app):
+
+    @app.cli.command("jobs-worker")
+    @click.option("--threads", default=None, type=int, help="worker threads (default JOB_WORKER_THREADS)")
+    @click.option("--poll", default=None, type=float, help="seconds between polls when idle")
+    @click.option("--once", is_flag=True, help="run what is due now, then exit")
+    def jobs_worker(threads, poll, once):
+        """Run background jobs and cron schedules (start one per process / host)."""
+        ensure_schedules()
+        work(app,
+             threads=threads or app.config.get("JOB_WORKER_THREADS", 2),
+             poll_seconds=poll or app.config.get("JOB_POLL_SECONDS", 5),
+             once=once)
+
+    @app.cli.command("jobs-enqueue")
+    @click.argument("task_name", type=click.Choice(sorted(TASKS)))
+    @click.option("--payload", default="{}", help="JSON keyword arguments for the task")
+    def jobs_enqueue(task_name, payload):
+        """Queue one job now."""
+        job = enqueue(task_name, json.loads(payload))
+        db.session.commit()
+        click.echo(f"queued {task_name} as job #{job.job_id}")
+
+    @app.cli.command("jobs-status")
+    def jobs_status():
+        """Job counts per state, schedules and recent failures."""
+        for state, n in db.session.execute(select(Job.state, func.count()).group_by(Job.state)):
+            click.echo(f"{state:>8}: {n}")
+        for s in ScheduledJob.query.order_by(ScheduledJob.name):
+            click.echo(f"schedule {s.name:<20} '{s.cron}' next {s.next_run_at} "
+                       f"{'' if s.enabled else '(disabled)'}")
+        for job in Job.query.filter_by(state=FAILED).order_by(Job.finished_at.desc()).limit(5):
+            last_line = (job.last_error or "").strip().splitlines()[-1:] or [""]
+            click.echo(f"failed #{job.job_id} {job.task}: {last_line[0]}")
@@ -0,0 +1,308 @@
+from datetime import date, datetime, time, timedelta
+
+import click
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, select, update, func, text, tuple_
+from sqlalchemy.schema import CreateTable
+
+from database.model import (db, Appointment, Blacklist, Doctor, Doctor_blacklist, Patient, DoctorAvailability,
+                            SlotInventory, StatCounter, DoctorScheduleTemplate, Job, ScheduledJob, DataVersion,
+                            DoctorPatient, Treatment, ArchivedAppointment, ArchivedTreatment)
+from database import queries, slots, stats, search, versions, archive, roster
+
+
+# Tiny schema migration runner.
+# db.create_all() only creates tables that are missing; it never touches a
+# table that already exists (new indexes, new columns, backfills...).
+# Each change to an existing table is written as a numbered migration below
+# and applied once; the applied versions are recorded in `schema_migrations`.
+
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _meta,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+MIGRATIONS = []  # (version, description, function(conn)) in order
+
+
+def migration(version, description):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+def _create_missing_indexes(conn, *models):
+    """CREATE INDEX for every index declared on these models that the DB doesn't have yet."""
+    for model in models:
+        for index in model.__table__.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _cancel_duplicate_bookings(conn):
+    """
+    Before uq_appointment_active_slot existed two racing requests could both
+    book one slot. Keep the first booking of every such slot and cancel the
+    others (listed on stderr), or CREATE UNIQUE INDEX fails.
+    """
+    a = Appointment.__table__
+    slots_booked_twice = conn.execute(
+        select(a.c.doctor_id, a.c.date, a.c.time, func.min(a.c.appointment_id))
+        .where(a.c.status == "booked")
+        .group_by(a.c.doctor_id, a.c.date, a.c.time)
+        .having(func.count() > 1)).all()
+    for doctor_id, d, t, keep in slots_booked_twice:
+        where = (a.c.doctor_id == doctor_id, a.c.date == d, a.c.time == t, a.c.status == "booked",
+                 a.c.appointment_id != keep)
+        cancelled = conn.execute(select(a.c.appointment_id).where(*where)).scalars().all()
+        conn.execute(update(a).where(*where).values(status="cancelled"))
+        click.echo(f"doctor {doctor_id} {d} {t} was booked {len(cancelled) + 1} times: kept appointment "
+                   f"{keep}, cancelled {', '.join(map(str, cancelled))}", err=True)
+
+
+def _reused_ids(conn, model, archived_model, floor, chunk=500):
+    """
+    Live rows of `model` whose id the archive holds with other data: before
+    AUTOINCREMENT, archiving the newest row let the next insert take its id
+    again. Returns {old id: new id}, new ids counting up after `floor`.
+    """
+    key = model.__table__.primary_key.columns[0]
+    next_id = max(floor, conn.execute(select(func.max(key))).scalar() or 0)
+    renumbered, after = {}, 0
+    while True:
+        rows = conn.execute(select(model.__table__).where(key > after, key <= floor)
+                            .order_by(key).limit(chunk)).mappings().all()
+        if not rows:
+            return renumbered
+        after = rows[-1][key.name]
+        have = archive.archived_rows(archived_model, [r[key.name] for r in rows])
+        for r in rows:
+            if r[key.name] in have and archive.differs(r, have[r[key.name]]):
+                next_id += 1
+                renumbered[r[key.name]] = next_id
+
+
+def _rebuild_with_autoincrement(conn, model, floor):
+    """
+    SQLite can't ALTER a table into AUTOINCREMENT: create it again as the
+    model declares it, copy the rows, swap the tables, recreate the indexes.
+    The id sequence continues after the highest id live or in the archive.
+    """
+    table = model.__table__
+    ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                       {"name": table.name}).scalar()
+    if "AUTOINCREMENT" not in ddl.upper():
+        columns = ", ".join(c.name for c in table.columns)
+        create = str(CreateTable(table).compile(conn))
+        conn.execute(text(create.replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE {table.name}_new ", 1)))
+        conn.execute(text(f"INSERT INTO {table.name}_new ({columns}) SELECT {columns} FROM {table.name}"))
+        conn.execute(text(f"DROP TABLE {table.name}"))
+        conn.execute(text(f"ALTER TABLE {table.name}_new RENAME TO {table.name}"))
+        _create_missing_indexes(conn, model)
+    last = max(floor, conn.execute(select(func.max(table.primary_key.columns[0]))).scalar() or 0)
+    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = :name"), {"name": table.name})
+    conn.execute(text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+                 {"name": table.name, "seq": last})
+
+
+# ------------------------------ migrations -------------------------------
+
+@migration(1, "indexes for hot appointment / blacklist lookups")
+def _add_hot_indexes(conn):
+    _cancel_duplicate_bookings(conn)
+    _create_missing_indexes(conn, Appointment, Blacklist, Doctor_blacklist)
+
+
+@migration(2, "slot inventory backfilled from current availability")
+def _backfill_slot_inventory(conn):
+    SlotInventory.__table__.create(conn, checkfirst=True)
+    slots.rebuild(conn=conn)
+
+
+@migration(3, "unique index on active (doctor_id, date, time) bookings")
+def _add_active_slot_unique_index(conn):
+    _cancel_duplicate_bookings(conn)
+    _create_missing_indexes(conn, Appointment)
+
+
+@migration(4, "admin overview counters")
+def _seed_stat_counters(conn):
+    StatCounter.__table__.create(conn, checkfirst=True)
+    stats.recompute(conn=conn)
+
+
+@migration(5, "full-text search tables for patients / doctors (SQLite FTS5)")
+def _create_search_index(conn):
+    search.create_fts(conn)
+
+
+@migration(6, "weekly doctor schedule templates")
+def _create_schedule_templates(conn):
+    DoctorScheduleTemplate.__table__.create(conn, checkfirst=True)
+
+
+@migration(7, "background job queue and cron schedules")
+def _create_job_tables(conn):
+    Job.__table__.create(conn, checkfirst=True)
+    ScheduledJob.__table__.create(conn, checkfirst=True)
+
+
+@migration(8, "data version stamps for the page cache")
+def _create_data_versions(conn):
+    DataVersion.__table__.create(conn, checkfirst=True)
+    versions.seed(conn)
+
+
+@migration(9, "appointment / treatment archive tables")
+def _create_archive_tables(conn):
+    # on the archive bind, which may be another database than `conn`
+    archive.create_tables()
+    versions.seed(conn)
+
+
+@migration(10, "doctor patient rosters")
+def _create_doctor_rosters(conn):
+    _create_missing_indexes(conn, Appointment)
+    DoctorPatient.__table__.create(conn, checkfirst=True)
+    versions.seed(conn)
+    roster.rebuild(conn=conn)
+
+
+@migration(11, "indexes for the admin tabs' keyset pagination orders")
+def _add_keyset_indexes(conn):
+    _create_missing_indexes(conn, Doctor, Patient, Appointment)
+
+
+@migration(12, "appointment / treatment ids never reused (SQLite AUTOINCREMENT)")
+def _stop_reusing_ids(conn):
+    if conn.dialect.name != "sqlite":
+        return              # other databases' sequences never hand out an id twice
+    a, t = Appointment.__table__, Treatment.__table__
+    floor_a, floor_t = archive.max_ids()
+    # read the archive before writing anything: it may be this database, on another connection
+    appointments = _reused_ids(conn, Appointment, ArchivedAppointment, floor_a)
+    treatments = _reused_ids(conn, Treatment, ArchivedTreatment, floor_t)
+
+    conn.execute(text("PRAGMA defer_foreign_keys = ON"))   # the tables are swapped under treatment's FK
+    for old, new in treatments.items():
+        conn.execute(update(t).where(t.c.treatment_id == old).values(treatment_id=new))
+    for old, new in appointments.items():
+        conn.execute(update(t).where(t.c.appointment_id == old).values(appointment_id=new))
+        conn.execute(update(a).where(a.c.appointment_id == old).values(appointment_id=new))
+    for table, moved in ((a, appointments), (t, treatments)):
+        if moved:
+            click.echo(f"{table.name}: id(s) {', '.join(map(str, moved))} were already used by archived rows, "
+                       f"renumbered to {', '.join(map(str, moved.values()))}", err=True)
+
+    _rebuild_with_autoincrement(conn, Appointment, floor_a)
+    _rebuild_with_autoincrement(conn, Treatment, floor_t)
+
+
+# ------------------------------ runner -----------------------------------
+
+def upgrade():
+    """Apply every pending migration. Safe to call on every start."""
+    engine = db.engine
+    _meta.create_all(engine)
+
+    with engine.connect() as conn:
+        applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+    done = []
+    for version, description, fn in MIGRATIONS:
+        if version in applied:
+            continue
+        # one transaction per migration: either it fully applies or not at all
+        with engine.begin() as conn:
+            fn(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=version, description=description, applied_at=datetime.utcnow()))
+        done.append(version)
+    return done
+
+
+# --------------------------- query plan check ----------------------------
+
+def hot_queries():
+    """The lookups that run on every dashboard / booking request."""
+    today = date.today()
+    return {
+        "doctor appointments": queries.doctor_appointments_query(1, "booked")
+            .order_by(Appointment.date, Appointment.time),
+        "patient overview": queries.patient_upcoming_query(1, today)
+            .order_by(Appointment.date, Appointment.time),
+        "booking booked times": Appointment.query.filter_by(doctor_id=1, date=today, status="booked"),
+        "booking availability": DoctorAvailability.query.filter_by(doctor_id=1, date=today),
+        "doctor availability window": DoctorAvailability.query
+            .filter(DoctorAvailability.doctor_id == 1, DoctorAvailability.date >= today,
+                    DoctorAvailability.date <= today + timedelta(days=6)),
+        "booking free slots": SlotInventory.query.filter_by(doctor_id=1, date=today, state="free")
+            .order_by(SlotInventory.time),
+        "department first free slot": SlotInventory.query
+            .filter(SlotInventory.department_id == 1, SlotInventory.state == "free",
+                    SlotInventory.date >= today)
+            .order_by(SlotInventory.date, SlotInventory.time),
+        "patient blacklist probe": Blacklist.query.filter_by(patient_id=1),
+        "doctor blacklist probe": Doctor_blacklist.query.filter_by(doctor_id=1),
+        "doctor roster": DoctorPatient.query.filter_by(doctor_id=1).order_by(DoctorPatient.last_visit.desc()),
+        "roster pair visits": Appointment.query.filter_by(doctor_id=1, patient_id=1),
+        "roster next appointments": Appointment.query
+            .filter(Appointment.doctor_id == 1, Appointment.patient_id.in_([1, 2]),
+                    Appointment.status == "booked", Appointment.date >= today)
+            .order_by(Appointment.patient_id, Appointment.date, Appointment.time),
+        # keyset pages after the first (controllers/admin.py); the first page is the same walk from one end
+        "admin doctors page": queries.admin_doctors_query()
+            .filter(tuple_(Doctor.full_name, Doctor.doctor_id) > tuple_("M", 1))
+            .order_by(Doctor.full_name, Doctor.doctor_id).limit(26),
+        "admin patients page": queries.admin_patients_query()
+            .filter(tuple_(Patient.full_name, Patient.patient_id) > tuple_("M", 1))
+            .order_by(Patient.full_name, Patient.patient_id).limit(26),
+        "admin appointments page": queries.admin_appointments_query()
+            .filter(tuple_(Appointment.date, Appointment.time, Appointment.appointment_id)
+                    < tuple_(today, time(9, 0), 1))
+            .order_by(Appointment.date.desc(), Appointment.time.desc(), Appointment.appointment_id.desc())
+            .limit(26),
+        # controllers/export.py streams in this order: no sort before the first row
+        "admin export from date": Appointment.query.filter(Appointment.date >= today)
+            .order_by(Appointment.date, Appointment.time, Appointment.appointment_id),
+    }
+
+
+def full_scans():
+    """
+    Run EXPLAIN QUERY PLAN (SQLite) for every hot query.
+    Returns {name: [plan lines]} for queries that scan a whole table.
+    """
+    problems = {}
+    for name, query in hot_queries().items():
+        sql = query.statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+        plan = db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        details = [row[-1] for row in plan]
+        if any(d.startswith("SCAN ") for d in details):
+            problems[name] = details
+    return problems
+
+
+def setup_migrate_commands(app):
+
+    @app.cli.command("db-upgrade")
+    def db_upgrade():
+        """Create missing tables and apply pending migrations."""
+        db.create_all()
+        done = upgrade()
+        click.echo(f"applied migrations: {done}" if done else "database is up to date")
+
+    @app.cli.command("db-check-plans")
+    def db_check_plans():
+        """Fail if any hot query falls back to a full table scan."""
+        problems = full_scans()
+        for name, details in problems.items():
+            click.echo(f"FULL SCAN in '{name}':")
+            for d in details:
+                click.echo(f"    {d}")
+        if problems:
+            raise SystemExit(1)
+        click.echo("all hot queries use an index")
@@ -19,6 +19,9 @@ class Patient(db.Model):
   # relationship
   appointments = db.relationship('Appointment', backref='patient', lazy=True)
 
+  # admin patients tab: keyset pages ordered by name, id
+  __table_args__ = (db.Index('ix_patient_name', 'full_name', 'patient_id'),)
+
 class Doctor(db.Model):
   doctor_id = db.Column(db.Integer, primary_key=True) 
   full_name = db.Column(db.String(64), nullable = False)
@@ -30,6 +33,9 @@ class Doctor(db.Model):
   #relationship
   appointments = db.relationship('Appointment', backref='doctor', lazy=True)
 
+  # admin doctors tab: keyset pages ordered by name, id
+  __table_args__ = (db.Index('ix_doctor_name', 'full_name', 'doctor_id'),)
+
 class Appointment(db.Model):
   appointment_id = db.Column(db.Integer, primary_key=True)
   patient_id = db.Column(db.Integer, db.ForeignKey('patient.patient_id'), nullable=False)
@@ -42,6 +48,26 @@ class Appointment(db.Model):
   # relationship
   treatment = db.relationship('Treatment', backref='appointment', uselist=False)
 
+  # indexes for the hot lookups (new indexes also need a migration in database/migrate.py)
+  __table_args__ = (
+    # doctor dashboard: doctor + status, ordered by date, time
+    db.Index('ix_appointment_doctor_status_date', 'doctor_id', 'status', 'date', 'time'),
+    # patient overview: patient + status + date range, ordered by date, time
+    db.Index('ix_appointment_patient_status_date', 'patient_id', 'status', 'date', 'time'),
+    # booking step 2: booked times for one doctor on one date
+    db.Index('ix_appointment_doctor_date_status', 'doctor_id', 'date', 'status'),
+    # doctor roster: re-aggregating one doctor/patient pair reads only this index
+    db.Index('ix_appointment_doctor_patient_status', 'doctor_id', 'patient_id', 'status', 'date', 'time'),
+    # admin appointments tab: keyset pages ordered by date, time, id (newest first)
+    db.Index('ix_appointment_date_time', 'date', 'time', 'appointment_id'),
+    # at most one *booked* appointment per doctor/date/time (cancelled ones don't count)
+    db.Index('uq_appointment_active_slot', 'doctor_id', 'date', 'time', unique=True,
+             sqlite_where=db.text("status = 'booked'"),
+             postgresql_where=db.text("status = 'booked'")),
+    # ids are never reused: the archive is keyed on them (database/archive.py)
+    {'sqlite_autoincrement': True},
+  )
+
 class Treatment(db.Model):
   treatment_id = db.Column(db.Integer, primary_key=True)
   appointment_id = db.Column(db.Integer, db.ForeignKey('appointment.appointment_id'), nullable=False, unique=True)
@@ -49,6 +75,9 @@ class Treatment(db.Model):
   prescription = db.Column(db.Text, nullable=True)
   note = db.Column(db.Text, nullable=True)
 
+  # ids are never reused: the archive is keyed on them (database/archive.py)
+  __table_args__ = {'sqlite_autoincrement': True}
+
 
 class Department(db.Model):
   department_id = db.Column(db.Integer, primary_key=True)
@@ -60,11 +89,11 @@ class Department(db.Model):
 
 class Blacklist(db.Model):
   id = db.Column(db.Integer, primary_key=True)
-  patient_id = db.Column(db.Integer, db.ForeignKey('patient.patient_id'), nullable=False)
+  patient_id = db.Column(db.Integer, db.ForeignKey('patient.patient_id'), nullable=False, index=True)
 
 class Doctor_blacklist(db.Model):
   id = db.Column(db.Integer, primary_key=True)
-  doctor_id = db.Column(db.Integer, db.ForeignKey('doctor.doctor_id'), nullable=False)
+  doctor_id = db.Column(db.Integer, db.ForeignKey('doctor.doctor_id'), nullable=False, index=True)
 
 
 class DoctorAvailability(db.Model):
@@ -100,5 +129,208 @@ class DoctorAvailability(db.Model):
         return f"<DoctorAvailability doctor={self.doctor_id} date={self.date} s1={self.shift1_enabled} s2={self.shift2_enabled}>"
 
 
+class DoctorScheduleTemplate(db.Model):
+    """
+    A doctor's recurring week (see database/schedule.py).
+    - shift1_weekdays / shift2_weekdays: 7 characters, Monday first,
+      '1' = that shift is worked on that weekday (e.g. "1111100").
+    - expanded_until: last date already turned into DoctorAvailability rows.
+      Days up to it are never regenerated, so one-off edits to a single day
+      stick; later days are filled from the template as the horizon rolls.
+    """
+    __tablename__ = "doctor_schedule_template"
+
+    doctor_id       = db.Column(db.Integer, db.ForeignKey("doctor.doctor_id"), primary_key=True)
+    shift1_weekdays = db.Column(db.String(7), nullable=False, default="0000000")
+    shift2_weekdays = db.Column(db.String(7), nullable=False, default="0000000")
+    active          = db.Column(db.Boolean, nullable=False, default=True)
+    expanded_until  = db.Column(db.Date, nullable=True)
+
+    def works(self, shift, weekday):
+        mask = self.shift1_weekdays if shift == 1 else self.shift2_weekdays
+        return (mask or "0000000")[weekday] == "1"
+
+    def __repr__(self):
+        return f"<DoctorScheduleTemplate doctor={self.doctor_id} s1={self.shift1_weekdays} s2={self.shift2_weekdays}>"
+
+
+class SlotInventory(db.Model):
+    """
+    Materialized booking slots: one row per (doctor, date, 20-minute slot).
+    - state is 'free', 'held' or 'booked'.
+    - Rows are written by database/slots.py whenever availability is saved
+      or an appointment is booked / cancelled (never edit them by hand).
+    - department_id is copied from the doctor so "free slots in a department"
+      is a single index range read.
+    """
+    __tablename__ = "slot_inventory"
+
+    slot_id       = db.Column(db.Integer, primary_key=True)
+    doctor_id     = db.Column(db.Integer, db.ForeignKey("doctor.doctor_id"), nullable=False)
+    department_id = db.Column(db.Integer, db.ForeignKey("department.department_id"), nullable=True)
+    date          = db.Column(db.Date, nullable=False)
+    time          = db.Column(db.Time, nullable=False)
+    state         = db.Column(db.String(10), nullable=False, default="free")
+
+    __table_args__ = (
+        db.UniqueConstraint('doctor_id', 'date', 'time', name='uq_slot_doc_date_time'),
+        # free slots of one doctor on one day
+        db.Index('ix_slot_doctor_date_state', 'doctor_id', 'date', 'state', 'time'),
+        # first free slot across a department
+        db.Index('ix_slot_dept_state_date', 'department_id', 'state', 'date', 'time'),
+    )
+
+    def __repr__(self):
+        return f"<SlotInventory doctor={self.doctor_id} {self.date} {self.time} {self.state}>"
+
+
+class Job(db.Model):
+    """
+    One unit of background work (see database/jobs.py).
+    state: 'queued' -> 'running' -> 'done' | 'failed' (or back to 'queued' for a retry).
+    A running job is leased to one worker until locked_until; if that worker
+    dies the lease runs out and another worker picks the job up again.
+    """
+    __tablename__ = "job"
+
+    job_id       = db.Column(db.Integer, primary_key=True)
+    task         = db.Column(db.String(60), nullable=False)
+    payload      = db.Column(db.Text, nullable=True)            # JSON
+    state        = db.Column(db.String(10), nullable=False, default="queued")
+    attempts     = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at       = db.Column(db.DateTime, nullable=False)
+    locked_by    = db.Column(db.String(80), nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    last_error   = db.Column(db.Text, nullable=True)
+    created_at   = db.Column(db.DateTime, nullable=False)
+    finished_at  = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # next job to run: state + run_at
+        db.Index('ix_job_state_run_at', 'state', 'run_at'),
+    )
+
+    def __repr__(self):
+        return f"<Job {self.job_id} {self.task} {self.state} attempts={self.attempts}>"
+
+
+class ScheduledJob(db.Model):
+    """A recurring job: `task` is enqueued whenever `cron` fires (see database/jobs.py)."""
+    __tablename__ = "scheduled_job"
+
+    name        = db.Column(db.String(60), primary_key=True)
+    task        = db.Column(db.String(60), nullable=False)
+    cron        = db.Column(db.String(60), nullable=False)      # "m h dom mon dow"
+    payload     = db.Column(db.Text, nullable=True)
+    enabled     = db.Column(db.Boolean, nullable=False, default=True)
+    next_run_at = db.Column(db.DateTime, nullable=False)
+    last_run_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<ScheduledJob {self.name} '{self.cron}' next={self.next_run_at}>"
+
+
+class StatCounter(db.Model):
+    """
+    Pre-computed counters for the admin overview (see database/stats.py).
+    name examples: 'patients', 'appointments', 'appointments:booked',
+    'department:3:doctors'.
+    """
+    __tablename__ = "stat_counter"
+
+    name  = db.Column(db.String(60), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DataVersion(db.Model):
+    """
+    Change stamp per table (see database/versions.py): `version` goes up by
+    one in every transaction that writes the table. Cached pages are keyed on it.
+    """
+    __tablename__ = "data_version"
+
+    table_name = db.Column(db.String(60), primary_key=True)
+    version    = db.Column(db.Integer, nullable=False, default=0)
+    changed_at = db.Column(db.DateTime, nullable=False)         # UTC
+
+
+class DoctorPatient(db.Model):
+    """
+    One row per doctor / patient pair for the doctor's patient roster
+    (maintained by database/roster.py, never edit by hand).
+    - visits / last_visit: completed appointments, archived ones included.
+    - next_date / next_time: earliest booked appointment from today on
+      (as of the last change to the pair; ignore it once it is in the past).
+    - archived_visits / archived_last_visit: the part of visits / last_visit
+      that was moved to the archive.
+    """
+    __tablename__ = "doctor_patient"
+
+    doctor_id           = db.Column(db.Integer, db.ForeignKey("doctor.doctor_id"), primary_key=True)
+    patient_id          = db.Column(db.Integer, db.ForeignKey("patient.patient_id"), primary_key=True)
+    visits              = db.Column(db.Integer, nullable=False, default=0)
+    last_visit          = db.Column(db.Date, nullable=True)
+    next_date           = db.Column(db.Date, nullable=True)
+    next_time           = db.Column(db.Time, nullable=True)
+    archived_visits     = db.Column(db.Integer, nullable=False, default=0)
+    archived_last_visit = db.Column(db.Date, nullable=True)
+
+    patient = db.relationship('Patient')
+
+    def __repr__(self):
+        return f"<DoctorPatient doctor={self.doctor_id} patient={self.patient_id} visits={self.visits}>"
+
+
+class ArchivedAppointment(db.Model):
+    """
+    A finished appointment moved out of `appointment` by database/archive.py.
+    Same columns and ids as the live row, plus when it was archived. Lives on
+    the "archive" bind (ARCHIVE_DATABASE_URI, default the primary database),
+    so there are no foreign keys to the live tables.
+    """
+    __tablename__ = "appointment_archive"
+    __bind_key__ = "archive"
+
+    appointment_id = db.Column(db.Integer, primary_key=True)
+    patient_id     = db.Column(db.Integer, nullable=False)
+    doctor_id      = db.Column(db.Integer, nullable=False)
+    date           = db.Column(db.Date, nullable=False)
+    time           = db.Column(db.Time, nullable=False)
+    department     = db.Column(db.String(40), nullable=False)
+    status         = db.Column(db.String(30), nullable=False)
+    archived_at    = db.Column(db.DateTime, nullable=False)
+
+    treatment = db.relationship('ArchivedTreatment', backref='appointment', uselist=False)
+
+    __table_args__ = (
+        db.Index('ix_appointment_archive_patient_date', 'patient_id', 'date', 'time'),
+        db.Index('ix_appointment_archive_doctor_patient', 'doctor_id', 'patient_id', 'date'),
+    )
+
+    archived = True   # templates show an "archived" badge
+
+    # the live tables may be in another database: look the people up by id
+    @property
+    def doctor(self):
+        return db.session.get(Doctor, self.doctor_id)
+
+    @property
+    def patient(self):
+        return db.session.get(Patient, self.patient_id)
+
+    def __repr__(self):
+        return f"<ArchivedAppointment {self.appointment_id} {self.date} {self.status}>"
+
 
+class ArchivedTreatment(db.Model):
+    """The treatment of an archived appointment (same ids as in `treatment`)."""
+    __tablename__ = "treatment_archive"
+    __bind_key__ = "archive"
 
+    treatment_id   = db.Column(db.Integer, primary_key=True)
+    appointment_id = db.Column(db.Integer, db.ForeignKey('appointment_archive.appointment_id'),
+                               nullable=False, unique=True)
+    diagnosis      = db.Column(db.String(255), nullable=False)
+    prescription   = db.Column(db.Text, nullable=True)
+    note           = db.Column(db.Text, nullable=True)
@@ -0,0 +1,114 @@
+import base64
+import json
+from datetime import date, time
+
+from sqlalchemy import tuple_
+
+
+# Keyset ("seek") pagination.
+# Instead of OFFSET we remember the sort key of the last row we showed and
+# ask the database for rows after it, so page 1000 costs the same as page 1.
+
+
+class Page:
+    """
+    One page of results plus the cursors for the neighbouring pages.
+    numbered=True means the cursors are plain page numbers (?page=N), used
+    where keyset order isn't possible (e.g. search results ranked by score).
+    """
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None, numbered=False):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.numbered = numbered
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _dump_value(value):
+    # JSON cannot hold dates/times, so tag them
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if isinstance(value, time):
+        return {"t": value.strftime("%H:%M:%S")}
+    return value
+
+
+def _load_value(value):
+    if isinstance(value, dict):
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        if "t" in value:
+            return time.fromisoformat(value["t"])
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_dump_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Returns the list of key values, or None if the cursor is missing/invalid."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return [_load_value(v) for v in values]
+    except (ValueError, TypeError):
+        return None
+
+
+def _row_key(row, columns):
+    return [getattr(row, col.key) for col in columns]
+
+
+def keyset_paginate(query, columns, after=None, before=None, per_page=20, descending=False):
+    """
+    Paginate `query` ordered by `columns` (the last one must be unique, e.g. the id).
+    - after  : cursor from a previous page's `next_cursor`
+    - before : cursor from a previous page's `prev_cursor`
+    Only per_page + 1 rows are ever fetched.
+    """
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before)
+    key = tuple_(*columns)
+
+    # walking backwards = flip the sort, read, then flip the rows back
+    backwards = before_key is not None and after_key is None
+    reverse_sort = descending != backwards
+
+    if after_key is not None and len(after_key) == len(columns):
+        query = query.filter(key < tuple_(*after_key) if descending else key > tuple_(*after_key))
+    elif backwards and len(before_key) == len(columns):
+        query = query.filter(key > tuple_(*before_key) if descending else key < tuple_(*before_key))
+    else:
+        backwards = False
+        reverse_sort = descending
+
+    order = [c.desc() if reverse_sort else c.asc() for c in columns]
+    rows = query.order_by(None).order_by(*order).limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    next_cursor = prev_cursor = None
+    if rows:
+        first, last = _row_key(rows[0], columns), _row_key(rows[-1], columns)
+        if backwards:
+            # we came from a later page, so there is always a next one
+            next_cursor = encode_cursor(last)
+            prev_cursor = encode_cursor(first) if has_more else None
+        else:
+            next_cursor = encode_cursor(last) if has_more else None
+            prev_cursor = encode_cursor(first) if after_key is not None else None
+
+    return Page(rows, next_cursor=next_cursor, prev_cursor=prev_cursor)
@@ -0,0 +1,60 @@
+from sqlalchemy.orm import joinedload, contains_eager
+
+from database.model import Patient, Doctor, Appointment, Treatment
+
+
+# Query builders for the dashboard views.
+# Every builder says up front which relationships its template reads, so a
+# page with 500 rows still runs a fixed number of SQL statements instead of
+# one lazy load per row.
+
+
+# ------------------------------- admin -----------------------------------
+
+def admin_doctors_query():
+    # doctors.html shows d.department.department_name
+    return Doctor.query.options(joinedload(Doctor.department))
+
+
+def admin_patients_query():
+    # patients.html only reads plain columns
+    return Patient.query
+
+
+def admin_appointments_query():
+    # appointments.html shows patient + doctor names
+    return Appointment.query.options(
+        joinedload(Appointment.patient),
+        joinedload(Appointment.doctor),
+    )
+
+
+# ------------------------------- doctor ----------------------------------
+
+def doctor_appointments_query(doctor_id, status):
+    # appointments.html shows a.patient.full_name
+    return (Appointment.query
+            .options(joinedload(Appointment.patient))
+            .filter_by(doctor_id=doctor_id, status=status))
+
+
+# ------------------------------- patient ---------------------------------
+
+def patient_upcoming_query(patient_id, today):
+    # overview.html shows appt.doctor.full_name; we already join Doctor,
+    # so fill the relationship from that same join
+    return (Appointment.query
+            .join(Appointment.doctor)
+            .options(contains_eager(Appointment.doctor))
+            .filter(Appointment.patient_id == patient_id,
+                    Appointment.status == 'booked',
+                    Appointment.date >= today))
+
+
+def patient_treatments_query(patient_id):
+    # treatment_history.html walks t.appointment.doctor.full_name
+    return (Treatment.query
+            .join(Treatment.appointment)
+            .join(Appointment.doctor)
+            .options(contains_eager(Treatment.appointment).contains_eager(Appointment.doctor))
+            .filter(Appointment.patient_id == patient_id))
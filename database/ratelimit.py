@@ -0,0 +1,231 @@
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis  # optional: only needed for RATE_LIMIT_BACKEND=redis
+except ImportError:  # pragma: no cover
+    redis = None
+
+
+# Rate limiting and admission control for login and booking.
+#
+# Token buckets: a bucket holds up to `burst` tokens and refills at `rate`
+# tokens per second; every request takes one, and a request that finds the
+# bucket empty is refused with the number of seconds until a token is back.
+# Rules are written "N/second", "N/minute" or "N/hour" (N is also the burst):
+#
+#   retry_after = ratelimit.check([("login:ip:10.0.0.7", "30/minute"),
+#                                  ("login:account:a@b.c", "10/minute"),
+#                                  ("login:endpoint", "20/second")])
+#   if retry_after: ... refuse, before touching the database
+#
+# Waiting room: with BOOKING_WAITING_ROOM on, a patient entering the booking
+# flow takes a ticket and is admitted in ticket order at BOOKING_ADMIT_RATE,
+# however many are waiting; the database sees a steady stream of bookings
+# instead of the whole peak at once. Admitted patients get a pass for
+# BOOKING_PASS_SECONDS. When nobody is waiting, admission is immediate.
+#
+# Backends:
+#   memory : per process (default). With N gunicorn workers every worker has
+#            its own buckets, so the effective limits are N times higher.
+#   redis  : shared by every worker and host; buckets are updated by one Lua
+#            script, so concurrent requests can't both take the last token.
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600}
+
+
+def parse_rule(rule):
+    """'30/minute' -> (tokens per second, burst)."""
+    count, _, period = rule.partition("/")
+    count, seconds = int(count), PERIODS[period.strip().lower()]
+    if count <= 0:
+        raise ValueError(f"bad rate limit rule {rule!r}")
+    return count / seconds, count
+
+
+class MemoryBackend:
+    def __init__(self, max_entries=100_000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()   # key -> (expires_at, value); buckets are [tokens, updated_at]
+        self._lock = threading.Lock()
+
+    def _put(self, key, value, ttl):
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def _get(self, key):
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        return item[1]
+
+    def take(self, key, rate, burst, cost=1):
+        """Returns (allowed, seconds until `cost` tokens are available)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._get(key) or (burst, now)
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._put(key, (tokens, now), burst / rate + 1)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    def incr(self, key, ttl):
+        with self._lock:
+            value = (self._get(key) or 0) + 1
+            self._put(key, value, ttl)
+            return value
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key)
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._put(key, value, ttl)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+# KEYS[1] bucket; ARGV rate, burst, cost. Uses the server clock, so all hosts agree.
+_TAKE_SCRIPT = """
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local b = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(b[1]) or burst
+local updated = tonumber(b[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+else
+  wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+
+class RedisBackend:
+    def __init__(self, url, prefix="hms:rl:"):
+        if redis is None:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis needs the 'redis' package (pip install redis)")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._take = self.client.register_script(_TAKE_SCRIPT)
+
+    def take(self, key, rate, burst, cost=1):
+        allowed, wait = self._take(keys=[self.prefix + key], args=[rate, burst, cost])
+        return bool(allowed), float(wait)
+
+    def incr(self, key, ttl):
+        pipe = self.client.pipeline()
+        pipe.incr(self.prefix + key)
+        pipe.expire(self.prefix + key, max(1, int(ttl)))
+        return pipe.execute()[0]
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else float(raw)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+_backend = MemoryBackend()
+_config = {}
+
+
+def init_rate_limits(app):
+    """Pick the backend from config (RATE_LIMIT_BACKEND, RATE_LIMIT_REDIS_URL, ...)."""
+    global _backend
+    if app.config.get("RATE_LIMIT_BACKEND", "memory") == "redis":
+        _backend = RedisBackend(app.config.get("RATE_LIMIT_REDIS_URL") or app.config["CACHE_REDIS_URL"])
+    else:
+        _backend = MemoryBackend()
+    _config.clear()
+    _config.update({
+        "enabled": app.config.get("RATE_LIMIT_ENABLED", True),
+        "waiting_room": app.config.get("BOOKING_WAITING_ROOM", False),
+        "admit_rule": app.config.get("BOOKING_ADMIT_RATE", "5/second"),
+        "pass_seconds": app.config.get("BOOKING_PASS_SECONDS", 300),
+    })
+
+
+def enabled():
+    return _config.get("enabled", True)
+
+
+def check(rules):
+    """
+    Take one token from each (key, rule) bucket, in order. Returns None when
+    all allowed, else the seconds to wait (buckets after the refusing one are
+    left alone).
+    """
+    if not enabled():
+        return None
+    for key, rule in rules:
+        if not rule:
+            continue
+        rate, burst = parse_rule(rule)
+        allowed, wait = _backend.take(key, rate, burst)
+        if not allowed:
+            return max(wait, 0.001)
+    return None
+
+
+# ------------------------------ waiting room -----------------------------
+
+TICKETS, SERVING = "wr:tickets", "wr:serving"
+
+
+def waiting_room_enabled():
+    return enabled() and _config.get("waiting_room", False)
+
+
+def admit(account):
+    """
+    Waiting-room gate for one account. Returns (admitted, position, wait_seconds);
+    position / wait are 0 when admitted.
+    """
+    if not waiting_room_enabled():
+        return True, 0, 0.0
+    pass_key, ticket_key = f"wr:pass:{account}", f"wr:ticket:{account}"
+    if _backend.get(pass_key):
+        return True, 0, 0.0
+
+    rate, burst = parse_rule(_config["admit_rule"])
+    line_ttl = 3600
+    ticket = _backend.get(ticket_key)
+    if ticket is None:
+        ticket = _backend.incr(TICKETS, line_ttl)
+        _backend.set(ticket_key, ticket, line_ttl)
+
+    serving = _backend.get(SERVING)
+    if serving is None:
+        # line was idle long enough to expire: start serving from this ticket
+        serving = ticket - 1
+        _backend.set(SERVING, serving, line_ttl)
+    # whoever polls moves the line forward, at most `rate` places per second
+    if ticket > serving and _backend.take("wr:admit", rate, burst)[0]:
+        serving = _backend.incr(SERVING, line_ttl)
+    if ticket <= serving:
+        _backend.set(pass_key, 1, _config["pass_seconds"])
+        _backend.delete(ticket_key)
+        return True, 0, 0.0
+    position = int(ticket - serving)
+    return False, position, position / rate
@@ -0,0 +1,82 @@
+from collections import namedtuple
+
+from database.model import Department, Doctor, Blacklist, Doctor_blacklist
+from database import cache
+
+
+# Cached reference data: small tables that are read on almost every page
+# but change maybe once a week. Values are plain tuples / sets (not ORM
+# objects) so they are safe to share between requests and workers.
+#
+# Call the matching invalidate_*() right AFTER committing a change.
+
+DepartmentRow = namedtuple("DepartmentRow", "department_id department_name description")
+DoctorRow = namedtuple("DoctorRow", "doctor_id full_name experience department_id")
+
+DEPARTMENTS_KEY = "departments"
+DOCTORS_KEY = "doctors_by_department"
+BLACKLISTED_PATIENTS_KEY = "blacklist:patients"
+BLACKLISTED_DOCTORS_KEY = "blacklist:doctors"
+
+
+# ------------------------------ departments ------------------------------
+
+def _load_departments():
+    return [DepartmentRow(d.department_id, d.department_name, d.description)
+            for d in Department.query.order_by(Department.department_name).all()]
+
+
+def departments():
+    """All departments ordered by name."""
+    return cache.get_or_load(DEPARTMENTS_KEY, _load_departments)
+
+
+def department(department_id):
+    """One department by id (or None)."""
+    try:
+        department_id = int(department_id)
+    except (TypeError, ValueError):
+        return None
+    for d in departments():
+        if d.department_id == department_id:
+            return d
+    return None
+
+
+def invalidate_departments():
+    cache.invalidate(DEPARTMENTS_KEY)
+
+
+# ------------------------------ doctors ----------------------------------
+
+def _load_doctors_by_department():
+    index = {}
+    for d in Doctor.query.order_by(Doctor.full_name).all():
+        index.setdefault(d.department_id, []).append(
+            DoctorRow(d.doctor_id, d.full_name, d.experience, d.department_id))
+    return index
+
+
+def doctors_in_department(department_id):
+    """Doctors of one department ordered by name."""
+    return cache.get_or_load(DOCTORS_KEY, _load_doctors_by_department).get(int(department_id), [])
+
+
+def invalidate_doctors():
+    cache.invalidate(DOCTORS_KEY)
+
+
+# ------------------------------ blacklists -------------------------------
+
+def blacklisted_patient_ids():
+    return cache.get_or_load(BLACKLISTED_PATIENTS_KEY, lambda: frozenset(
+        r.patient_id for r in Blacklist.query.with_entities(Blacklist.patient_id)))
+
+
+def blacklisted_doctor_ids():
+    return cache.get_or_load(BLACKLISTED_DOCTORS_KEY, lambda: frozenset(
+        r.doctor_id for r in Doctor_blacklist.query.with_entities(Doctor_blacklist.doctor_id)))
+
+
+def invalidate_blacklists():
+    cache.invalidate(BLACKLISTED_PATIENTS_KEY, BLACKLISTED_DOCTORS_KEY)
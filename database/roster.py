@@ -0,0 +1,233 @@
+from collections import Counter
+from datetime import date
+
+import click
+from sqlalchemy import event, func, inspect, select, insert, update, delete, case
+from sqlalchemy.orm import Session, contains_eager
+
+from database.model import db, Appointment, Patient, DoctorPatient
+from database.pagination import Page
+from database import versions
+
+
+# The doctor's patient roster ("Patients" tab).
+#
+# `doctor_patient` holds one row per doctor / patient pair: completed visits,
+# last visit and the next booked appointment. A flush hook re-aggregates only
+# the pairs whose appointments that flush touched (an index-only read per
+# pair, see ix_appointment_doctor_patient_status), so showing the roster is a
+# range read over this doctor's pairs - as cheap for a doctor with 50k past
+# appointments as for a new one.
+#
+# A pair is listed once the patient has any appointment with the doctor -
+# booked, completed or cancelled, as the tab always did - or completed visits
+# in the archive (the archive mover passes them to add_archived(); archived
+# cancellations are not kept). Bulk loads that skip the ORM call rebuild();
+# `flask roster-rebuild` does the same by hand.
+#
+# next_date / next_time only change when the pair's appointments do, so once
+# that day is over they are stale. The page shows upcoming() instead, read
+# for the rows on the page, and the nightly roster_refresh_next job
+# re-aggregates the stale pairs so the "next" sort stays right.
+
+SORTS = ("last_visit", "visits", "next", "name")
+
+
+# ------------------------------ maintenance ------------------------------
+
+def _pair_values(conn, doctor_id, patient_id, today):
+    where = (Appointment.doctor_id == doctor_id, Appointment.patient_id == patient_id)
+    appointments, visits, last_visit = conn.execute(
+        select(func.count(), func.count(case((Appointment.status == "completed", 1))),
+               func.max(case((Appointment.status == "completed", Appointment.date))))
+        .where(*where)).one()
+    upcoming = conn.execute(
+        select(Appointment.date, Appointment.time)
+        .where(*where, Appointment.status == "booked", Appointment.date >= today)
+        .order_by(Appointment.date, Appointment.time).limit(1)).first()
+    return appointments, visits, last_visit, upcoming
+
+
+def refresh(pairs, conn=None):
+    """Re-aggregate these (doctor_id, patient_id) pairs from the live appointments."""
+    conn = conn or db.session
+    today = date.today()
+    for doctor_id, patient_id in {p for p in pairs if None not in p}:
+        key = (DoctorPatient.doctor_id == doctor_id, DoctorPatient.patient_id == patient_id)
+        appointments, visits, last_visit, upcoming = _pair_values(conn, doctor_id, patient_id, today)
+        existing = conn.execute(select(DoctorPatient.archived_visits, DoctorPatient.archived_last_visit)
+                                .where(*key)).first()
+        archived_visits, archived_last = existing if existing else (0, None)
+
+        if not (appointments or archived_visits):
+            if existing:
+                conn.execute(delete(DoctorPatient).where(*key))
+            continue
+        last_dates = [d for d in (last_visit, archived_last) if d is not None]
+        values = {
+            "visits": visits + archived_visits,
+            "last_visit": max(last_dates) if last_dates else None,
+            "next_date": upcoming[0] if upcoming else None,
+            "next_time": upcoming[1] if upcoming else None,
+        }
+        if existing:
+            conn.execute(update(DoctorPatient).where(*key).values(**values))
+        else:
+            conn.execute(insert(DoctorPatient).values(doctor_id=doctor_id, patient_id=patient_id,
+                                                      archived_visits=0, **values))
+
+
+def add_archived(appointments, conn=None):
+    """
+    Record appointments (row mappings) that are about to leave the live table
+    as archived visits. Call refresh() on the same pairs after deleting them.
+    """
+    conn = conn or db.session
+    visits, last = Counter(), {}
+    for a in appointments:
+        if a["status"] == "completed":
+            pair = (a["doctor_id"], a["patient_id"])
+            visits[pair] += 1
+            last[pair] = max(last.get(pair, a["date"]), a["date"])
+    for (doctor_id, patient_id), n in visits.items():
+        key = (DoctorPatient.doctor_id == doctor_id, DoctorPatient.patient_id == patient_id)
+        newest = last[(doctor_id, patient_id)]
+        existing = conn.execute(select(DoctorPatient.archived_last_visit).where(*key)).first()
+        if existing is None:
+            conn.execute(insert(DoctorPatient).values(doctor_id=doctor_id, patient_id=patient_id, visits=0,
+                                                      archived_visits=n, archived_last_visit=newest))
+        else:
+            conn.execute(update(DoctorPatient).where(*key).values(
+                archived_visits=DoctorPatient.archived_visits + n,
+                archived_last_visit=max(existing[0], newest) if existing[0] else newest))
+
+
+def rebuild(conn=None):
+    """Throw the roster away and aggregate every pair again (live + archive). Returns the row count."""
+    from database import archive
+    conn = conn or db.session
+    today = date.today()
+    rows = {}
+
+    def row(pair):
+        return rows.setdefault(pair, {"doctor_id": pair[0], "patient_id": pair[1], "visits": 0,
+                                      "last_visit": None, "next_date": None, "next_time": None,
+                                      "archived_visits": 0, "archived_last_visit": None})
+
+    for doctor_id, patient_id, n, last_visit in conn.execute(
+            select(Appointment.doctor_id, Appointment.patient_id,
+                   func.count(case((Appointment.status == "completed", 1))),
+                   func.max(case((Appointment.status == "completed", Appointment.date))))
+            .group_by(Appointment.doctor_id, Appointment.patient_id)):
+        r = row((doctor_id, patient_id))
+        r["visits"], r["last_visit"] = n, last_visit
+
+    for doctor_id, patient_id, d, t in conn.execute(
+            select(Appointment.doctor_id, Appointment.patient_id, Appointment.date, Appointment.time)
+            .where(Appointment.status == "booked", Appointment.date >= today)
+            .order_by(Appointment.date.desc(), Appointment.time.desc())):
+        r = row((doctor_id, patient_id))
+        r["next_date"], r["next_time"] = d, t      # the earliest one is written last
+
+    for doctor_id, patient_id, n, last_visit in archive.completed_by_pair():
+        r = row((doctor_id, patient_id))
+        r["visits"] += n
+        r["archived_visits"], r["archived_last_visit"] = n, last_visit
+        if r["last_visit"] is None or (last_visit and last_visit > r["last_visit"]):
+            r["last_visit"] = last_visit
+
+    conn.execute(delete(DoctorPatient))
+    if rows:
+        conn.execute(insert(DoctorPatient), list(rows.values()))
+    versions.touch(DoctorPatient.__tablename__, conn=conn)
+    return len(rows)
+
+
+def refresh_next():
+    """Re-aggregate the pairs whose next appointment day is over (nightly job). Returns how many."""
+    pairs = db.session.execute(select(DoctorPatient.doctor_id, DoctorPatient.patient_id)
+                               .where(DoctorPatient.next_date < date.today())).all()
+    refresh(pairs)
+    return len(pairs)
+
+
+def _touched_pairs(session):
+    pairs = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Appointment):
+            pairs.add((obj.doctor_id, obj.patient_id))
+            # an appointment moved to another doctor / patient: the old pair changes too
+            state = inspect(obj)
+            old_doctor = state.attrs.doctor_id.history.deleted
+            old_patient = state.attrs.patient_id.history.deleted
+            if old_doctor or old_patient:
+                pairs.add((old_doctor[0] if old_doctor else obj.doctor_id,
+                           old_patient[0] if old_patient else obj.patient_id))
+    return pairs
+
+
+def _after_flush(session, flush_context):
+    pairs = _touched_pairs(session)
+    if pairs:
+        # through the flush's own connection -> same transaction
+        refresh(pairs, conn=session.connection())
+
+
+# ------------------------------ reads ------------------------------------
+
+def _order(sort, today):
+    upcoming = case((DoctorPatient.next_date >= today, DoctorPatient.next_date))
+    if sort == "visits":
+        return [DoctorPatient.visits.desc(), Patient.full_name, DoctorPatient.patient_id]
+    if sort == "next":
+        # patients with an upcoming appointment first, soonest first
+        return [upcoming.is_(None), upcoming, DoctorPatient.next_time, Patient.full_name, DoctorPatient.patient_id]
+    if sort == "name":
+        return [Patient.full_name, DoctorPatient.patient_id]
+    return [DoctorPatient.last_visit.is_(None), DoctorPatient.last_visit.desc(), Patient.full_name,
+            DoctorPatient.patient_id]
+
+
+def page(doctor_id, sort="last_visit", page=1, per_page=25):
+    """One page of the doctor's roster (DoctorPatient rows, patient loaded), numbered pages."""
+    page = max(page, 1)
+    rows = (DoctorPatient.query
+            .join(DoctorPatient.patient)
+            .options(contains_eager(DoctorPatient.patient))
+            .filter(DoctorPatient.doctor_id == doctor_id)
+            .order_by(*_order(sort if sort in SORTS else SORTS[0], date.today()))
+            .limit(per_page + 1).offset((page - 1) * per_page).all())
+    return Page(rows[:per_page],
+                next_cursor=str(page + 1) if len(rows) > per_page else None,
+                prev_cursor=str(page - 1) if page > 1 else None,
+                numbered=True)
+
+
+def upcoming(doctor_id, patient_ids):
+    """{patient_id: (date, time)} of each patient's next booked appointment with the doctor (one read)."""
+    rows = db.session.execute(
+        select(Appointment.patient_id, Appointment.date, Appointment.time)
+        .where(Appointment.doctor_id == doctor_id, Appointment.patient_id.in_(list(patient_ids)),
+               Appointment.status == "booked", Appointment.date >= date.today())
+        .order_by(Appointment.patient_id, Appointment.date, Appointment.time)).all()
+    result = {}
+    for patient_id, d, t in rows:
+        result.setdefault(patient_id, (d, t))
+    return result
+
+
+def count(doctor_id):
+    return db.session.execute(select(func.count()).select_from(DoctorPatient)
+                              .where(DoctorPatient.doctor_id == doctor_id)).scalar()
+
+
+def setup_roster(app):
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "after_flush", _after_flush)
+
+    @app.cli.command("roster-rebuild")
+    def roster_rebuild():
+        """Recompute every doctor's patient roster from the appointments (and the archive)."""
+        n = rebuild()
+        db.session.commit()
+        click.echo(f"rebuilt {n} roster rows")
@@ -0,0 +1,88 @@
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, inspect
+
+
+# Read/write routing for db.session.
+#
+# Heavy read-only views mark their request with @read_only (or call
+# use_read_bind() once they know the request only reads). Their SELECTs then
+# go to the "read" bind set up in database/engine.py (a replica, or for
+# SQLite a separate pool of query_only connections), so they don't take
+# connections from the pool that bookings and cancellations use.
+# Everything else - and any flush / INSERT / UPDATE / DELETE, even inside a
+# marked request - goes to the primary. Models with their own __bind_key__
+# (the archive) always use that bind.
+#
+# Read-your-writes: when a request commits changes, the user's Flask session
+# is pinned to the primary for READ_YOUR_WRITES_SECONDS, so a replica that
+# lags behind can't hide the booking or cancellation they just made.
+
+READ_BIND = "read"
+PRIMARY_UNTIL = "_primary_until"   # Flask session key
+
+
+def read_only(view_func):
+    """Mark a whole view as read-only (served from the read bind)."""
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        use_read_bind()
+        return view_func(*args, **kwargs)
+    return wrapper
+
+
+def use_read_bind():
+    """Serve the rest of this request's SELECTs from the read bind."""
+    g.read_bind = True
+
+
+def pinned_to_primary():
+    return session.get(PRIMARY_UNTIL, 0) > time.time()
+
+
+def _wants_read_bind():
+    return (has_request_context() and g.get("read_bind", False)
+            and not pinned_to_primary())
+
+
+def _own_bind(mapper):
+    return mapper is not None and bool(inspect(mapper).local_table.metadata.info.get("bind_key"))
+
+
+class RoutingSession(Session):
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and not _own_bind(mapper)
+                and not getattr(clause, "is_dml", False) and _wants_read_bind()):
+            engine = self._db.engines.get(READ_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _remember_write(db_session, flush_context):
+    db_session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _remember_statement_write(orm_execute_state):
+    # session.execute(update(...)) / insert / delete don't go through flush
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _pin_after_write(db_session):
+    if db_session.info.pop("wrote", False) and has_request_context():
+        seconds = current_app.config.get("READ_YOUR_WRITES_SECONDS", 5)
+        if seconds > 0:
+            session[PRIMARY_UNTIL] = time.time() + seconds
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_write(db_session):
+    db_session.info.pop("wrote", None)
@@ -0,0 +1,240 @@
+import json
+from datetime import date, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import select, insert, update, delete, tuple_
+
+from database.model import db, Doctor, DoctorAvailability, DoctorScheduleTemplate, SlotInventory
+from database import slots
+
+
+# Recurring weekly schedules.
+#
+# A doctor saves a weekly template once (which shifts on which weekday).
+# expand() turns templates into concrete DoctorAvailability rows (and free
+# slots) for a rolling horizon of SCHEDULE_HORIZON_DAYS. Each template
+# remembers how far it has been expanded, so:
+#   - expanding is cheap when nothing is due (one indexed read)
+#   - one-off edits to a day inside the horizon are never overwritten
+# Expansion runs lazily when a doctor opens the availability pages and in
+# bulk from `flask schedule-expand` (daily job).
+#
+# purge() deletes availability / slot rows for past dates (optionally
+# archiving them to NDJSON first) so the hot tables only hold the window
+# that is actually read.
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+EMPTY_MASK = "0000000"
+MIN_HORIZON_DAYS = 7   # the availability page edits the next 7 days
+PURGE_CHUNK = 5000
+
+
+def horizon_days():
+    return max(MIN_HORIZON_DAYS, current_app.config.get("SCHEDULE_HORIZON_DAYS", 28))
+
+
+def shift_values(shift1, shift2):
+    """Column values for a DoctorAvailability row with the fixed shift times."""
+    return {
+        "shift1_enabled": bool(shift1),
+        "shift1_start": DoctorAvailability.SHIFT1_START if shift1 else None,
+        "shift1_end": DoctorAvailability.SHIFT1_END if shift1 else None,
+        "shift2_enabled": bool(shift2),
+        "shift2_start": DoctorAvailability.SHIFT2_START if shift2 else None,
+        "shift2_end": DoctorAvailability.SHIFT2_END if shift2 else None,
+    }
+
+
+def mask(weekdays):
+    """Iterable of weekday numbers (0 = Monday) -> "1010000"."""
+    weekdays = set(weekdays)
+    return "".join("1" if i in weekdays else "0" for i in range(7))
+
+
+# ------------------------------ reads ------------------------------------
+
+def availability_window(doctor_id, start, end):
+    """{date: DoctorAvailability} for one doctor, start..end inclusive (one range read)."""
+    rows = DoctorAvailability.query.filter(DoctorAvailability.doctor_id == doctor_id,
+                                           DoctorAvailability.date >= start,
+                                           DoctorAvailability.date <= end).all()
+    return {r.date: r for r in rows}
+
+
+def week_form(doctor_id):
+    """The weekly template as a list the template can iterate (Monday first)."""
+    template = db.session.get(DoctorScheduleTemplate, doctor_id)
+    return [{"weekday": i, "name": name,
+             "shift1": bool(template and template.works(1, i)),
+             "shift2": bool(template and template.works(2, i))}
+            for i, name in enumerate(WEEKDAYS)]
+
+
+# ------------------------------ expansion --------------------------------
+
+def expand(doctor_ids=None, today=None, conn=None):
+    """
+    Create availability rows (and their free slots) from active templates up to
+    today + horizon. Days that already have a row are left alone.
+    Returns the number of rows created; the caller commits.
+    """
+    conn = conn or db.session
+    today = today or date.today()
+    until = today + timedelta(days=horizon_days() - 1)
+
+    stmt = (select(DoctorScheduleTemplate, Doctor.department_id)
+            .join(Doctor, Doctor.doctor_id == DoctorScheduleTemplate.doctor_id)
+            .where(DoctorScheduleTemplate.active.is_(True),
+                   (DoctorScheduleTemplate.expanded_until.is_(None))
+                   | (DoctorScheduleTemplate.expanded_until < until)))
+    if doctor_ids is not None:
+        stmt = stmt.where(DoctorScheduleTemplate.doctor_id.in_(doctor_ids))
+    due = conn.execute(stmt).all()
+    if not due:
+        return 0
+
+    wanted = []   # (doctor_id, department_id, date, values)
+    for template, department_id in due:
+        start = max(today, (template.expanded_until or today - timedelta(days=1)) + timedelta(days=1))
+        d = start
+        while d <= until:
+            s1, s2 = template.works(1, d.weekday()), template.works(2, d.weekday())
+            if s1 or s2:
+                wanted.append((template.doctor_id, department_id, d, shift_values(s1, s2)))
+            d += timedelta(days=1)
+
+    created = 0
+    for i in range(0, len(wanted), 2000):
+        chunk = wanted[i:i + 2000]
+        existing = set(conn.execute(
+            select(DoctorAvailability.doctor_id, DoctorAvailability.date)
+            .where(tuple_(DoctorAvailability.doctor_id, DoctorAvailability.date)
+                   .in_([(doctor_id, d) for doctor_id, _, d, _ in chunk]))).all())
+        fresh = [row for row in chunk if (row[0], row[2]) not in existing]
+        if not fresh:
+            continue
+        conn.execute(insert(DoctorAvailability),
+                     [dict(values, doctor_id=doctor_id, date=d) for doctor_id, _, d, values in fresh])
+        # transient rows, only read by shift_slots()
+        slots.fill_days([(doctor_id, department_id, d, DoctorAvailability(**values))
+                         for doctor_id, department_id, d, values in fresh], conn=conn)
+        created += len(fresh)
+
+    conn.execute(update(DoctorScheduleTemplate)
+                 .where(DoctorScheduleTemplate.doctor_id.in_([t.doctor_id for t, _ in due]))
+                 .values(expanded_until=until))
+    return created
+
+
+def ensure_expanded(doctor_id):
+    """Lazy expansion for one doctor (no-op once the horizon is covered)."""
+    return expand([doctor_id])
+
+
+def save_template(doctor_id, shift1_weekdays, shift2_weekdays, reapply=False, today=None):
+    """
+    Create / replace a doctor's weekly template.
+    reapply=True also rewrites the days already generated (today onwards)
+    to match the new week; booked slots are always kept.
+    """
+    today = today or date.today()
+    template = db.session.get(DoctorScheduleTemplate, doctor_id)
+    if template is None:
+        template = DoctorScheduleTemplate(doctor_id=doctor_id)
+        db.session.add(template)
+    template.shift1_weekdays = mask(shift1_weekdays)
+    template.shift2_weekdays = mask(shift2_weekdays)
+    template.active = True
+
+    if reapply and template.expanded_until and template.expanded_until >= today:
+        department_id = getattr(db.session.get(Doctor, doctor_id), "department_id", None)
+        existing = availability_window(doctor_id, today, template.expanded_until)
+        d = today
+        while d <= template.expanded_until:
+            s1, s2 = template.works(1, d.weekday()), template.works(2, d.weekday())
+            row = existing.get(d)
+            if s1 or s2:
+                if row is None:
+                    row = DoctorAvailability(doctor_id=doctor_id, date=d)
+                    db.session.add(row)
+                for column, value in shift_values(s1, s2).items():
+                    setattr(row, column, value)
+            elif row is not None:
+                db.session.delete(row)
+                row = None
+            slots.sync_day(doctor_id, department_id, d, row)
+            d += timedelta(days=1)
+
+    db.session.flush()
+    expand([doctor_id], today=today)
+    return template
+
+
+# ------------------------------ purge ------------------------------------
+
+def _archive_rows(fh, rows):
+    for r in rows:
+        fh.write(json.dumps({
+            "doctor_id": r.doctor_id, "date": r.date.isoformat(),
+            "shift1_enabled": r.shift1_enabled, "shift2_enabled": r.shift2_enabled,
+        }) + "\n")
+
+
+def purge(before=None, archive=None, chunk=PURGE_CHUNK):
+    """
+    Delete availability and slot rows dated before `before` (default: today
+    minus AVAILABILITY_RETENTION_DAYS), in chunks with one commit each.
+    archive: optional text file handle; purged availability rows are written
+    to it as NDJSON first. Returns (availability_rows, slot_rows) deleted.
+    """
+    before = before or date.today() - timedelta(days=current_app.config.get("AVAILABILITY_RETENTION_DAYS", 30))
+    removed_availability = removed_slots = 0
+
+    while True:
+        rows = (DoctorAvailability.query.filter(DoctorAvailability.date < before)
+                .order_by(DoctorAvailability.availability_id).limit(chunk).all())
+        if not rows:
+            break
+        if archive is not None:
+            _archive_rows(archive, rows)
+        db.session.execute(delete(DoctorAvailability).where(
+            DoctorAvailability.availability_id.in_([r.availability_id for r in rows])))
+        db.session.commit()
+        removed_availability += len(rows)
+
+    while True:
+        ids = db.session.execute(select(SlotInventory.slot_id).where(SlotInventory.date < before)
+                                 .limit(chunk)).scalars().all()
+        if not ids:
+            break
+        db.session.execute(delete(SlotInventory).where(SlotInventory.slot_id.in_(ids)))
+        db.session.commit()
+        removed_slots += len(ids)
+
+    return removed_availability, removed_slots
+
+
+def setup_schedule_commands(app):
+
+    @app.cli.command("schedule-expand")
+    def schedule_expand():
+        """Generate availability from weekly templates up to the rolling horizon."""
+        created = expand()
+        db.session.commit()
+        click.echo(f"created {created} availability rows (horizon {horizon_days()} days)")
+
+    @app.cli.command("availability-purge")
+    @click.option("--before", type=click.DateTime(["%Y-%m-%d"]), default=None,
+                  help="delete rows dated before this day (default: today - AVAILABILITY_RETENTION_DAYS)")
+    @click.option("--archive", type=click.Path(dir_okay=False), default=None,
+                  help="append the purged availability rows to this NDJSON file first")
+    def availability_purge(before, archive):
+        """Delete past availability and slot rows so the hot tables stay small."""
+        before = before.date() if before else None
+        if archive:
+            with open(archive, "a", encoding="utf-8") as fh:
+                counts = purge(before, archive=fh)
+        else:
+            counts = purge(before)
+        click.echo(f"purged {counts[0]} availability rows and {counts[1]} slot rows")
@@ -0,0 +1,171 @@
+import re
+
+from sqlalchemy import or_, text
+from sqlalchemy.exc import OperationalError
+
+from database.model import db, Patient, Doctor
+from database.pagination import Page
+
+
+# Full-text search for the admin patient / doctor search boxes.
+#
+# On SQLite we keep two FTS5 tables, patient_fts and doctor_fts, whose rowid
+# is the patient_id / doctor_id. Triggers on the base tables keep them in
+# sync, so ORM writes, bulk inserts and raw SQL are all covered.
+# Phone numbers are stored as digits only ("+1 (555) 123-4567" -> "15551234567",
+# plus its last 10 / 7 digits) and the search term is normalised the same way,
+# so formatting and a missing country code don't matter.
+#
+# Other databases (or SQLite builds without FTS5) fall back to ILIKE.
+
+# SQL expression that strips the usual phone punctuation
+def _sql_digits(column):
+    expr = column
+    for ch in (" ", "-", "(", ")", "+", ".", "/"):
+        expr = f"replace({expr}, '{ch}', '')"
+    return expr
+
+
+# Indexed phone text: full digits plus the last 10 and last 7 digits, so a
+# search without the country / area code still matches as a prefix.
+def _sql_phone(column):
+    digits = _sql_digits(column)
+    return f"{digits} || ' ' || substr({digits}, -10) || ' ' || substr({digits}, -7)"
+
+
+def normalize_phone(value):
+    return re.sub(r"[\s\-()+./]", "", value or "")
+
+
+FTS_DDL = [
+    # prefix='2 3' builds extra indexes so short prefix queries stay fast
+    """CREATE VIRTUAL TABLE IF NOT EXISTS patient_fts USING fts5(
+         full_name, email, phone, tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS doctor_fts USING fts5(
+         full_name, email, tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+
+    f"""CREATE TRIGGER IF NOT EXISTS patient_fts_ai AFTER INSERT ON patient BEGIN
+         INSERT INTO patient_fts(rowid, full_name, email, phone)
+         VALUES (new.patient_id, new.full_name, new.email, {_sql_phone('new.phone_no')});
+       END""",
+    f"""CREATE TRIGGER IF NOT EXISTS patient_fts_au AFTER UPDATE OF full_name, email, phone_no ON patient BEGIN
+         UPDATE patient_fts SET full_name = new.full_name, email = new.email,
+                                phone = {_sql_phone('new.phone_no')}
+         WHERE rowid = old.patient_id;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS patient_fts_ad AFTER DELETE ON patient BEGIN
+         DELETE FROM patient_fts WHERE rowid = old.patient_id;
+       END""",
+
+    """CREATE TRIGGER IF NOT EXISTS doctor_fts_ai AFTER INSERT ON doctor BEGIN
+         INSERT INTO doctor_fts(rowid, full_name, email) VALUES (new.doctor_id, new.full_name, new.email);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS doctor_fts_au AFTER UPDATE OF full_name, email ON doctor BEGIN
+         UPDATE doctor_fts SET full_name = new.full_name, email = new.email WHERE rowid = old.doctor_id;
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS doctor_fts_ad AFTER DELETE ON doctor BEGIN
+         DELETE FROM doctor_fts WHERE rowid = old.doctor_id;
+       END""",
+]
+
+FTS_BACKFILL = [
+    "DELETE FROM patient_fts",
+    f"""INSERT INTO patient_fts(rowid, full_name, email, phone)
+        SELECT patient_id, full_name, email, {_sql_phone('phone_no')} FROM patient""",
+    "DELETE FROM doctor_fts",
+    "INSERT INTO doctor_fts(rowid, full_name, email) SELECT doctor_id, full_name, email FROM doctor",
+]
+
+
+def create_fts(conn):
+    """Create (or rebuild) the FTS tables + triggers. Returns False if FTS5 isn't available."""
+    if conn.dialect.name != "sqlite":
+        return False
+    try:
+        conn.execute(text(FTS_DDL[0]))
+    except OperationalError:
+        # SQLite built without FTS5 -> searches keep using ILIKE
+        return False
+    for ddl in FTS_DDL[1:] + FTS_BACKFILL:
+        conn.execute(text(ddl))
+    return True
+
+
+_fts_ready = None
+
+
+def fts_available():
+    global _fts_ready
+    if _fts_ready is None:
+        _fts_ready = db.engine.dialect.name == "sqlite" and db.session.execute(text(
+            "SELECT count(*) FROM sqlite_master WHERE name IN ('patient_fts', 'doctor_fts')")).scalar() == 2
+    return _fts_ready
+
+
+def match_expression(q):
+    """
+    User text -> FTS5 MATCH string. Every word must match as a prefix
+    ("jo smi" finds "John Smith"); phone-like words are reduced to digits.
+    """
+    terms = []
+    for word in q.split():
+        digits = normalize_phone(word)
+        if digits.isdigit():
+            word = digits
+        word = word.replace('"', '""')
+        if word.strip():
+            terms.append(f'"{word}"*')
+    return " AND ".join(terms)
+
+
+def _search(query, model, fts_table, id_column, q, page, per_page):
+    expr = match_expression(q)
+    if not expr:
+        return [], False
+    # best matches first (bm25), one extra row tells us if there is a next page
+    ids = db.session.execute(
+        text(f"SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH :q ORDER BY rank LIMIT :n OFFSET :o"),
+        {"q": expr, "n": per_page + 1, "o": (page - 1) * per_page}).scalars().all()
+    has_more = len(ids) > per_page
+    ids = ids[:per_page]
+    rows = {getattr(r, id_column): r for r in query.filter(getattr(model, id_column).in_(ids))}
+    return [rows[i] for i in ids if i in rows], has_more
+
+
+def _like_search(query, columns, q, page, per_page):
+    like = f"%{q}%"
+    rows = (query.filter(or_(*[c.ilike(like) for c in columns]))
+            .order_by(columns[0])
+            .limit(per_page + 1).offset((page - 1) * per_page).all())
+    return rows[:per_page], len(rows) > per_page
+
+
+def _page(rows, has_more, page):
+    return Page(rows,
+                next_cursor=str(page + 1) if has_more else None,
+                prev_cursor=str(page - 1) if page > 1 else None,
+                numbered=True)
+
+
+def search_patients(q, page=1, per_page=25, query=None):
+    """Ranked, paginated patient search by name / email / phone."""
+    page = max(1, page)
+    query = Patient.query if query is None else query
+    if fts_available():
+        rows, has_more = _search(query, Patient, "patient_fts", "patient_id", q, page, per_page)
+    else:
+        rows, has_more = _like_search(query, [Patient.full_name, Patient.email, Patient.phone_no],
+                                      q, page, per_page)
+    return _page(rows, has_more, page)
+
+
+def search_doctors(q, page=1, per_page=25, query=None):
+    """Ranked, paginated doctor search by name / email."""
+    page = max(1, page)
+    query = Doctor.query if query is None else query
+    if fts_available():
+        rows, has_more = _search(query, Doctor, "doctor_fts", "doctor_id", q, page, per_page)
+    else:
+        rows, has_more = _like_search(query, [Doctor.full_name, Doctor.email],
+                                      q, page, per_page)
+    return _page(rows, has_more, page)
@@ -0,0 +1,273 @@
+from datetime import datetime, date, timedelta
+
+from sqlalchemy import select, insert, update, delete, exists, or_, tuple_
+from sqlalchemy.exc import IntegrityError
+
+from database.model import db, Doctor, Doctor_blacklist, Appointment, DoctorAvailability, SlotInventory
+
+
+# Slot inventory: keeps the `slot_inventory` table in step with
+# DoctorAvailability (the shifts) and Appointment (the bookings), so that
+# "which slots are free?" is one indexed read instead of rebuilding the
+# slot list and diffing it against appointments on every request.
+#
+# Every function takes an optional `conn` (a Session or a Connection) so the
+# same code is used by the routes and by migrations.
+
+SLOT_MINUTES = 20
+
+# shift name -> (first slot may start at, last slot must start before)
+SHIFTS = {
+    "morning": (DoctorAvailability.SHIFT1_START, DoctorAvailability.SHIFT1_END),
+    "afternoon": (DoctorAvailability.SHIFT2_START, DoctorAvailability.SHIFT2_END),
+}
+
+FREE = "free"
+HELD = "held"
+BOOKED = "booked"
+
+
+def generate_slots(start, end):
+    slots = []
+    cur = datetime.combine(date.today(), start)
+    end_dt = datetime.combine(date.today(), end)
+    while cur + timedelta(minutes=SLOT_MINUTES) <= end_dt:
+        slots.append(cur.time())
+        cur += timedelta(minutes=SLOT_MINUTES)
+    return slots
+
+
+def shift_slots(av):
+    """All slot start times offered by one DoctorAvailability row (or None)."""
+    slots = []
+    if av is None:
+        return slots
+    if av.shift1_enabled:
+        slots += generate_slots(av.shift1_start or DoctorAvailability.SHIFT1_START,
+                                av.shift1_end or DoctorAvailability.SHIFT1_END)
+    if av.shift2_enabled:
+        slots += generate_slots(av.shift2_start or DoctorAvailability.SHIFT2_START,
+                                av.shift2_end or DoctorAvailability.SHIFT2_END)
+    return slots
+
+
+# ------------------------------ writes -----------------------------------
+
+def sync_day(doctor_id, department_id, d, av, conn=None):
+    """
+    Make the inventory for (doctor, date) match the availability row `av`.
+    - slots that are no longer offered are removed, unless already booked
+    - new slots are added as free (or booked if an appointment already holds them)
+    """
+    conn = conn or db.session
+    wanted = set(shift_slots(av))
+
+    existing = {row.time: row.state for row in conn.execute(
+        select(SlotInventory.time, SlotInventory.state)
+        .where(SlotInventory.doctor_id == doctor_id, SlotInventory.date == d))}
+
+    stale = [t for t, state in existing.items() if t not in wanted and state != BOOKED]
+    if stale:
+        conn.execute(delete(SlotInventory).where(
+            SlotInventory.doctor_id == doctor_id,
+            SlotInventory.date == d,
+            SlotInventory.time.in_(stale)))
+
+    missing = wanted - set(existing)
+    if missing:
+        booked = set(conn.execute(
+            select(Appointment.time).where(Appointment.doctor_id == doctor_id,
+                                           Appointment.date == d,
+                                           Appointment.status == "booked")).scalars())
+        conn.execute(insert(SlotInventory), [
+            {"doctor_id": doctor_id, "department_id": department_id, "date": d, "time": t,
+             "state": BOOKED if t in booked else FREE}
+            for t in sorted(missing)
+        ])
+
+
+def fill_days(days, conn=None):
+    """
+    Bulk version of sync_day() for NEW availability rows (imports):
+    days = [(doctor_id, department_id, date, av), ...]. Two lookups + one INSERT.
+    """
+    conn = conn or db.session
+    if not days:
+        return
+    keys = [(doctor_id, d) for doctor_id, _, d, _ in days]
+    booked = set(conn.execute(
+        select(Appointment.doctor_id, Appointment.date, Appointment.time)
+        .where(tuple_(Appointment.doctor_id, Appointment.date).in_(keys),
+               Appointment.status == "booked")).all())
+    existing = set(conn.execute(
+        select(SlotInventory.doctor_id, SlotInventory.date, SlotInventory.time)
+        .where(tuple_(SlotInventory.doctor_id, SlotInventory.date).in_(keys))).all())
+
+    rows = [{"doctor_id": doctor_id, "department_id": department_id, "date": d, "time": t,
+             "state": BOOKED if (doctor_id, d, t) in booked else FREE}
+            for doctor_id, department_id, d, av in days
+            for t in shift_slots(av)
+            if (doctor_id, d, t) not in existing]
+    if rows:
+        conn.execute(insert(SlotInventory), rows)
+
+
+class SlotTaken(Exception):
+    """The slot was booked by someone else (or is not offered at all)."""
+
+
+def claim(doctor_id, d, t, conn=None):
+    """
+    Atomically flip one slot from free to booked.
+    The WHERE state='free' makes this a compare-and-set: when two requests
+    race for the same slot only one UPDATE matches a row, the other gets 0.
+    """
+    conn = conn or db.session
+    result = conn.execute(update(SlotInventory)
+                          .where(SlotInventory.doctor_id == doctor_id,
+                                 SlotInventory.date == d,
+                                 SlotInventory.time == t,
+                                 SlotInventory.state == FREE)
+                          .values(state=BOOKED))
+    return result.rowcount == 1
+
+
+def book(patient_id, doctor_id, department_name, d, t):
+    """
+    Claim the slot and create the Appointment in one transaction.
+    Raises SlotTaken (after rolling back) if the slot is no longer free.
+    """
+    try:
+        if not claim(doctor_id, d, t):
+            raise SlotTaken()
+        appt = Appointment(patient_id=patient_id, doctor_id=doctor_id, date=d, time=t,
+                           department=department_name, status="booked")
+        db.session.add(appt)
+        # second line of defence: unique index on active (doctor_id, date, time)
+        db.session.commit()
+    except (SlotTaken, IntegrityError):
+        db.session.rollback()
+        raise SlotTaken()
+    return appt
+
+
+def release(doctor_id, d, t, conn=None):
+    """A booking was cancelled: free the slot again, or drop it if the shift is gone."""
+    conn = conn or db.session
+    av = conn.execute(select(DoctorAvailability.__table__)
+                      .where(DoctorAvailability.doctor_id == doctor_id,
+                             DoctorAvailability.date == d)).first()
+    where = (SlotInventory.doctor_id == doctor_id, SlotInventory.date == d, SlotInventory.time == t)
+    if t in shift_slots(av):
+        conn.execute(update(SlotInventory).where(*where).values(state=FREE))
+    else:
+        conn.execute(delete(SlotInventory).where(*where))
+
+
+def move_doctor(doctor_id, department_id, conn=None):
+    """Doctor changed department: keep the copied department_id in step."""
+    conn = conn or db.session
+    conn.execute(update(SlotInventory)
+                 .where(SlotInventory.doctor_id == doctor_id)
+                 .values(department_id=department_id))
+
+
+def delete_for_doctor(doctor_id, conn=None):
+    conn = conn or db.session
+    conn.execute(delete(SlotInventory).where(SlotInventory.doctor_id == doctor_id))
+
+
+def rebuild(from_date=None, conn=None):
+    """Recreate the inventory from DoctorAvailability for dates >= from_date (default today)."""
+    conn = conn or db.session
+    from_date = from_date or date.today()
+    conn.execute(delete(SlotInventory).where(SlotInventory.date >= from_date))
+
+    departments = dict(conn.execute(select(Doctor.doctor_id, Doctor.department_id)).all())
+    # table rows, not entities: on a bare Connection (migrations) .scalars()
+    # would give the primary keys only
+    rows = conn.execute(select(DoctorAvailability.__table__)
+                        .where(DoctorAvailability.date >= from_date)).all()
+    for av in rows:
+        sync_day(av.doctor_id, departments.get(av.doctor_id), av.date, av, conn=conn)
+
+
+# ------------------------------ reads ------------------------------------
+
+def free_slots(doctor_id, d):
+    """Free slot times for one doctor on one date (single index range read)."""
+    return list(db.session.execute(
+        select(SlotInventory.time)
+        .where(SlotInventory.doctor_id == doctor_id,
+               SlotInventory.date == d,
+               SlotInventory.state == FREE)
+        .order_by(SlotInventory.time)).scalars())
+
+
+def earliest_free_slots(department_id, start=None, end=None, shift=None, min_experience=None, limit=10):
+    """
+    Earliest `limit` free slots across ALL doctors of a department.
+    Returns [(SlotInventory, Doctor), ...] from a single query, however many
+    doctors / days are involved:
+    - start / end   : date window (inclusive), default today .. today + 30
+    - shift         : 'morning' or 'afternoon' (None = both)
+    - min_experience: only doctors with at least this many years
+    Blacklisted doctors are skipped; slots earlier today are skipped.
+    """
+    start = start or date.today()
+    end = end or start + timedelta(days=30)
+
+    query = (select(SlotInventory, Doctor)
+             .join(Doctor, Doctor.doctor_id == SlotInventory.doctor_id)
+             .where(SlotInventory.department_id == department_id,
+                    SlotInventory.state == FREE,
+                    SlotInventory.date >= start,
+                    SlotInventory.date <= end,
+                    ~exists().where(Doctor_blacklist.doctor_id == SlotInventory.doctor_id)))
+
+    if shift in SHIFTS:
+        shift_start, shift_end = SHIFTS[shift]
+        query = query.where(SlotInventory.time >= shift_start, SlotInventory.time < shift_end)
+    if min_experience:
+        query = query.where(Doctor.experience >= min_experience)
+
+    now = datetime.now()
+    if start <= now.date():
+        query = query.where(or_(SlotInventory.date > now.date(), SlotInventory.time >= now.time()))
+
+    query = query.order_by(SlotInventory.date, SlotInventory.time, SlotInventory.doctor_id).limit(limit)
+    return db.session.execute(query).all()
+
+
+def free_slot_window_query(start, end, department_id=None, doctor_id=None):
+    """
+    SELECT of every free (doctor_id, date, time) in start..end for a department
+    or one doctor, ordered by doctor, date, time - one indexed range read.
+    Blacklisted doctors and slots earlier today are skipped.
+    """
+    query = (select(SlotInventory.doctor_id, SlotInventory.date, SlotInventory.time)
+             .where(SlotInventory.state == FREE,
+                    SlotInventory.date >= start,
+                    SlotInventory.date <= end,
+                    ~exists().where(Doctor_blacklist.doctor_id == SlotInventory.doctor_id)))
+    if department_id is not None:
+        query = query.where(SlotInventory.department_id == department_id)
+    if doctor_id is not None:
+        query = query.where(SlotInventory.doctor_id == doctor_id)
+
+    now = datetime.now()
+    if start <= now.date():
+        query = query.where(or_(SlotInventory.date > now.date(), SlotInventory.time >= now.time()))
+
+    return query.order_by(SlotInventory.doctor_id, SlotInventory.date, SlotInventory.time)
+
+
+def free_slot_window(start, end, department_id=None, doctor_id=None):
+    """Rows of free_slot_window_query()."""
+    return db.session.execute(free_slot_window_query(start, end, department_id, doctor_id)).all()
+
+
+def first_free_slot(department_id, from_date=None):
+    """Earliest free SlotInventory row in a department on/after from_date (or None)."""
+    found = earliest_free_slots(department_id, start=from_date, limit=1)
+    return found[0][0] if found else None
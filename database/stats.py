@@ -0,0 +1,175 @@
+from collections import Counter
+
+import click
+from sqlalchemy import event, func, inspect, select, insert, update, delete
+from sqlalchemy.orm import Session
+
+from database.model import (db, Patient, Doctor, Appointment, Blacklist, Department,
+                            StatCounter)
+
+
+# Incremental counters for the admin overview.
+# COUNT(*) over a big table is a full scan on SQLite, so instead every flush
+# that adds / removes / changes a counted row adjusts the matching counter in
+# the `stat_counter` table inside the same transaction.
+# `flask stats-rebuild` recomputes everything from scratch if they ever drift
+# (e.g. after raw SQL edits). Appointment counts include the archive.
+
+APPOINTMENT_STATUSES = ("booked", "completed", "cancelled")
+
+
+def department_key(department_id):
+    return f"department:{int(department_id)}:doctors"
+
+
+def status_key(status):
+    return f"appointments:{status}"
+
+
+# ------------------------------ deltas -----------------------------------
+
+def _old_new(obj, attr):
+    """(old, new) value of an attribute changed in this flush, or None if unchanged."""
+    hist = inspect(obj).attrs[attr].history
+    if not hist.has_changes():
+        return None
+    old = hist.deleted[0] if hist.deleted else None
+    new = hist.added[0] if hist.added else None
+    return old, new
+
+
+def _doctor_deltas(deltas, doctor, sign):
+    deltas["doctors"] += sign
+    if doctor.department_id:
+        deltas[department_key(doctor.department_id)] += sign
+
+
+def _appointment_deltas(deltas, appt, sign):
+    deltas["appointments"] += sign
+    deltas[status_key(appt.status)] += sign
+
+
+def collect_deltas(session):
+    deltas = Counter()
+
+    for obj in session.new:
+        if isinstance(obj, Patient):
+            deltas["patients"] += 1
+        elif isinstance(obj, Doctor):
+            _doctor_deltas(deltas, obj, +1)
+        elif isinstance(obj, Appointment):
+            _appointment_deltas(deltas, obj, +1)
+        elif isinstance(obj, Blacklist):
+            deltas["blacklisted"] += 1
+
+    for obj in session.deleted:
+        if isinstance(obj, Patient):
+            deltas["patients"] -= 1
+        elif isinstance(obj, Doctor):
+            _doctor_deltas(deltas, obj, -1)
+        elif isinstance(obj, Appointment):
+            _appointment_deltas(deltas, obj, -1)
+        elif isinstance(obj, Blacklist):
+            deltas["blacklisted"] -= 1
+
+    for obj in session.dirty:
+        if isinstance(obj, Doctor):
+            change = _old_new(obj, "department_id")
+            if change:
+                old, new = change
+                if old:
+                    deltas[department_key(old)] -= 1
+                if new:
+                    deltas[department_key(new)] += 1
+        elif isinstance(obj, Appointment):
+            change = _old_new(obj, "status")
+            if change:
+                old, new = change
+                deltas[status_key(old)] -= 1
+                deltas[status_key(new)] += 1
+
+    return {name: value for name, value in deltas.items() if value}
+
+
+def bump(deltas, conn=None):
+    """
+    Add deltas ({'patients': +5, ...}) to the counters.
+    Used by the flush hook, and directly by bulk code paths that skip the ORM.
+    """
+    conn = conn or db.session
+    for name, value in deltas.items():
+        result = conn.execute(update(StatCounter)
+                              .where(StatCounter.name == name)
+                              .values(value=StatCounter.value + value))
+        if result.rowcount == 0:
+            conn.execute(insert(StatCounter).values(name=name, value=value))
+
+
+def _after_flush(session, flush_context):
+    deltas = collect_deltas(session)
+    if deltas:
+        # write through the flush's own connection -> same transaction
+        bump(deltas, conn=session.connection())
+
+
+# ------------------------------ rebuild ----------------------------------
+
+def recompute(conn=None):
+    """Throw the counters away and count everything again."""
+    conn = conn or db.session
+    counts = {
+        "doctors": conn.execute(select(func.count()).select_from(Doctor)).scalar(),
+        "patients": conn.execute(select(func.count()).select_from(Patient)).scalar(),
+        "appointments": conn.execute(select(func.count()).select_from(Appointment)).scalar(),
+        "blacklisted": conn.execute(select(func.count()).select_from(Blacklist)).scalar(),
+    }
+    for status in APPOINTMENT_STATUSES:
+        counts[status_key(status)] = 0
+    for status, n in conn.execute(select(Appointment.status, func.count()).group_by(Appointment.status)):
+        counts[status_key(status)] = n
+
+    for (department_id,) in conn.execute(select(Department.department_id)):
+        counts[department_key(department_id)] = 0
+    for department_id, n in conn.execute(select(Doctor.department_id, func.count())
+                                         .where(Doctor.department_id.isnot(None))
+                                         .group_by(Doctor.department_id)):
+        counts[department_key(department_id)] = n
+
+    # archived appointments still count (see database/archive.py)
+    from database import archive
+    for name, n in archive.counts().items():
+        counts[name] = counts.get(name, 0) + n
+
+    conn.execute(delete(StatCounter))
+    conn.execute(insert(StatCounter), [{"name": k, "value": v} for k, v in counts.items()])
+    return counts
+
+
+# ------------------------------ reads ------------------------------------
+
+def overview():
+    """
+    Everything the admin overview needs from the counters (one query):
+    {'doctors': n, 'patients': n, 'appointments': n, 'blacklisted': n,
+     'status': {'booked': n, ...}, 'departments': {department_id: n}}
+    """
+    values = dict(db.session.execute(select(StatCounter.name, StatCounter.value)).all())
+    result = {name: values.get(name, 0) for name in ("doctors", "patients", "appointments", "blacklisted")}
+    result["status"] = {s: values.get(status_key(s), 0) for s in APPOINTMENT_STATUSES}
+    result["departments"] = {}
+    for name, value in values.items():
+        if name.startswith("department:"):
+            result["departments"][int(name.split(":")[1])] = value
+    return result
+
+
+def setup_stats(app):
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "after_flush", _after_flush)
+
+    @app.cli.command("stats-rebuild")
+    def stats_rebuild():
+        """Recompute the admin overview counters from the tables."""
+        counts = recompute()
+        db.session.commit()
+        click.echo(f"recomputed {len(counts)} counters")
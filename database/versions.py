@@ -0,0 +1,120 @@
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import event, select, insert, update
+from sqlalchemy.orm import Session
+
+from database.model import db, DataVersion
+
+
+# Data-version stamps, one per table, for the page cache.
+#
+# Every transaction that writes a tracked table bumps that table's row in
+# `data_version` right after it commits, so a cached page keyed on the
+# versions of the tables it shows is stale as soon as one of them changes -
+# in every worker, because the stamps live in the database.
+#
+# The bump is its own short transaction: done inside the writing one, every
+# concurrent booking would wait on the 'appointment' row lock until the
+# booking before it committed (PostgreSQL / MySQL). The price is a moment
+# between the commit and the bump in which a page can still come from the
+# cache; a bump that fails leaves it there until PAGE_CACHE_TTL.
+#
+# Writes are picked up from ORM flushes and from session.execute(insert /
+# update / delete). Code that writes through a bare Connection calls touch().
+
+TRACKED = (
+    "admin", "patient", "doctor", "department", "appointment", "treatment",
+    "blacklist", "doctor_blacklist", "doctor_availability", "doctor_schedule_template",
+    "appointment_archive", "treatment_archive", "doctor_patient",
+)
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+
+def seed(conn=None):
+    """Create the missing version rows (version 0)."""
+    conn = conn or db.session
+    existing = set(conn.execute(select(DataVersion.table_name)).scalars())
+    missing = [{"table_name": t, "version": 0, "changed_at": _utcnow()} for t in TRACKED if t not in existing]
+    if missing:
+        conn.execute(insert(DataVersion), missing)
+
+
+def touch(*tables, conn=None):
+    """Bump the version of these tables (caller commits)."""
+    tables = sorted(set(tables) & set(TRACKED))
+    if not tables:
+        return
+    conn = conn or db.session
+    now = _utcnow()
+    result = conn.execute(update(DataVersion).where(DataVersion.table_name.in_(tables))
+                          .values(version=DataVersion.version + 1, changed_at=now)
+                          .execution_options(synchronize_session=False))
+    if result.rowcount < len(tables):
+        seed(conn)
+        touch(*tables, conn=conn)
+
+
+def current(tables):
+    """{table: (version, changed_at)} for the given tables (one indexed read)."""
+    rows = db.session.execute(select(DataVersion.table_name, DataVersion.version, DataVersion.changed_at)
+                              .where(DataVersion.table_name.in_(tables))).all()
+    return {name: (version, changed_at) for name, version, changed_at in rows}
+
+
+# ------------------------------ session hooks ----------------------------
+
+def _changed(session):
+    return session.info.setdefault("changed_tables", set())
+
+
+def _after_flush(session, flush_context):
+    changed = _changed(session)
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(obj, "__table__", None)
+        if table is not None:
+            changed.add(table.name)
+
+
+def _do_orm_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None and table.name != DataVersion.__tablename__:
+            _changed(orm_execute_state.session).add(table.name)
+
+
+def _before_commit(session):
+    # commit() flushes after this hook runs; flush now so those writes count too
+    session.flush()
+    changed = session.info.pop("changed_tables", None)
+    if changed:
+        session.info["committing_tables"] = changed
+
+
+def _after_commit(session):
+    changed = session.info.pop("committing_tables", None)
+    if not changed:
+        return
+    try:
+        # a write: on the primary even when the session was reading from a replica
+        bind = session.get_bind(mapper=DataVersion.__mapper__, clause=update(DataVersion))
+        with bind.begin() as conn:
+            touch(*changed, conn=conn)
+    except Exception:
+        logging.getLogger(__name__).exception("could not bump data versions of %s", sorted(changed))
+
+
+def _after_rollback(session):
+    session.info.pop("changed_tables", None)
+    session.info.pop("committing_tables", None)
+
+
+def setup_versions(app):
+    for name, fn in (("after_flush", _after_flush), ("do_orm_execute", _do_orm_execute),
+                     ("before_commit", _before_commit), ("after_commit", _after_commit),
+                     ("after_rollback", _after_rollback)):
+        if not event.contains(Session, name, fn):
+            event.listen(Session, name, fn)
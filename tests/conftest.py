@@ -0,0 +1,80 @@
+"""
+Shared fixtures for the test suite.
+
+    pip install pytest
+    python -m pytest tests
+
+Every app runs on a throw-away SQLite file (never instance/db.sqlite3), with
+a cheap password hash and the rate limiter / page cache switched off so the
+tests see the views themselves.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# before anything imports app.py (which builds an app from the environment)
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI",
+                      f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'import.db')}")
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ["PASSWORD_HASH_ITERATIONS"] = "1000"
+os.environ["RATE_LIMIT_ENABLED"] = "False"
+os.environ["PAGE_CACHE_ENABLED"] = "False"
+
+
+def build_app(path, **overrides):
+    """An app on the SQLite file `path`; nothing is created yet."""
+    from app import create_app
+    return create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}", "TESTING": True, **overrides})
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Fresh schema with the default admin and departments."""
+    from database.init_db import init_db
+    app = build_app(tmp_path / "test.db")
+    init_db(app)
+    return app
+
+
+@pytest.fixture(scope="module")
+def data_app(tmp_path_factory):
+    """
+    Schema plus the benchmark data set at tiny scale (10 doctors, 200
+    patients, three weeks of appointments). Shared by a test module: tests
+    that add rows must not depend on exact counts.
+    """
+    from database.init_db import init_db
+    from benchmarks import datagen
+    app = build_app(tmp_path_factory.mktemp("data") / "test.db")
+    init_db(app)
+    with app.app_context():
+        app.manifest = datagen.generate("tiny", seed=7)
+    return app
+
+
+def login(app, role, user_id):
+    """A test client whose session is already signed in."""
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["user_id"] = user_id
+        sess["role"] = role
+    return client
+
+
+@contextmanager
+def count_statements():
+    """Counts the SQL statements sent to any engine inside the block: `with count_statements() as n: ...; n[0]`."""
+    counter = [0]
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter[0] += 1
+
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(Engine, "before_cursor_execute", before_cursor_execute)
@@ -0,0 +1,111 @@
+"""
+Archiving old appointments (database/archive.py) never loses a treatment.
+"""
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+from database import archive
+from database.model import db, Appointment, Treatment, Doctor, Patient, ArchivedAppointment, ArchivedTreatment
+
+
+def _history():
+    """A doctor, a patient and three finished appointments last month; returns their ids."""
+    db.session.add(Doctor(full_name="Dr Old", email="old@doc", password="pw", department_id=1))
+    db.session.add(Patient(full_name="Ann Lee", email="ann@x.test", password="pw", phone_no="0",
+                           dob=date(1990, 1, 1), address="-"))
+    db.session.flush()
+    day = date.today() - timedelta(days=30)
+    appointments = [Appointment(patient_id=1, doctor_id=1, date=day, time=time(9 + i), department="Cardiology",
+                                status=status) for i, status in enumerate(("completed", "completed", "cancelled"))]
+    db.session.add_all(appointments)
+    db.session.flush()
+    db.session.add(Treatment(appointment_id=appointments[0].appointment_id, diagnosis="Flu"))
+    db.session.commit()
+    return [a.appointment_id for a in appointments]
+
+
+def test_treatment_added_after_the_copy_is_kept(app, monkeypatch):
+    with app.app_context():
+        archive.create_tables()
+        ids = _history()
+        copy = archive._copy
+
+        def copy_then_treat(appointments, treatments):
+            copy(appointments, treatments)
+            # the doctor records a treatment while the chunk is between copy and delete
+            db.session.add(Treatment(appointment_id=ids[1], diagnosis="Late note"))
+            db.session.commit()
+
+        monkeypatch.setattr(archive, "_copy", copy_then_treat)
+        assert archive.move(before=date.today()) == (2, 1)
+
+        assert [a.appointment_id for a in Appointment.query.all()] == [ids[1]]
+        assert Treatment.query.one().diagnosis == "Late note"
+        assert db.session.get(ArchivedAppointment, ids[1]) is None
+        assert archive.counts()["appointments"] == 2
+
+        monkeypatch.setattr(archive, "_copy", copy)
+        assert archive.move(before=date.today()) == (1, 1)
+        assert Appointment.query.count() == 0 and Treatment.query.count() == 0
+        assert sorted(t.diagnosis for t in ArchivedTreatment.query.all()) == ["Flu", "Late note"]
+
+
+def test_ids_of_archived_appointments_are_not_reused(app):
+    with app.app_context():
+        archive.create_tables()
+        ids = _history()
+        assert archive.move(before=date.today()) == (3, 1)
+
+        # the newest id went to the archive; the next booking must not get it again
+        visit = Appointment(patient_id=1, doctor_id=1, date=date.today() - timedelta(days=2), time=time(9),
+                            department="Cardiology", status="completed")
+        db.session.add(visit)
+        db.session.commit()
+        assert visit.appointment_id > max(ids)
+
+        assert archive.move(before=date.today()) == (1, 0)
+        assert Appointment.query.count() == 0
+        assert ArchivedAppointment.query.count() == 4
+
+
+def test_a_different_archived_row_with_the_same_id_stops_the_mover(app):
+    with app.app_context():
+        archive.create_tables()
+        ids = _history()
+        db.session.add(ArchivedAppointment(appointment_id=ids[2], patient_id=1, doctor_id=1, date=date(2020, 1, 1),
+                                           time=time(9), department="Cardiology", status="cancelled",
+                                           archived_at=datetime(2020, 2, 1)))
+        db.session.commit()
+
+        with pytest.raises(archive.ArchiveConflict):
+            archive.move(before=date.today())
+        assert Appointment.query.count() == 3 and Treatment.query.count() == 1
+        assert ArchivedAppointment.query.count() == 1
+
+
+def test_upgrade_renumbers_ids_the_archive_already_has(app):
+    from database.migrate import schema_migrations, upgrade
+
+    with app.app_context():
+        archive.create_tables()
+        ids = _history()
+        assert archive.move(before=date.today()) == (3, 1)
+        # what the old schema did: the next rows got the archived ids again
+        day = date.today() - timedelta(days=2)
+        db.session.add(Appointment(appointment_id=ids[0], patient_id=1, doctor_id=1, date=day, time=time(9),
+                                   department="Cardiology", status="completed"))
+        db.session.add(Treatment(treatment_id=1, appointment_id=ids[0], diagnosis="Cold"))
+        db.session.commit()
+        with pytest.raises(archive.ArchiveConflict):
+            archive.move(before=date.today())
+
+        db.session.execute(schema_migrations.delete().where(schema_migrations.c.version == 12))
+        db.session.commit()
+        assert upgrade() == [12]
+
+        visit = Appointment.query.one()
+        assert visit.appointment_id > max(ids) and visit.treatment.diagnosis == "Cold"
+        assert visit.treatment.treatment_id > 1
+        assert archive.move(before=date.today()) == (1, 1)
+        assert sorted(t.diagnosis for t in ArchivedTreatment.query.all()) == ["Cold", "Flu"]
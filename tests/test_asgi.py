@@ -0,0 +1,44 @@
+"""
+The async booking API (asgi.py) answers bad request bodies with 400, like
+the Flask API. Needs the optional ASGI packages (starlette, aiosqlite).
+"""
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("starlette")
+pytest.importorskip("aiosqlite")
+
+
+def _post(asgi_app, path, body, cookie):
+    """One request through the ASGI interface; returns (status, decoded JSON body)."""
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+             "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+             "root_path": "", "client": ("127.0.0.1", 1234), "server": ("test", 80),
+             "headers": [(b"host", b"test"), (b"content-type", b"application/json"),
+                         (b"cookie", f"session={cookie}".encode())]}
+    asyncio.run(asgi_app(scope, receive, send))
+    status = next(m["status"] for m in sent if m["type"] == "http.response.start")
+    payload = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return status, json.loads(payload)
+
+
+@pytest.mark.parametrize("body", [b"{not json", b"\xff\xfe", b"[1, 2]", b""])
+def test_malformed_booking_body_is_400(app, body):
+    from asgi import create_asgi_app
+    from controllers.api import PREFIX
+
+    cookie = app.session_interface.get_signing_serializer(app).dumps({"user_id": 1, "role": "patient"})
+    status, payload = _post(create_asgi_app(app), PREFIX + "/appointments", body, cookie)
+    assert status == 400
+    assert "required" in payload["error"]
@@ -0,0 +1,17 @@
+"""
+Concurrent bookings of one slot (benchmarks/stress_booking.py): exactly one
+appointment may come out of it, and the slot must end up booked.
+"""
+from benchmarks.stress_booking import prepare, race, outcome
+
+PATIENTS = 20
+
+
+def test_one_slot_books_once(app):
+    doctor_id, day = prepare(app, PATIENTS)
+    results = race(app, PATIENTS, doctor_id, day)
+    assert len(results) == PATIENTS
+
+    booked, state = outcome(app, doctor_id, day)
+    assert len(booked) == 1
+    assert state == "booked"
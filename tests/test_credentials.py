@@ -0,0 +1,93 @@
+"""
+Password checks on the KDF pool (database/credentials.py).
+"""
+import io
+import threading
+
+import pytest
+
+from database import credentials
+from database.credentials import CredentialBusy
+from tests.conftest import build_app, login
+
+
+@pytest.fixture
+def pool(tmp_path):
+    """One KDF worker, a queue of two and a short wait."""
+    return build_app(tmp_path / "test.db", PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE=2,
+                     PASSWORD_HASH_TIMEOUT=0.2)
+
+
+def test_unknown_account_runs_the_kdf(app, monkeypatch):
+    checked = []
+    real = credentials.check_password_hash
+    monkeypatch.setattr(credentials, "check_password_hash", lambda h, p: checked.append(h) or real(h, p))
+
+    response = app.test_client().post("/login", data={"role": "patient", "email": "nobody@x.test",
+                                                      "password": "guess"})
+    assert response.status_code == 302
+    assert len(checked) == 1 and credentials.is_hashed(checked[0])
+
+
+def test_slow_hash_is_busy_and_keeps_its_queue_slot(pool):
+    release = threading.Event()
+    with pytest.raises(CredentialBusy):
+        credentials._run(release.wait)            # outlives PASSWORD_HASH_TIMEOUT
+    with pytest.raises(CredentialBusy):
+        credentials._run(release.wait)            # waits behind it, times out too
+    # both calls gave up, but their work is still queued: no slot may be free
+    with pytest.raises(CredentialBusy):
+        credentials._run(lambda: None)
+    release.set()
+    assert credentials._run(lambda: "ok") == "ok"
+
+
+def test_hash_many_stays_within_the_queue(pool):
+    hashes = credentials.hash_many([f"pw{i}" for i in range(6)])
+    assert len(hashes) == 6 and all(credentials.is_hashed(h) for h in hashes)
+    assert credentials._run(lambda: "ok") == "ok"  # every slot was handed back
+
+
+def test_upload_hashes_plain_passwords_up_to_the_cap(tmp_path):
+    from database.init_db import init_db
+    from database.model import Patient
+
+    app = build_app(tmp_path / "test.db", IMPORT_WEB_MAX_PLAINTEXT=2)
+    init_db(app)
+    with app.app_context():
+        hashed = credentials.hash_password("secret")
+    content = ("full_name,email,password,phone_no,dob,address\n"
+               + "".join(f"P {i},p{i}@x.test,plain{i},123,1990-01-01,Road {i}\n" for i in range(3))
+               + f"Ann Lee,ann@x.test,{hashed},123,1990-01-01,Road 1\n").encode()
+    response = login(app, "admin", "admin@gmail.com").post(
+        "/admin/import", data={"kind": "patients", "file": (io.BytesIO(content), "p.csv")},
+        content_type="multipart/form-data")
+
+    assert b"only 2 plain passwords are hashed per upload" in response.data
+    with app.app_context():
+        stored = {p.email: p.password for p in Patient.query.all()}
+        assert sorted(stored) == ["ann@x.test", "p0@x.test", "p1@x.test"]
+        assert stored["ann@x.test"] == hashed
+        assert credentials.verify_password(stored["p1@x.test"], "plain1")
+
+
+def test_admin_doctor_forms_survive_a_full_queue(app, monkeypatch):
+    from database.model import db, Doctor
+
+    with app.app_context():
+        db.session.add(Doctor(full_name="Dr Known", email="known@doc", password="pw", department_id=1))
+        db.session.commit()
+
+    def busy(password):
+        raise CredentialBusy()
+    monkeypatch.setattr(credentials, "hash_password", busy)
+    client = login(app, "admin", "admin@gmail.com")
+    form = {"full_name": "Dr New", "email": "new@doc", "password": "pw", "experience": "3",
+            "department_id": "1", "phone_no": "0"}
+
+    response = client.post("/admin/doctor/add", data=form)
+    assert response.status_code == 302 and response.headers["Location"].endswith("/admin/doctor/add")
+    response = client.post("/admin/doctor/edit/1", data=form)
+    assert response.status_code == 302 and response.headers["Location"].endswith("/admin/doctor/edit/1")
+    with app.app_context():
+        assert [(d.email, d.password) for d in Doctor.query.all()] == [("known@doc", "pw")]
@@ -0,0 +1,53 @@
+"""
+The admin appointment export (controllers/export.py): archived history is
+only included when asked, and every row carries the people's names.
+"""
+import csv
+import io
+from datetime import date, time, timedelta
+
+from tests.conftest import login
+
+
+def _rows(client, query=""):
+    response = client.get(f"/admin/export/appointments.csv{query}")
+    assert response.status_code == 200
+    return list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+
+
+def test_export_includes_the_archive_only_when_asked(app):
+    from database import archive
+    from database.model import db, Appointment, Treatment, Doctor, Patient
+
+    with app.app_context():
+        archive.create_tables()
+        db.session.add(Doctor(full_name="Dr Old", email="old@doc", password="pw", department_id=1))
+        db.session.add(Patient(full_name="Ann Lee", email="ann@x.test", password="pw", phone_no="0",
+                               dob=date(1990, 1, 1), address="-"))
+        db.session.flush()
+        old = Appointment(patient_id=1, doctor_id=1, date=date.today() - timedelta(days=30), time=time(9),
+                          department="Cardiology", status="completed")
+        new = Appointment(patient_id=1, doctor_id=1, date=date.today() + timedelta(days=1), time=time(9),
+                          department="Cardiology", status="booked")
+        db.session.add_all([old, new])
+        db.session.flush()
+        db.session.add(Treatment(appointment_id=old.appointment_id, diagnosis="Flu"))
+        db.session.commit()
+        assert archive.move(before=date.today()) == (1, 1)
+
+    client = login(app, "admin", "admin@gmail.com")
+    assert [r["status"] for r in _rows(client)] == ["booked"]
+
+    archived, live = _rows(client, "?include_archive=1")
+    assert (archived["status"], archived["diagnosis"]) == ("completed", "Flu")
+    assert (archived["patient_name"], archived["patient_email"], archived["doctor_name"]) == \
+        ("Ann Lee", "ann@x.test", "Dr Old")
+    assert live["status"] == "booked"
+    assert _rows(client, "?include_archive=1&status=booked") == [live]
+
+
+def test_empty_export_is_just_the_header(app):
+    client = login(app, "admin", "admin@gmail.com")
+    response = client.get("/admin/export/appointments.csv?include_archive=1")
+    assert response.get_data(as_text=True).strip() == "appointment_id,date,time,status,department,patient_id," \
+        "patient_name,patient_email,doctor_id,doctor_name,diagnosis,prescription,note"
@@ -0,0 +1,105 @@
+"""
+Background job leases and worker resilience (database/jobs.py).
+"""
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.exc import OperationalError
+
+from database import jobs
+from database.model import db, Job
+
+
+@jobs.task("test_sleep")
+def _sleep(seconds):
+    time.sleep(seconds)
+
+
+@jobs.task("test_steal")
+def _steal(job_id):
+    # another worker took the job over while this one was still running it
+    db.session.execute(update(Job).where(Job.job_id == job_id).values(locked_by="other"))
+
+
+@pytest.fixture
+def ctx(app):
+    with app.app_context():
+        yield app
+
+
+def _queue(task, payload=None, **kwargs):
+    job = jobs.enqueue(task, payload, **kwargs)
+    db.session.commit()
+    return job.job_id
+
+
+def test_lease_is_renewed_while_the_task_runs(ctx):
+    job_id = _queue("test_sleep", {"seconds": 4.5})
+    job_id = jobs.claim("w1", lease_seconds=3).job_id
+
+    def run():
+        with ctx.app_context():
+            jobs.run(db.session.get(Job, job_id), lease_seconds=3)
+
+    worker = threading.Thread(target=run)
+    worker.start()
+    time.sleep(3.5)                         # past the original lease
+    with ctx.app_context():
+        assert jobs.claim("w2", lease_seconds=3) is None
+    worker.join()
+    db.session.expire_all()
+    assert db.session.get(Job, job_id).state == jobs.DONE
+
+
+def test_finish_needs_the_lease(ctx):
+    job_id = _queue("test_steal")
+    job = jobs.claim("w1", lease_seconds=60)
+    job.payload = f'{{"job_id": {job_id}}}'
+    db.session.commit()
+
+    jobs.run(job, lease_seconds=60)
+    job = db.session.get(Job, job_id)
+    db.session.refresh(job)
+    assert (job.state, job.locked_by) == (jobs.RUNNING, "other")
+
+
+def test_expired_last_attempt_fails_instead_of_rerunning(ctx):
+    job_id = _queue("test_sleep", {"seconds": 0}, max_attempts=2)
+    db.session.execute(update(Job).where(Job.job_id == job_id).values(
+        state=jobs.RUNNING, attempts=2, locked_by="dead", locked_until=jobs._now() - timedelta(minutes=1)))
+    db.session.commit()
+
+    assert jobs.claim("w1", lease_seconds=60) is None
+    job = db.session.get(Job, job_id)
+    db.session.refresh(job)
+    assert job.state == jobs.FAILED and "lease expired" in job.last_error
+
+
+def test_worker_survives_database_errors(ctx, monkeypatch):
+    job_id = _queue("test_sleep", {"seconds": 0})
+    calls = []
+
+    def flaky(now=None):
+        calls.append(now)
+        if len(calls) == 1:
+            raise OperationalError("SELECT", {}, Exception("database is locked"))
+        return []
+
+    monkeypatch.setattr(jobs, "fire_due_schedules", flaky)
+    stop = threading.Event()
+    worker = threading.Thread(target=jobs.work, args=(ctx,), kwargs={"threads": 1, "poll_seconds": 0.05,
+                                                                     "stop": stop})
+    worker.start()
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        db.session.expire_all()
+        if db.session.get(Job, job_id).state == jobs.DONE:
+            break
+        time.sleep(0.05)
+    stop.set()
+    worker.join()
+    assert len(calls) >= 2
+    assert db.session.get(Job, job_id).state == jobs.DONE
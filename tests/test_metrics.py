@@ -0,0 +1,13 @@
+"""
+/admin/metrics: admins, or scrapers with the METRICS_TOKEN bearer token.
+"""
+from tests.conftest import build_app
+
+
+def test_metrics_bearer_token(tmp_path):
+    client = build_app(tmp_path / "test.db", METRICS_TOKEN="s3cret").test_client()
+
+    assert client.get("/admin/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+    assert client.get("/admin/metrics", headers={"Authorization": "Bearer s3cre"}).status_code == 302
+    assert client.get("/admin/metrics", headers={"Authorization": "Bearer s3cretX"}).status_code == 302
+    assert client.get("/admin/metrics").status_code == 302
@@ -0,0 +1,158 @@
+"""
+Upgrading a database created by the original (pre-migration) schema:
+`init-db` must apply every migration to it, data included.
+"""
+import sqlite3
+from datetime import date, time, timedelta
+
+import pytest
+
+from tests.conftest import build_app
+
+# the tables as the first release created them (no indexes, no derived tables)
+BASELINE_SCHEMA = """
+CREATE TABLE admin (
+    username VARCHAR(30) NOT NULL, password VARCHAR(256) NOT NULL,
+    PRIMARY KEY (username));
+CREATE TABLE patient (
+    patient_id INTEGER NOT NULL, full_name VARCHAR(64) NOT NULL, email VARCHAR(254) NOT NULL,
+    password VARCHAR(256) NOT NULL, phone_no VARCHAR(15) NOT NULL, dob DATE NOT NULL, address TEXT NOT NULL,
+    PRIMARY KEY (patient_id), UNIQUE (email));
+CREATE TABLE department (
+    department_id INTEGER NOT NULL, department_name VARCHAR(40) NOT NULL, description TEXT,
+    PRIMARY KEY (department_id), UNIQUE (department_name));
+CREATE TABLE doctor (
+    doctor_id INTEGER NOT NULL, full_name VARCHAR(64) NOT NULL, email VARCHAR(254) NOT NULL,
+    password VARCHAR(256) NOT NULL, department_id INTEGER, experience INTEGER,
+    PRIMARY KEY (doctor_id), UNIQUE (email),
+    FOREIGN KEY(department_id) REFERENCES department (department_id));
+CREATE TABLE blacklist (
+    id INTEGER NOT NULL, patient_id INTEGER NOT NULL,
+    PRIMARY KEY (id), FOREIGN KEY(patient_id) REFERENCES patient (patient_id));
+CREATE TABLE appointment (
+    appointment_id INTEGER NOT NULL, patient_id INTEGER NOT NULL, doctor_id INTEGER NOT NULL,
+    date DATE NOT NULL, time TIME NOT NULL, department VARCHAR(40) NOT NULL, status VARCHAR(30) NOT NULL,
+    PRIMARY KEY (appointment_id),
+    FOREIGN KEY(patient_id) REFERENCES patient (patient_id),
+    FOREIGN KEY(doctor_id) REFERENCES doctor (doctor_id),
+    FOREIGN KEY(department) REFERENCES department (department_name));
+CREATE TABLE doctor_blacklist (
+    id INTEGER NOT NULL, doctor_id INTEGER NOT NULL,
+    PRIMARY KEY (id), FOREIGN KEY(doctor_id) REFERENCES doctor (doctor_id));
+CREATE TABLE doctor_availability (
+    availability_id INTEGER NOT NULL, doctor_id INTEGER NOT NULL, date DATE NOT NULL,
+    shift1_enabled BOOLEAN NOT NULL, shift1_start TIME, shift1_end TIME,
+    shift2_enabled BOOLEAN NOT NULL, shift2_start TIME, shift2_end TIME,
+    PRIMARY KEY (availability_id), CONSTRAINT uq_doc_date UNIQUE (doctor_id, date),
+    FOREIGN KEY(doctor_id) REFERENCES doctor (doctor_id));
+CREATE INDEX ix_doctor_availability_date ON doctor_availability (date);
+CREATE TABLE treatment (
+    treatment_id INTEGER NOT NULL, appointment_id INTEGER NOT NULL, diagnosis VARCHAR(255) NOT NULL,
+    prescription TEXT, note TEXT,
+    PRIMARY KEY (treatment_id), UNIQUE (appointment_id),
+    FOREIGN KEY(appointment_id) REFERENCES appointment (appointment_id));
+"""
+
+TOMORROW = date.today() + timedelta(days=1)
+YESTERDAY = date.today() - timedelta(days=1)
+
+
+def _time(t):
+    return t.strftime("%H:%M:%S.%f")      # how SQLAlchemy stores TIME on SQLite
+
+
+def baseline_db(path, appointments=()):
+    """
+    A baseline-schema file with one doctor working tomorrow morning, two
+    patients, one completed visit (with treatment) and `appointments`
+    (extra (patient_id, date, time, status) rows for doctor 1).
+    """
+    con = sqlite3.connect(path)
+    con.executescript(BASELINE_SCHEMA)
+    con.execute("INSERT INTO admin VALUES ('admin@gmail.com', 'admin123')")
+    con.execute("INSERT INTO department VALUES (1, 'Cardiology', 'Heart')")
+    con.execute("INSERT INTO doctor VALUES (1, 'Dr Old', 'old@doc', 'pw', 1, 10)")
+    con.executemany("INSERT INTO patient VALUES (?, ?, ?, 'pw', '0', '1990-01-01', '-')",
+                    [(1, "Pat One", "one@pat"), (2, "Pat Two", "two@pat")])
+    con.execute("INSERT INTO doctor_availability VALUES (1, 1, ?, 1, ?, ?, 0, NULL, NULL)",
+                (TOMORROW.isoformat(), _time(time(9, 0)), _time(time(13, 0))))
+    con.execute("INSERT INTO appointment VALUES (1, 2, 1, ?, ?, 'Cardiology', 'completed')",
+                (YESTERDAY.isoformat(), _time(time(10, 0))))
+    con.execute("INSERT INTO treatment VALUES (1, 1, 'Flu', 'Rest', '-')")
+    con.executemany("INSERT INTO appointment (patient_id, doctor_id, date, time, department, status) "
+                    "VALUES (?, 1, ?, ?, 'Cardiology', ?)",
+                    [(p, d.isoformat(), _time(t), s) for p, d, t, s in appointments])
+    con.commit()
+    con.close()
+
+
+@pytest.fixture
+def upgraded(tmp_path):
+    """Baseline file with a booking tomorrow at 09:00, then `init-db`."""
+    from database.init_db import init_db
+    path = tmp_path / "baseline.db"
+    baseline_db(path, [(1, TOMORROW, time(9, 0), "booked")])
+    app = build_app(path)
+    init_db(app)
+    return app
+
+
+def test_upgrade_applies_every_migration(upgraded):
+    from sqlalchemy import select, text
+    from database.migrate import MIGRATIONS, schema_migrations, upgrade
+    from database.model import db
+
+    with upgraded.app_context():
+        applied = set(db.session.execute(select(schema_migrations.c.version)).scalars())
+        assert applied == {version for version, _, _ in MIGRATIONS}
+        assert upgrade() == []            # a second init-db has nothing left to do
+
+        # ids are never handed out twice (database/archive.py keys on them)
+        for table in ("appointment", "treatment"):
+            ddl = db.session.execute(text("SELECT sql FROM sqlite_master WHERE name = :t"), {"t": table}).scalar()
+            assert "AUTOINCREMENT" in ddl
+        db.session.execute(text("DELETE FROM treatment"))
+        db.session.execute(text("DELETE FROM appointment WHERE appointment_id = 2"))   # the newest
+        db.session.execute(text("INSERT INTO appointment (patient_id, doctor_id, date, time, department, status) "
+                                "VALUES (1, 1, '2030-01-01', '09:00:00.000000', 'Cardiology', 'booked')"))
+        assert db.session.execute(text("SELECT max(appointment_id) FROM appointment")).scalar() == 3
+
+
+def test_upgrade_backfills_derived_tables(upgraded):
+    from database import stats
+    from database.migrate import full_scans
+    from database.model import SlotInventory, DoctorPatient
+
+    with upgraded.app_context():
+        inventory = {s.time: s.state for s in SlotInventory.query.filter_by(doctor_id=1, date=TOMORROW)}
+        assert len(inventory) == 12       # 09:00-13:00 in 20-minute slots
+        assert inventory.pop(time(9, 0)) == "booked"
+        assert set(inventory.values()) == {"free"}
+
+        roster = {r.patient_id: r for r in DoctorPatient.query.filter_by(doctor_id=1)}
+        assert roster[1].next_date == TOMORROW and roster[1].visits == 0
+        assert roster[2].visits == 1 and roster[2].last_visit == YESTERDAY
+
+        counts = stats.overview()
+        assert counts["appointments"] == 2 and counts["status"]["booked"] == 1
+        assert full_scans() == {}
+
+
+def test_upgrade_cancels_duplicate_bookings(tmp_path, capsys):
+    # the old booking race left the same slot booked twice
+    from database.init_db import init_db
+    from database.model import Appointment, SlotInventory
+
+    path = tmp_path / "baseline.db"
+    baseline_db(path, [(1, TOMORROW, time(9, 0), "booked"), (2, TOMORROW, time(9, 0), "booked"),
+                       (2, TOMORROW, time(9, 20), "booked")])
+    app = build_app(path)
+    init_db(app)
+
+    with app.app_context():
+        at_nine = Appointment.query.filter_by(doctor_id=1, date=TOMORROW, time=time(9, 0)) \
+            .order_by(Appointment.appointment_id).all()
+        assert [(a.patient_id, a.status) for a in at_nine] == [(1, "booked"), (2, "cancelled")]
+        assert SlotInventory.query.filter_by(doctor_id=1, date=TOMORROW, time=time(9, 0)).one().state == "booked"
+        assert Appointment.query.filter_by(time=time(9, 20)).one().status == "booked"
+    assert f"kept appointment {at_nine[0].appointment_id}" in capsys.readouterr().err
@@ -0,0 +1,16 @@
+"""
+No hot query may fall back to a full table scan (database/migrate.py
+full_scans(), the same check as `flask db-check-plans`).
+"""
+from database.migrate import full_scans, hot_queries
+
+
+def test_hot_queries_use_indexes_on_empty_schema(app):
+    with app.app_context():
+        assert full_scans() == {}
+
+
+def test_hot_queries_use_indexes_with_data(data_app):
+    with data_app.app_context():
+        assert hot_queries()              # the check must actually look at something
+        assert full_scans() == {}
@@ -0,0 +1,59 @@
+"""
+Doctor patient roster (database/roster.py): who is listed, and the next
+appointment once the stored one is in the past.
+"""
+from datetime import date, time, timedelta
+
+from sqlalchemy import update
+
+from database import roster
+from database.model import db, Appointment, Doctor, Patient, DoctorPatient
+from tests.conftest import login
+
+TODAY = date.today()
+
+
+def _people(n_patients):
+    db.session.add(Doctor(full_name="Dr Roster", email="roster@doc", password="pw", department_id=1))
+    for i in range(n_patients):
+        db.session.add(Patient(full_name=f"Patient {i}", email=f"p{i}@x.test", password="pw", phone_no="0",
+                               dob=date(1990, 1, 1), address="-"))
+    db.session.flush()
+
+
+def _book(patient_id, day, status, hour=9):
+    db.session.add(Appointment(patient_id=patient_id, doctor_id=1, date=day, time=time(hour),
+                               department="Cardiology", status=status))
+
+
+def test_every_patient_with_an_appointment_is_listed(app):
+    with app.app_context():
+        _people(3)
+        _book(1, TODAY - timedelta(days=3), "cancelled")
+        _book(2, TODAY - timedelta(days=2), "booked")          # not expired yet
+        _book(3, TODAY + timedelta(days=2), "cancelled")
+        db.session.commit()
+        assert sorted(r.patient_id for r in DoctorPatient.query) == [1, 2, 3]
+        assert roster.rebuild() == 3
+
+
+def test_next_appointment_after_its_day_is_over(app):
+    with app.app_context():
+        _people(1)
+        _book(1, TODAY + timedelta(days=1), "booked")
+        _book(1, TODAY + timedelta(days=8), "booked", hour=10)
+        db.session.commit()
+        # a day later: the stored next appointment (tomorrow) would be yesterday's
+        db.session.execute(update(DoctorPatient).values(next_date=TODAY - timedelta(days=1)))
+        db.session.query(Appointment).filter_by(date=TODAY + timedelta(days=1)) \
+            .update({"date": TODAY - timedelta(days=1)}, synchronize_session=False)
+        db.session.commit()
+
+    response = login(app, "doctor", 1).get("/doctor/dashboard/patients/upcoming")
+    assert (TODAY + timedelta(days=8)).isoformat().encode() in response.data
+
+    with app.app_context():
+        assert roster.refresh_next() == 1
+        db.session.commit()
+        row = DoctorPatient.query.one()
+        assert (row.next_date, row.next_time) == (TODAY + timedelta(days=8), time(10))
@@ -0,0 +1,95 @@
+"""
+Every dashboard tab runs a fixed number of SQL statements, however many rows
+it shows (database/queries.py). Each view is measured, then more rows that
+the view lists are added, and it is measured again: a lazy load per row
+would make the second count bigger.
+"""
+from datetime import date, time, timedelta
+
+import pytest
+
+from tests.conftest import count_statements, login
+
+DOCTOR_VIEWS = [
+    "/doctor/dashboard/appointments/upcoming",
+    "/doctor/dashboard/appointments/completed",
+    "/doctor/dashboard/appointments/cancelled",
+    "/doctor/dashboard/patients/upcoming",
+    "/doctor/dashboard/availability/upcoming",
+]
+PATIENT_VIEWS = [
+    "/patient/dashboard/overview",
+    "/patient/dashboard/treatment_history",
+    "/patient/dashboard/book_appointment",
+]
+ADMIN_VIEWS = [
+    "/admin/dashboard/overview",
+    "/admin/dashboard/doctors",
+    "/admin/dashboard/patients",
+    "/admin/dashboard/appointments",
+]
+
+# upper bound per view; today's tabs need well under this
+MAX_STATEMENTS = 12
+
+
+def _statements(client, url):
+    client.get(url)                       # warm the reference cache
+    with count_statements() as n:
+        response = client.get(url)
+    assert response.status_code == 200, url
+    return n[0]
+
+
+def _add_rows(app, doctor_id, patient_id, n, offset):
+    """
+    n new patients with a booked, a completed (+ treatment) and a cancelled
+    appointment with `doctor_id`; `patient_id` gets the same with every doctor.
+    """
+    from database.model import db, Patient, Doctor, Appointment, Treatment
+
+    with app.app_context():
+        doctors = Doctor.query.order_by(Doctor.doctor_id).all()
+        own_doctor = db.session.get(Doctor, doctor_id)
+        today = date.today()
+        for i in range(n):
+            patient = Patient(full_name=f"Extra Patient {offset + i}", email=f"extra{offset + i}@test",
+                              password="x", phone_no="0", dob=date(1990, 1, 1), address="-")
+            db.session.add(patient)
+            db.session.flush()
+            slot = time(8 + i // 3 % 10, i % 3 * 20)
+            other = doctors[i % len(doctors)]
+            for who, doctor in ((patient.patient_id, own_doctor),
+                                (patient_id, other)):
+                day = 40 + offset + i + (0 if who == patient.patient_id else 500)
+                future = Appointment(patient_id=who, doctor_id=doctor.doctor_id, date=today + timedelta(days=day),
+                                     time=slot, department=doctor.department.department_name, status="booked")
+                past = Appointment(patient_id=who, doctor_id=doctor.doctor_id, date=today - timedelta(days=day),
+                                   time=slot, department=doctor.department.department_name, status="completed")
+                cancelled = Appointment(patient_id=who, doctor_id=doctor.doctor_id,
+                                        date=today - timedelta(days=day), time=slot,
+                                        department=doctor.department.department_name, status="cancelled")
+                db.session.add_all([future, past, cancelled])
+                db.session.flush()
+                db.session.add(Treatment(appointment_id=past.appointment_id, diagnosis="Test",
+                                         prescription="-", note="-"))
+        db.session.commit()
+
+
+@pytest.mark.parametrize("role, views", [("doctor", DOCTOR_VIEWS), ("patient", PATIENT_VIEWS),
+                                         ("admin", ADMIN_VIEWS)])
+def test_statement_count_does_not_grow_with_rows(data_app, role, views):
+    from database.model import Doctor, Patient
+
+    with data_app.app_context():
+        doctor_id = Doctor.query.order_by(Doctor.doctor_id).first().doctor_id
+        patient_id = Patient.query.filter_by(email="patient0@bench.test").one().patient_id
+    user_id = {"doctor": doctor_id, "patient": patient_id, "admin": "admin@gmail.com"}[role]
+    client = login(data_app, role, user_id)
+
+    before = {url: _statements(client, url) for url in views}
+    _add_rows(data_app, doctor_id, patient_id, 30, offset={"doctor": 0, "patient": 100, "admin": 200}[role])
+    after = {url: _statements(client, url) for url in views}
+
+    assert after == before
+    assert max(after.values()) <= MAX_STATEMENTS, after
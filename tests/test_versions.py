@@ -0,0 +1,52 @@
+"""
+Data-version stamps (database/versions.py) are bumped after the writing
+transaction commits, in a transaction of their own.
+"""
+from datetime import date
+
+from sqlalchemy import event
+
+from database import versions
+from database.model import db, Patient
+
+
+def _patient(email):
+    return Patient(full_name="Ann Lee", email=email, password="x", phone_no="0",
+                   dob=date(1990, 1, 1), address="-")
+
+
+def test_version_bumped_after_commit(app):
+    with app.app_context():
+        before = versions.current(["patient"])["patient"][0]
+        log = []
+        engine = db.engine
+
+        def statement(conn, cursor, sql, params, context, executemany):
+            if sql.lstrip().upper().startswith(("INSERT", "UPDATE")):
+                log.append(sql.split()[2] if sql.lstrip().upper().startswith("INSERT") else sql.split()[1])
+
+        def commit(conn):
+            log.append("COMMIT")
+
+        event.listen(engine, "before_cursor_execute", statement)
+        event.listen(engine, "commit", commit)
+        try:
+            db.session.add(_patient("ann@x.test"))
+            db.session.commit()
+        finally:
+            event.remove(engine, "before_cursor_execute", statement)
+            event.remove(engine, "commit", commit)
+
+        assert versions.current(["patient"])["patient"][0] == before + 1
+        # the patient row commits first; the stamp is a separate transaction
+        assert log.index("patient") < log.index("COMMIT") < log.index("data_version")
+
+
+def test_rolled_back_write_leaves_version(app):
+    with app.app_context():
+        before = versions.current(["patient"])["patient"][0]
+        db.session.add(_patient("bob@x.test"))
+        db.session.flush()
+        db.session.rollback()
+        db.session.commit()
+        assert versions.current(["patient"])["patient"][0] == before